@@ -0,0 +1,172 @@
+# ==========================================
+# ACTIVITY AGGREGATES MODULE
+# Dashboard totals maintained incrementally on every logged activity
+# ==========================================
+
+import sys
+from datetime import datetime
+import pandas as pd
+import storage
+import activity_log
+
+def apply(rows, conn):
+    """Fold new activity rows into the aggregates (inside the caller's transaction).
+
+    ``rows`` are (timestamp, day, username, action, points) tuples as written to
+    the activity log.
+    """
+    if not rows:
+        return
+    conn.execute(
+        "INSERT INTO activity_totals (id, points, count) VALUES (1, ?, ?) "
+        "ON CONFLICT(id) DO UPDATE SET points = points + excluded.points, count = count + excluded.count",
+        (sum(r[4] for r in rows), len(rows))
+    )
+    conn.executemany(
+        "INSERT INTO activity_action_totals (action, points, count) VALUES (?, ?, 1) "
+        "ON CONFLICT(action) DO UPDATE SET points = points + excluded.points, count = count + 1",
+        [(r[3], r[4]) for r in rows]
+    )
+    conn.executemany(
+        "INSERT INTO activity_user_totals (username, points, count) VALUES (?, ?, 1) "
+        "ON CONFLICT(username) DO UPDATE SET points = points + excluded.points, count = count + 1",
+        [(r[2], r[4]) for r in rows]
+    )
+    conn.executemany(
+        "INSERT INTO activity_daily (day, action, points, count) VALUES (?, ?, ?, 1) "
+        "ON CONFLICT(day, action) DO UPDATE SET points = points + excluded.points, count = count + 1",
+        [(r[1], r[3], r[4]) for r in rows]
+    )
+
+# ==========================================
+# READS
+# ==========================================
+
+def get_summary(start=None, end=None):
+    """Totals and per-action points/counts, optionally for a day window.
+
+    Without a window this reads the all-time tables (O(#actions)); with one it
+    sums the per-day buckets inside the window.
+    """
+    activity_log.ensure_initialized()
+    conn = storage.get_connection()
+    if start is None and end is None:
+        by_action = pd.read_sql_query(
+            "SELECT action AS Action, points AS Points, count AS Count FROM activity_action_totals "
+            "WHERE count > 0 ORDER BY action",
+            conn
+        )
+    else:
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("day >= ?")
+            params.append(activity_log._to_day(start))
+        if end is not None:
+            clauses.append("day <= ?")
+            params.append(activity_log._to_day(end))
+        by_action = pd.read_sql_query(
+            "SELECT action AS Action, SUM(points) AS Points, SUM(count) AS Count FROM activity_daily "
+            f"WHERE {' AND '.join(clauses)} GROUP BY action ORDER BY action",
+            conn, params=params
+        )
+    return {
+        'total_points': float(by_action['Points'].sum()) if not by_action.empty else 0.0,
+        'total_actions': int(by_action['Count'].sum()) if not by_action.empty else 0,
+        'by_action': by_action
+    }
+
+
+def get_user_totals():
+    """Points and action counts per user"""
+    activity_log.ensure_initialized()
+    return pd.read_sql_query(
+        "SELECT username, points, count FROM activity_user_totals ORDER BY points DESC",
+        storage.get_connection()
+    )
+
+# ==========================================
+# REBUILD & VERIFY
+# ==========================================
+
+def _compute_from_log():
+    """Recompute every aggregate from the raw activity log"""
+    df = activity_log.read_activities(columns=['timestamp', 'username', 'action', 'points'])
+    df['points'] = pd.to_numeric(df['points'], errors='coerce').fillna(0).astype(float)
+    df['day'] = df['timestamp'].astype(str).str[:10]
+    totals = pd.DataFrame({'id': [1], 'points': [df['points'].sum()], 'count': [len(df)]})
+    by_action = df.groupby('action')['points'].agg(['sum', 'count']).reset_index()
+    by_user = df.groupby('username')['points'].agg(['sum', 'count']).reset_index()
+    by_day = df.groupby(['day', 'action'])['points'].agg(['sum', 'count']).reset_index()
+    rename = {'sum': 'points'}
+    return {
+        'activity_totals': totals,
+        'activity_action_totals': by_action.rename(columns=rename),
+        'activity_user_totals': by_user.rename(columns=rename),
+        'activity_daily': by_day.rename(columns=rename),
+    }
+
+
+def _keys(table):
+    return {'activity_totals': ['id'], 'activity_action_totals': ['action'],
+            'activity_user_totals': ['username'], 'activity_daily': ['day', 'action']}[table]
+
+
+def verify(expected=None):
+    """Compare the stored aggregates with a recomputation from the raw log.
+
+    Returns a list of human-readable mismatches (empty when consistent).
+    """
+    expected = expected or _compute_from_log()
+    conn = storage.get_connection()
+    problems = []
+    for table, want in expected.items():
+        keys = _keys(table)
+        have = pd.read_sql_query(f"SELECT * FROM {table} WHERE count > 0", conn)
+        merged = want.merge(have, on=keys, how='outer', suffixes=('_log', '_stored')).fillna(0)
+        bad = merged[((merged['points_log'] - merged['points_stored']).abs() > 1e-6) |
+                     (merged['count_log'] != merged['count_stored'])]
+        for r in bad.to_dict('records'):
+            key = ", ".join(str(r[k]) for k in keys)
+            problems.append(
+                f"{table}[{key}]: log={r['points_log']}/{int(r['count_log'])} "
+                f"stored={r['points_stored']}/{int(r['count_stored'])}"
+            )
+    return problems
+
+
+def rebuild():
+    """Recompute all aggregates from the raw log and replace the stored ones.
+
+    Returns the mismatches found before the rebuild.
+    """
+    activity_log.ensure_initialized()
+    # Read the log inside the write transaction so no append slips in between
+    with storage.transaction() as conn:
+        expected = _compute_from_log()
+        problems = verify(expected)
+        for table, df in expected.items():
+            conn.execute(f"DELETE FROM {table}")
+            cols = list(df.columns)
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                [tuple(r) for r in df.astype(object).itertuples(index=False, name=None)]
+            )
+        storage.set_meta('aggregates_built', datetime.now().strftime("%Y-%m-%d %H:%M:%S"), conn=conn)
+    return problems
+
+
+if __name__ == "__main__":
+    # Usage: python activity_aggregates.py rebuild|verify
+    command = sys.argv[1] if len(sys.argv) >= 2 else ""
+    if command in ("rebuild", "verify"):
+        problems = rebuild() if command == "rebuild" else verify()
+        if problems:
+            print(f"{len(problems)} aggregate mismatch(es) against the raw log:")
+            for p in problems:
+                print(f"  {p}")
+        else:
+            print("Aggregates match the raw activity log.")
+        if command == "rebuild":
+            print("Aggregates rebuilt.")
+    else:
+        print("Usage: python activity_aggregates.py rebuild|verify")
@@ -0,0 +1,267 @@
+# ==========================================
+# ACTIVITY LOG MODULE
+# Time-partitioned activity log: daily columnar segments + hot append segment
+# ==========================================
+
+import os
+import sys
+import glob
+import threading
+from datetime import datetime, date
+import pandas as pd
+import storage
+import activity_aggregates
+import file_lock
+
+try:
+    import pyarrow  # noqa: F401  (needed by pandas for Parquet segments)
+except ImportError:
+    pyarrow = None
+
+# Directory holding one sealed Parquet segment per day
+ACTIVITY_SEGMENTS_DIR = "activity_segments"
+
+# Legacy single-file log (imported once into the hot segment)
+LEGACY_ACTIVITY_CSV = "user_activities.csv"
+
+ACTIVITY_COLUMNS = ['timestamp', 'username', 'action', 'points']
+
+_migrate_lock = threading.Lock()
+_migrated_path = None
+_last_compacted_day = None
+
+
+def _segment_path(day):
+    return os.path.join(ACTIVITY_SEGMENTS_DIR, f"day={day}.parquet")
+
+
+def _segment_day(path):
+    """Partition day encoded in a segment file name"""
+    return os.path.basename(path)[len("day="):-len(".parquet")]
+
+
+def _to_day(value):
+    """Normalize a date, datetime or 'YYYY-MM-DD...' string to 'YYYY-MM-DD'"""
+    if value is None:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%Y-%m-%d")
+    return str(value)[:10]
+
+
+def ensure_initialized():
+    """Import the legacy CSV log into the hot segment once"""
+    global _migrated_path
+    if _migrated_path == storage.STORE_DB_FILE:
+        return
+    with _migrate_lock:
+        if _migrated_path == storage.STORE_DB_FILE:
+            return
+        conn = storage.get_connection()
+        if storage.get_meta('activities_csv_migrated', conn=conn) is None:
+            migrate_from_csv(conn)
+        _migrated_path = storage.STORE_DB_FILE
+        if storage.get_meta('aggregates_built', conn=conn) is None:
+            activity_aggregates.rebuild()
+
+
+def migrate_from_csv(conn=None):
+    """Copy user_activities.csv into the hot segment; returns rows imported"""
+    conn = conn or storage.get_connection()
+    rows = []
+    if os.path.exists(LEGACY_ACTIVITY_CSV):
+        df = pd.read_csv(LEGACY_ACTIVITY_CSV)
+        df = df.dropna(subset=['timestamp'])
+        df['points'] = pd.to_numeric(df['points'], errors='coerce').fillna(0)
+        for r in df[ACTIVITY_COLUMNS].itertuples(index=False, name=None):
+            rows.append((str(r[0]), _to_day(r[0]), r[1], r[2], float(r[3])))
+    with storage.transaction(conn):
+        conn.executemany(
+            "INSERT INTO activity_hot (timestamp, day, username, action, points) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+        storage.set_meta('activities_csv_migrated', datetime.now().strftime("%Y-%m-%d %H:%M:%S"), conn=conn)
+    return len(rows)
+
+# ==========================================
+# WRITES
+# ==========================================
+
+def append(username, action, points, timestamp=None, conn=None):
+    """Append one activity to the hot segment"""
+    append_many([(username, action, points, timestamp)], conn=conn)
+
+
+def append_many(entries, conn=None):
+    """Append (username, action, points[, timestamp]) entries in one transaction.
+
+    When ``conn`` is given the caller owns the transaction.
+    """
+    ensure_initialized()
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = []
+    for entry in entries:
+        username, action, points = entry[:3]
+        ts = (entry[3] if len(entry) > 3 else None) or now
+        rows.append((ts, _to_day(ts), username, action, float(points)))
+
+    sql = "INSERT INTO activity_hot (timestamp, day, username, action, points) VALUES (?, ?, ?, ?, ?)"
+    if conn is not None:
+        conn.executemany(sql, rows)
+        activity_aggregates.apply(rows, conn)
+        return
+    with storage.transaction() as c:
+        c.executemany(sql, rows)
+        activity_aggregates.apply(rows, c)
+    maybe_compact()
+
+
+def maybe_compact():
+    """Seal finished days at most once per day per process"""
+    global _last_compacted_day
+    today = date.today().strftime("%Y-%m-%d")
+    if _last_compacted_day == today or pyarrow is None:
+        return
+    _last_compacted_day = today
+    try:
+        compact()
+    except Exception as e:
+        print(f"Activity log compaction failed: {e}")
+
+
+def compact(before_day=None):
+    """Move hot rows for days before ``before_day`` (default today) into Parquet segments.
+
+    Returns the list of days sealed.
+    """
+    if pyarrow is None:
+        raise RuntimeError("pyarrow is required to write Parquet activity segments")
+    ensure_initialized()
+    before_day = _to_day(before_day) or date.today().strftime("%Y-%m-%d")
+    conn = storage.get_connection()
+    sealed = []
+    # The file lock keeps compactions in other processes from racing on the same segments
+    lock_path = os.path.join(ACTIVITY_SEGMENTS_DIR, ".compact.lock")
+    with file_lock.file_lock(lock_path, name="activity_segments"):
+        days = [r['day'] for r in conn.execute(
+            "SELECT DISTINCT day FROM activity_hot WHERE day < ? ORDER BY day", (before_day,)
+        )]
+        for day in days:
+            hot = pd.read_sql_query(
+                "SELECT id, timestamp, username, action, points FROM activity_hot WHERE day = ? ORDER BY id",
+                conn, params=(day,)
+            )
+            if hot.empty:
+                continue
+            path = _segment_path(day)
+            if os.path.exists(path):
+                hot = pd.concat([pd.read_parquet(path), hot], ignore_index=True)
+            # Ids make a re-run after a crash between write and delete idempotent
+            hot = hot.drop_duplicates(subset='id').sort_values('id')
+            with file_lock.atomic_replace(path, 'wb') as f:
+                hot.to_parquet(f, index=False)
+            with storage.transaction(conn):
+                conn.execute("DELETE FROM activity_hot WHERE day = ? AND id <= ?", (day, int(hot['id'].max())))
+            sealed.append(day)
+    return sealed
+
+# ==========================================
+# READS
+# ==========================================
+
+def list_segments(start=None, end=None):
+    """Sealed segment files whose day falls in [start, end]"""
+    start, end = _to_day(start), _to_day(end)
+    paths = []
+    for path in sorted(glob.glob(os.path.join(ACTIVITY_SEGMENTS_DIR, "day=*.parquet"))):
+        day = _segment_day(path)
+        if (start and day < start) or (end and day > end):
+            continue
+        paths.append(path)
+    return paths
+
+
+def read_activities(start=None, end=None, columns=None):
+    """Load activities with start <= day <= end, reading only the requested columns.
+
+    Only the segments inside the window are opened, so the cost depends on the
+    window rather than on the full history.
+    """
+    ensure_initialized()
+    columns = list(columns) if columns else list(ACTIVITY_COLUMNS)
+    unknown = [c for c in columns if c not in ACTIVITY_COLUMNS + ['id']]
+    if unknown:
+        raise ValueError(f"Unknown activity columns: {unknown}")
+    wanted = ['id'] + [c for c in columns if c != 'id']
+
+    frames = []
+    if pyarrow is not None:
+        for path in list_segments(start, end):
+            frames.append(pd.read_parquet(path, columns=wanted))
+
+    clauses, params = [], []
+    if start:
+        clauses.append("day >= ?")
+        params.append(_to_day(start))
+    if end:
+        clauses.append("day <= ?")
+        params.append(_to_day(end))
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    frames.append(pd.read_sql_query(
+        f"SELECT {', '.join(wanted)} FROM activity_hot{where} ORDER BY id",
+        storage.get_connection(), params=params
+    ))
+
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(frames, ignore_index=True)
+    if len(frames) > 1:
+        df = df.drop_duplicates(subset='id')
+    df = df.sort_values('id').reset_index(drop=True)
+    return df[columns]
+
+
+
+def read_recent(limit=500, start=None, columns=None):
+    """Newest ``limit`` activities (newest first), opening segments only until enough rows are found"""
+    ensure_initialized()
+    columns = list(columns) if columns else list(ACTIVITY_COLUMNS)
+    unknown = [c for c in columns if c not in ACTIVITY_COLUMNS + ['id']]
+    if unknown:
+        raise ValueError(f"Unknown activity columns: {unknown}")
+    wanted = ['id'] + [c for c in columns if c != 'id']
+
+    params = []
+    where = ""
+    if start:
+        where = " WHERE day >= ?"
+        params.append(_to_day(start))
+    frames = [pd.read_sql_query(
+        f"SELECT {', '.join(wanted)} FROM activity_hot{where} ORDER BY id DESC LIMIT ?",
+        storage.get_connection(), params=params + [limit]
+    )]
+    found = len(frames[0])
+    if pyarrow is not None:
+        for path in reversed(list_segments(start=start)):
+            if found >= limit:
+                break
+            seg = pd.read_parquet(path, columns=wanted).sort_values('id', ascending=False)
+            frames.append(seg)
+            found += len(seg)
+
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(frames, ignore_index=True).drop_duplicates(subset='id')
+    df = df.sort_values('id', ascending=False).head(limit).reset_index(drop=True)
+    return df[columns]
+
+
+if __name__ == "__main__":
+    # Usage: python activity_log.py compact
+    if len(sys.argv) >= 2 and sys.argv[1] == "compact":
+        days = compact()
+        print(f"Sealed {len(days)} day(s) into {ACTIVITY_SEGMENTS_DIR}/")
+    else:
+        print("Usage: python activity_log.py compact")
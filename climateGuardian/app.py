@@ -12,18 +12,23 @@ try:
 except ImportError:
     Groq = None
 
-from PIL import Image
 import os
 import random
+import functools
 import auth  # Import authentication module
-import base64
+import quiz_generator
+import question_bank
+import chat_cache
+import image_ingest
+import evidence_prefilter
+import video_sampler
+import evidence_index
+import verification_jobs
+import groq_gateway
+import model_router
 import io
-import cv2
-import numpy as np
-import tensorflow as tf
 from tensorflow.keras.applications import EfficientNetB0
 from tensorflow.keras.applications.efficientnet import preprocess_input, decode_predictions
-import tempfile
 import qrcode
 
 # Initialize session state variables at the start
@@ -35,15 +40,17 @@ if 'logged_in' not in st.session_state:
 # ==========================================
 st.set_page_config(page_title="ClimateGuardian AI", page_icon="🌍", layout="wide", initial_sidebar_state="expanded")
 
-# Configure the Groq API key and instantiate client
+# Configure the Groq API key and get the shared gateway (pooled client, rate limit, retries, breaker)
 _groq_key = st.secrets.get("GROQ_API_KEY", "") if hasattr(st, "secrets") else ""
-groq_client = None
+groq_api = None
 if Groq:
     if _groq_key and _groq_key not in ['YOUR_API_KEY_HERE', 'gsk_YOUR_ACTUAL_GROQ_API_KEY_HERE']:
         try:
-            groq_client = Groq(api_key=_groq_key)
+            groq_api = groq_gateway.get_gateway(_groq_key)
         except Exception:
-            groq_client = None
+            groq_api = None
+# Picks the model per call type, enforces latency budgets and hedges slow calls
+groq_router = model_router.get_router(groq_api) if groq_api else None
 
 
 # --- CUSTOM CSS FOR ECO THEME ---
@@ -268,18 +275,18 @@ if 'eco_score' not in st.session_state:
 # 2. HELPER FUNCTIONS
 # ==========================================
 
-def get_groq_response(prompt, model="llama-3.3-70b-versatile"):
-    """Get response from Groq API."""
-    if not groq_client:
+def get_groq_response(prompt, route="chat"):
+    """Get response from Groq API (the route's model, deadline and hedging come from the router)."""
+    if not groq_router:
         raise RuntimeError("Groq client not initialized.")
-    
-    completion = groq_client.chat.completions.create(
-        messages=[{"role": "user", "content": prompt}],
-        model=model,
-        temperature=0.7,
-        max_tokens=1024,
-    )
-    return completion.choices[0].message.content
+    return groq_router.complete(route, prompt, temperature=0.7, max_tokens=1024)
+
+
+def get_groq_stream(prompt, route="chat"):
+    """Stream a response from Groq, yielding text chunks as they arrive."""
+    if not groq_router:
+        raise RuntimeError("Groq client not initialized.")
+    yield from groq_router.stream(route, prompt, temperature=0.7, max_tokens=1024)
 
 
 def test_groq_connection(timeout=10):
@@ -292,14 +299,10 @@ def test_groq_connection(timeout=10):
 
     try:
         test_prompt = "Say 'hello' in one short sentence."
-        if not groq_client:
+        if not groq_api:
              return False, "Groq client failed to initialize."
              
-        response = groq_client.chat.completions.create(
-            messages=[{"role": "user", "content": test_prompt}],
-            model="llama-3.3-70b-versatile",
-        )
-        text = response.choices[0].message.content
+        text = groq_api.complete(test_prompt, model="llama-3.3-70b-versatile", route="test", retries=0, timeout=timeout)
 
         if text and text.strip():
             return True, text.strip()
@@ -309,6 +312,72 @@ def test_groq_connection(timeout=10):
         return False, str(e)
 
 
+# Cache namespace for EcoBot answers; the router may serve them from a faster model on the chat route
+ECOBOT_MODEL = "llama-3.3-70b-versatile"
+ECOBOT_PROMPT = "You are EcoBot, a fun sustainability expert for students. Keep it short (2-3 sentences) and encouraging. Answer: {question}"
+
+
+def cached_ecobot_reply(question):
+    """Cached EcoBot answer, or None on a miss or when the cache is unavailable (Groq is asked instead)"""
+    try:
+        return chat_cache.get(question, ECOBOT_MODEL, ECOBOT_PROMPT)
+    except Exception as e:
+        print(f"EcoBot cache lookup failed: {e}")
+        return None
+
+
+def cache_ecobot_reply(question, reply, latency):
+    """Store an EcoBot answer; a cache failure never costs the student the reply"""
+    try:
+        chat_cache.put(question, ECOBOT_MODEL, reply, latency, ECOBOT_PROMPT)
+    except Exception as e:
+        print(f"EcoBot cache write failed: {e}")
+
+
+def get_ecobot_reply(question, bypass_cache=False):
+    """EcoBot answer from the shared response cache, or from Groq on a miss (or when bypassed)."""
+    if not bypass_cache:
+        cached = cached_ecobot_reply(question)
+        if cached:
+            return cached
+    started = time.perf_counter()
+    reply = get_groq_response(ECOBOT_PROMPT.format(question=question), route="chat")
+    cache_ecobot_reply(question, reply, time.perf_counter() - started)
+    return reply
+
+
+def stream_ecobot_reply(question, placeholder):
+    """Stream an EcoBot answer into a chat bubble placeholder and return the full reply.
+    Cached answers are shown at once; otherwise time to first token is recorded for diagnostics."""
+    cached = cached_ecobot_reply(question)
+    if cached:
+        return cached
+
+    started = time.perf_counter()
+    first_token = None
+    last_render = 0.0
+    parts = []
+    for token in get_groq_stream(ECOBOT_PROMPT.format(question=question), route="chat"):
+        now = time.perf_counter()
+        if first_token is None:
+            first_token = now - started
+        parts.append(token)
+        # Re-render at most ~20 times per second
+        if now - last_render > 0.05:
+            placeholder.markdown(f'<div class="chat-message assistant-message">🌿 {"".join(parts)}▌</div>', unsafe_allow_html=True)
+            last_render = now
+    reply = "".join(parts)
+    if not reply:
+        raise RuntimeError("Groq returned an empty response.")
+    total = time.perf_counter() - started
+
+    timings = st.session_state.setdefault('chat_timings', [])
+    timings.append({'ttft': first_token if first_token is not None else total, 'total': total})
+    del timings[:-20]
+    cache_ecobot_reply(question, reply, total)
+    return reply
+
+
 def parse_groq_error(msg):
     """Return a short actionable suggestion based on common Groq error messages."""
     if not msg:
@@ -323,32 +392,10 @@ def parse_groq_error(msg):
     return "No specific recommendation could be inferred. Copy the raw error (debug) and paste it here or share it with me for help."
 
 def _load_local_question(difficulty=None):
-    """Load a random question from local JSON bank and convert to AI-style output"""
-    import json
-    p = os.path.join('assets', 'questions_sustainability.json')
+    """Draw a question from the preloaded local bank (no repeats within a session until the deck runs out)"""
     try:
-        with open(p, 'r', encoding='utf-8') as f:
-            qbank = json.load(f)
-        if not qbank:
-            return None
-            
-        if difficulty:
-            # Filter by difficulty if provided (case-insensitive)
-            diff_lower = difficulty.lower()
-            filtered = [q for q in qbank if q.get('difficulty', 'medium').lower() == diff_lower]
-            sel = random.choice(filtered) if filtered else random.choice(qbank)
-        else:
-            sel = random.choice(qbank)
-            
-        letters = ['A', 'B', 'C', 'D']
-        ans_letter = letters[sel['ans']] if 'ans' in sel and isinstance(sel['ans'], int) else 'A'
-        return {
-            'q': sel.get('q', 'No question'),
-            'options': sel.get('options', []),
-            'ans': ans_letter,
-            'exp': sel.get('exp', ''),
-            'difficulty': sel.get('difficulty', 'Medium')
-        }
+        decks = st.session_state.setdefault('question_decks', {})
+        return question_bank.draw(decks, difficulty)
     except Exception as ex:
         # local fallback failed
         return None
@@ -369,25 +416,10 @@ def generate_ai_quiz_question(difficulty="Medium"):
             st.error('AI generation unavailable and local question bank could not be loaded.')
             return None
 
-    prompt = (
-        f"Generate 1 {difficulty} difficulty multiple choice question about environmental sustainability, recycling, or climate change.\n"
-        "Strictly follow this format using the pipe symbol (|) as a separator:\n"
-        "Question Text | Option A | Option B | Option C | Option D | Correct Option (A/B/C/D) | Short Explanation"
-    )
-
     try:
-        text = get_groq_response(prompt, model="llama-3.3-70b-versatile")
-
-        if text:
-            parts = text.split('|')
-            if len(parts) >= 6:
-                return {
-                    "q": parts[0].strip(),
-                    "options": [parts[1].strip(), parts[2].strip(), parts[3].strip(), parts[4].strip()],
-                    "ans": parts[5].strip().upper(),
-                    "exp": parts[6].strip() if len(parts) > 6 else "Great job saving the planet!",
-                    "difficulty": difficulty
-                }
+        q = quiz_generator.generate_question(_quiz_completion, difficulty)
+        if q:
+            return q
 
         # Unexpected or empty output - fall back to local and show brief notice
         local_q = _load_local_question(difficulty)
@@ -397,6 +429,14 @@ def generate_ai_quiz_question(difficulty="Medium"):
             return local_q
         return None
 
+    except (groq_gateway.CircuitOpenError, groq_gateway.DeadlineExceeded):
+        # Groq is degraded or too slow: go straight to the local bank without an error banner
+        local_q = _load_local_question(difficulty)
+        if local_q:
+            st.session_state['fallback_notice'] = 'Groq AI is busy — using local question bank.'
+            st.session_state['fallback_notice_time'] = time.time()
+        return local_q
+
     except Exception as e:
         msg = str(e)
         # Common invalid-key detection
@@ -414,8 +454,31 @@ def generate_ai_quiz_question(difficulty="Medium"):
             return local_q
         return None
 
-def log_action(action, points):
-    """Log student action to database and persist eco score for logged-in user"""
+def _quiz_completion(prompt, model):
+    """Completion function handed to the quiz generator; the router picks the model for the quiz route."""
+    return get_groq_response(prompt, route="quiz")
+
+def generate_quiz_set(difficulties):
+    """Generate one question per level: pooled questions first, the rest concurrently.
+    Levels the AI could not produce fall back to the local bank."""
+    api_key = st.secrets.get('GROQ_API_KEY') if hasattr(st, 'secrets') else None
+    if not groq_api or not api_key or api_key in ('YOUR_API_KEY_HERE', 'gsk_YOUR_ACTUAL_GROQ_API_KEY_HERE'):
+        return [generate_ai_quiz_question(difficulty=d) for d in difficulties]
+
+    pool = quiz_generator.get_pool(_quiz_completion)
+    questions, errors = pool.generate_set(difficulties)
+    for i, q in enumerate(questions):
+        if q is None:
+            questions[i] = _load_local_question(difficulties[i])
+            st.session_state['fallback_notice'] = (
+                f'AI generation error ({errors[0]}) — using local question bank.' if errors
+                else 'AI returned unexpected format — using local question bank.'
+            )
+            st.session_state['fallback_notice_time'] = time.time()
+    return questions
+
+def add_session_action(action, points):
+    """Add an action to this session's mission history and score (persistence is up to the caller)"""
     student_id = st.session_state.get('username', 'Student_User')
     new_data = pd.DataFrame({
         'Student_ID': [student_id], 
@@ -426,10 +489,18 @@ def log_action(action, points):
     st.session_state['student_data'] = pd.concat([st.session_state['student_data'], new_data], ignore_index=True)
     st.session_state['eco_score'] += points
 
+def log_action(action, points):
+    """Log student action to database and persist eco score for logged-in user"""
+    add_session_action(action, points)
+
     # Persist to user database if logged in
     if st.session_state.get('username'):
         try:
-            auth.update_user_score(st.session_state['username'], int(st.session_state['eco_score']))
+            # Record the delta (not the session total) so parallel sessions don't overwrite each other
+            auth.add_user_score(st.session_state['username'], points)
+            latest_score = auth.get_user_score(st.session_state['username'])
+            if latest_score is not None:
+                st.session_state['eco_score'] = latest_score
             st.session_state['user_info'] = auth.get_user_info(st.session_state['username'])
             auth.log_activity(st.session_state['username'], action, points)
         except Exception as e:
@@ -439,6 +510,394 @@ def get_game_score(game_name):
     """Retrieve actual game score from session state"""
     return st.session_state.get(f'{game_name}_score', 0)
 
+# ==========================================
+# MISSION VERIFICATION
+# ==========================================
+# Verification tasks run on verification_jobs workers, off the script thread:
+# they never call st.* and return a plain verdict dict that the mission
+# tracker renders on a later rerun.
+
+VERIFIER_BUSY = "⏳ The AI verifier is busy right now. Your evidence was not checked — please try again in a minute."
+WALKING_TIPS = "💡 **Tips:**\n- Ensure clear outdoor visibility\n- Film yourself actively walking or biking\n- Use natural lighting\n- Keep video 15-60 seconds"
+
+# Seconds between status checks while a verification is running
+VERIFICATION_POLL_SECONDS = 1.5
+
+def mission_verdict(status, response="", points=0, action=None, blocks=()):
+    """Result of a verification job.
+
+    ``status`` is evidence_index.VERIFIED / REJECTED (or "unchecked"),
+    ``response`` is the text stored for re-submissions, ``action``/``points``
+    are logged once when the job is claimed and ``blocks`` are (kind, *args)
+    display items for render_verdict.
+    """
+    return {'status': status, 'response': response, 'points': points, 'action': action, 'blocks': list(blocks)}
+
+def local_rejection(screen):
+    """Verdict for a submission rejected by the local prefilter (no model call was made)"""
+    return mission_verdict(evidence_index.REJECTED, screen.reason, blocks=[
+        ('error', f"❌ Verification Failed: {screen.reason}"),
+        ('caption', f"Checked on this device in {screen.elapsed_ms:.0f} ms — not sent to the AI verifier."),
+    ])
+
+def duplicate_verdict(match):
+    """Replay the stored verdict for a photo that was already checked (points are awarded once per photo)"""
+    blocks = [('info', f"♻️ This photo was already checked on {match['created_at']}.")]
+    if match['verdict'] == evidence_index.VERIFIED:
+        blocks.append(('warning', "⚠️ It was verified then, so no new Eco-Points are awarded. Please capture a new photo of this mission."))
+    else:
+        blocks.append(('error', f"❌ Verification Failed: {match['response']}"))
+    return mission_verdict(match['verdict'], match['response'], blocks=blocks)
+
+def record_evidence(mission, image_hashes, username, verdict, response, points=0, duplicate_of=None):
+    """Store the verdict for a checked photo so re-uploads reuse it; returns display blocks for a failure"""
+    try:
+        evidence_index.record(mission, image_hashes, username, verdict, response, points, duplicate_of)
+        return []
+    except Exception as e:
+        return [('caption', f"Could not store evidence fingerprint: {e}")]
+
+def verify_photo(mission, data, username, check):
+    """Job body for photo missions: decode once, screen locally, reuse a duplicate's verdict, else ``check(evidence)``"""
+    evidence = image_ingest.ingest(data)
+    # Blur/exposure screen first: clear failures never reach the model
+    screen = evidence_prefilter.check_photo(evidence)
+    if not screen.ok:
+        return local_rejection(screen)
+    image_hashes = evidence_index.hashes(evidence)
+    match = evidence_index.find(mission, image_hashes)
+    if match:
+        verdict = duplicate_verdict(match)
+        verdict['blocks'] += record_evidence(mission, image_hashes, username, match['verdict'], match['response'], duplicate_of=match['id'])
+        return verdict
+    verdict = check(evidence)
+    verdict['blocks'] += record_evidence(mission, image_hashes, username, verdict['status'], verdict['response'], verdict['points'])
+    return verdict
+
+def check_tree_photo(evidence):
+    prompt = (
+        "Analyze this image for a mission verification. "
+        "Is this a REAL photo of a person planting a tree? "
+        "Strictly reject AI-generated images, screenshots, digital art, or stock photos. "
+        "Look for natural lighting, realistic textures, and imperfections typical of a phone camera. "
+        "It must show a person engaged in the act of planting. "
+        "Respond with 'VERIFIED' if it passes, otherwise 'REJECTED' with a reason."
+    )
+    
+    response_text = groq_router.vision(
+        "vision", prompt, [evidence.payload()], max_tokens=1024,
+    )
+    
+    if "VERIFIED" in response_text.upper():
+        return mission_verdict(evidence_index.VERIFIED, response_text, 25, "Planted a Tree (Verified)", [
+            ('success', "✅ Verified! +25 Eco-Points added."),
+        ])
+    return mission_verdict(evidence_index.REJECTED, response_text, blocks=[
+        ('error', f"❌ Verification Failed: {response_text}"),
+    ])
+
+def check_plastic_photo(evidence):
+    prompt = (
+        "Analyze this image for a plastic recycling mission. "
+        "1. AUTHENTICITY: Is this a REAL photo captured by a camera? Reject AI-generated images, digital art, or screens. "
+        "2. MATERIAL: Is the main object made of PLASTIC? "
+        "3. RECYCLABILITY: Is it a recyclable plastic item? "
+        "If verified (Real Photo + Plastic + Recyclable), start response with 'VERIFIED|'. "
+        "Then provide the Object Name and a Quick Recycling Tip. "
+        "Example: 'VERIFIED|Plastic Water Bottle|Empty it, crush it, and put it in the blue bin.' "
+        "If rejected, start with 'REJECTED|' and explain why."
+    )
+    
+    resp = groq_router.vision(
+        "vision", prompt, [evidence.payload()], max_tokens=300,
+    )
+    
+    if "VERIFIED" in resp:
+        parts = resp.split('|')
+        if len(parts) >= 3:
+            details = f"**Object:** {parts[1].strip()}\n\n**Tip:** {parts[2].strip()}"
+        else:
+            details = resp.replace("VERIFIED", "").replace("|", " ").strip()
+        
+        return mission_verdict(evidence_index.VERIFIED, details, 15, "Recycled Plastic (Verified)", [
+            ('success', "✅ Verified! +15 Eco-Points added."),
+            ('info', f"♻️ **Analysis:**\n{details}"),
+        ])
+    reason = resp.split('|')[1] if '|' in resp else resp.replace("REJECTED", "")
+    return mission_verdict(evidence_index.REJECTED, reason, blocks=[
+        ('error', f"❌ Verification Failed: {reason}"),
+    ])
+
+def check_electricity_photo(evidence):
+    prompt = (
+        "Analyze this image for a 'Saved Electricity' mission. "
+        "1. AUTHENTICITY: Is this a REAL photo? Reject AI-generated, digital art, or screens. "
+        "2. LIGHTING: Is the environment dark or light? Suggest turning off lights if bright, or on if too dark. "
+        "3. SWITCH/CHARGER STATUS: Look at the electric socket/switch. "
+        "   - Is the switch ON or OFF? "
+        "   - Is a charger plugged in? Is a mobile connected? "
+        "4. SCENARIO EVALUATION: "
+        "   - If Switch is ON + Charger plugged + NO Mobile = WASTEFUL (Phantom Load). "
+        "   - If Switch is ON + No device = WASTEFUL. "
+        "   - If Switch is OFF = GOOD (Saved Electricity). "
+        "   - If Switch is ON + Device Charging = NEUTRAL (Usage). "
+        "5. ENERGY: Estimate power consumption/waste in Watts. "
+        "RESPONSE FORMAT: "
+        "Start with 'VERIFIED_PASS|' if (Switch OFF) or (Good behavior). "
+        "Start with 'VERIFIED_FAIL|' if (Switch ON + Wasteful). "
+        "Start with 'REJECTED|' if fake. "
+        "Follow with: Message|Energy_Estimate. "
+        "Example: 'VERIFIED_FAIL|Switch is ON with charger but no phone. Please switch off the key!|Wasted: ~0.5 Watts' "
+        "Example: 'VERIFIED_PASS|Switch is OFF. Excellent habit!|Saved: ~0.5 Watts'"
+    )
+    
+    resp = groq_router.vision(
+        "vision", prompt, [evidence.payload()], max_tokens=300,
+    )
+    
+    if "VERIFIED_PASS" in resp:
+        parts = resp.split('|')
+        msg = parts[1] if len(parts) > 1 else "Good job!"
+        energy = parts[2] if len(parts) > 2 else "Saved energy"
+        
+        return mission_verdict(evidence_index.VERIFIED, msg, 15, "Saved Electricity (Verified)", [
+            ('success', "✅ Verified! +15 Eco-Points added."),
+            ('info', f"💡 **Analysis:** {msg}"),
+            ('metric', "⚡ Energy Impact", energy),
+        ])
+    if "VERIFIED_FAIL" in resp:
+        parts = resp.split('|')
+        msg = parts[1] if len(parts) > 1 else "Please switch off."
+        energy = parts[2] if len(parts) > 2 else "Wasted energy"
+        
+        return mission_verdict(evidence_index.REJECTED, msg, blocks=[
+            ('warning', f"⚠️ **Action Needed:** {msg}"),
+            ('error', "❌ No points awarded. Switch off the key/switch when not in use!"),
+            ('metric', "⚡ Energy Consumption", energy),
+        ])
+    reason = resp.split('|')[1] if '|' in resp else resp.replace("REJECTED", "")
+    return mission_verdict(evidence_index.REJECTED, reason, blocks=[
+        ('error', f"❌ Verification Failed: {reason}"),
+    ])
+
+def check_compost_photo(classifier, evidence):
+    result = classifier.classify_food(evidence)
+    message = result.get('message', '')
+    
+    # ❌ NOT A REAL IMAGE
+    if not result.get('is_real', True):
+        return mission_verdict(evidence_index.REJECTED, message, blocks=[('error', "🤖 " + message)])
+    # ❌ NOT FOOD AT ALL
+    if not result.get('is_food', True):
+        return mission_verdict(evidence_index.REJECTED, message, blocks=[
+            ('error', "🚫 " + message),
+            ('info', "Please upload an image of actual food items!"),
+        ])
+    # ❌ FOOD BUT NOT COMPOSTABLE
+    if not result.get('is_compostable', False):
+        return mission_verdict(evidence_index.REJECTED, message, blocks=[
+            ('warning', "⚠️ " + message),
+            ('metric', "🌟 Eco Points", "0 (Not awarded)"),
+            ('info', "💡 **Tip:** Only raw, uncooked fruits, vegetables, and grains can be composted. Avoid cooked meals, meat, dairy, and processed foods!"),
+        ])
+    
+    # ✅ COMPOSTABLE FOOD - AWARD FIXED 20 POINTS (consistent with points_map)
+    composted_points = 20
+    blocks = [
+        ('success', "✅ " + message),
+        ('metrics', [["🍽️ Food", result['food_name']], ["🌟 Eco Points", f"+{composted_points} 🎉"]]),
+        ('markdown', f"**Category:** {result['category']}"),
+        ('markdown', f"**Confidence:** {result['confidence']:.1f}%"),
+        ('markdown', f"**Carbon Footprint:** {result['carbon_footprint']} kg CO₂"),
+    ]
+    
+    # Groq Insights (optional: the verdict stands without them)
+    if groq_api:
+        prompt = f"""
+        Explain why this food is compostable in English (short & friendly):
+        Food: {result['food_name']}
+        Confidence: {result['confidence']:.0f}%
+        Category: {result['category']}
+        
+        Give me in English (50-100 words):
+        1. Why it's compostable
+        2. How to compost it
+        3. Environmental benefits
+        Keep it SHORT, conversational English, use emojis!
+        """
+        try:
+            insights = get_groq_response(prompt, route="insights")
+            blocks.append(('html', f'<div class="eco-card" style="background: #e3f2fd; border-left: 5px solid #4caf50;"><strong>🎙️ Eco Insights:</strong><br>{insights}</div>'))
+        except Exception:
+            pass
+    
+    return mission_verdict(evidence_index.VERIFIED, message, composted_points, f"Composted Food ({result['food_name']})", blocks)
+
+def verify_walking_video(data):
+    """Job body for the walking mission: probe, sample keyframes, screen motion, then the vision model"""
+    # Probe in memory (no temp file), then decode only the sampled keyframes
+    info = video_sampler.probe(data)
+    duration = info.duration
+    
+    # Check video duration (should be 15-60 seconds)
+    if duration < 10 or duration > 120:
+        return mission_verdict(evidence_index.REJECTED, "duration", blocks=[
+            ('error', f"❌ Video duration is {duration:.1f} seconds. Please upload a video between 15-60 seconds."),
+        ])
+    
+    # Frame count adapts to length; frames keep their aspect ratio
+    clip = video_sampler.sample(data, info)
+    sampled = ('caption', f"🎞️ Sampled {len(clip.frames)} frames from a {duration:.0f}s video in {info.scan_ms + clip.decode_ms:.0f} ms")
+    if not clip.frames:
+        return mission_verdict(evidence_index.REJECTED, "no frames", blocks=[
+            sampled, ('error', "Could not extract frames from video. Try a different video format."),
+        ])
+    
+    # Motion screen: static or unlit videos are rejected without a model call
+    screen = evidence_prefilter.check_video(clip.frames)
+    if not screen.ok:
+        verdict = local_rejection(screen)
+        verdict['blocks'] = [sampled] + verdict['blocks'] + [('warning', WALKING_TIPS)]
+        return verdict
+    
+    prompt = (
+        "Analyze these video frames for a 'Walking to School' mission verification. "
+        "Requirements:\n"
+        "1. AUTHENTICITY: Are these REAL video frames or AI-generated/fake? "
+        "   Look for natural motion blur, realistic lighting, and video artifacts.\n"
+        "2. ACTIVITY DETECTION: Does the person appear to be WALKING? "
+        "   Look for body posture and leg movement while walking.\n"
+        "3. ENVIRONMENT: Is this outdoors? Look for sky, trees, buildings, roads, or vehicles.\n"
+        "4. MOTION CONSISTENCY: Do frames show progression of movement (not static)?\n"
+        "\n"
+        "RESPONSE FORMAT:\n"
+        "Start with 'VERIFIED|' if (Real Video + Walking Activity + Outdoor Environment + Motion Detected)\n"
+        "Start with 'REJECTED|' if fake, indoors, or no walking detected.\n"
+        "Follow with: Description|Activity_Type|Energy_Estimate\n"
+        "\n"
+        "Example: 'VERIFIED|Clear walking motion detected outdoors|Walking|Burned ~50 calories, Saved ~500g CO2'\n"
+        "Example: 'REJECTED|Frames appear AI-generated or person is stationary indoors'"
+    )
+    
+    # One request carrying every extracted frame
+    resp = groq_router.vision(
+        "vision", prompt, clip.payloads(), max_tokens=500,
+    )
+    
+    if "VERIFIED" in resp:
+        parts = resp.split('|')
+        description = parts[1] if len(parts) > 1 else "Great job!"
+        activity = parts[2] if len(parts) > 2 else "Walking"
+        energy = parts[3] if len(parts) > 3 else "Energy saved"
+        
+        return mission_verdict(evidence_index.VERIFIED, description, 10, "Walked to School (Verified)", [
+            sampled,
+            ('success', "✅ Verified! +10 Eco-Points added."),
+            ('info', f"🚶 **Analysis:** {description}\n\n**Activity:** {activity}\n\n⚡ **Impact:** {energy}"),
+        ])
+    reason = resp.split('|')[1] if '|' in resp else resp.replace("REJECTED", "")
+    return mission_verdict(evidence_index.REJECTED, reason, blocks=[
+        sampled,
+        ('error', f"❌ Verification Failed: {reason}"),
+        ('warning', WALKING_TIPS),
+    ])
+
+def run_verification(task, *args):
+    """Job body wrapper: a busy or timed-out verifier is an unchecked verdict, not a job failure"""
+    try:
+        return task(*args)
+    except (groq_gateway.CircuitOpenError, groq_gateway.DeadlineExceeded):
+        return mission_verdict("unchecked", blocks=[('warning', VERIFIER_BUSY)])
+
+def submit_verification(mission, task, *args):
+    """Queue a verification job for the current user; its verdict shows on later reruns"""
+    username = st.session_state.get('username', 'Student_User')
+    try:
+        job_id = verification_jobs.submit(username, mission, run_verification, task, *args)
+    except verification_jobs.QueueFull:
+        st.warning("⏳ Many verifications are running right now. Please try again in a minute.")
+        return
+    st.session_state.setdefault('verification_jobs', {})[mission] = job_id
+
+def apply_finished_verifications():
+    """Award points for this user's finished verification jobs, exactly once across reruns, reloads and sessions"""
+    username = st.session_state.get('username')
+    if not username:
+        return
+    try:
+        jobs = verification_jobs.unclaimed(username)
+    except Exception as e:
+        st.warning(f"Could not load verification results: {e}")
+        return
+    shown = st.session_state.setdefault('verification_jobs', {})
+    awarded = False
+    for job in jobs:
+        # After a reload, show the jobs this user has not seen yet
+        shown.setdefault(job['mission'], job['id'])
+        if job['status'] in verification_jobs.PENDING:
+            continue
+        try:
+            # The claim, the ledger delta and the activity row commit together
+            if not verification_jobs.claim(job['id']):
+                continue
+        except Exception as e:
+            st.warning(f"Could not save verification points (will retry): {e}")
+            continue
+        if job['action'] and job['points'] > 0:
+            points = int(job['points']) if float(job['points']).is_integer() else job['points']
+            add_session_action(job['action'], points)
+            st.toast(f"✅ {job['action']}: +{points} Eco-Points")
+            awarded = True
+    if awarded:
+        st.balloons()
+        try:
+            latest_score = auth.get_user_score(username)
+            if latest_score is not None:
+                st.session_state['eco_score'] = latest_score
+            st.session_state['user_info'] = auth.get_user_info(username)
+        except Exception as e:
+            st.warning(f"Could not refresh eco score: {e}")
+
+def render_verdict(verdict):
+    for kind, *args in verdict['blocks']:
+        if kind == 'metric':
+            st.metric(*args)
+        elif kind == 'metrics':
+            for col, (label, value) in zip(st.columns(len(args[0])), args[0]):
+                col.metric(label, value)
+        elif kind == 'html':
+            st.markdown(args[0], unsafe_allow_html=True)
+        elif kind in ('success', 'info', 'warning', 'error', 'caption', 'markdown'):
+            getattr(st, kind)(*args)
+
+_fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+
+def watch_verification(job_id):
+    """Status of a running job; reruns the app once it finishes (polls on its own where fragments exist)"""
+    job = verification_jobs.get(job_id)
+    if job is None or job['status'] not in verification_jobs.PENDING:
+        st.rerun()
+    label = "waiting for a verifier" if job['status'] == verification_jobs.QUEUED else "checking your evidence"
+    st.info(f"⏳ Verification in progress ({label}, submitted {job['created_at'][11:]}). You can keep using the app — the result will appear here.")
+    if _fragment is None:
+        st.button("🔄 Check status", key=f"poll_{job_id}")
+
+if _fragment is not None:
+    watch_verification = _fragment(run_every=VERIFICATION_POLL_SECONDS)(watch_verification)
+
+def show_verification(mission):
+    """Latest verification of this mission for the session: progress, verdict or error"""
+    job_id = st.session_state.get('verification_jobs', {}).get(mission)
+    job = verification_jobs.get(job_id) if job_id else None
+    if job is None:
+        return
+    if job['status'] in verification_jobs.PENDING:
+        watch_verification(job_id)
+    elif job['status'] == verification_jobs.FAILED:
+        st.error(f"Verification Error: {job['error']}")
+    else:
+        render_verdict(job['result'])
+
 # ==========================================
 # FOOD ANALYZER CONSTANTS & CLASSES
 # ==========================================
@@ -487,30 +946,29 @@ class EcoFoodClassifier:
     def __init__(self):
         self.model = load_efficientnet()
         
-    def preprocess_image(self, image_path):
-        img = tf.keras.preprocessing.image.load_img(image_path, target_size=(224, 224))
-        img_array = tf.keras.preprocessing.image.img_to_array(img)
-        img_array = np.expand_dims(img_array, axis=0)
-        return preprocess_input(img_array)
-    
-    def detect_ai_generated(self, image_path):
-        img = cv2.imread(image_path)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-        return (True, laplacian_var) if laplacian_var < 50 else (False, laplacian_var)
-    
-    def classify_food(self, image_path):
+    def preprocess_image(self, image):
+        """EfficientNet input from an ingested upload (no second decode)"""
+        return preprocess_input(image.model_input(224))
+    
+    def detect_ai_generated(self, image):
+        laplacian_var = image.laplacian_variance()
+        return (True, laplacian_var) if laplacian_var < evidence_prefilter.BLUR_SUSPECT else (False, laplacian_var)
+    
+    def classify_food(self, image):
         """
         Classify food and verify if it's compostable.
         Only compostable foods get eco points.
+        ``image`` is an image_ingest.IngestedImage (a file path is also accepted).
         """
-        is_ai, ai_score = self.detect_ai_generated(image_path)
+        if isinstance(image, str):
+            image = image_ingest.ingest_file(image)
+        is_ai, ai_score = self.detect_ai_generated(image)
         
-        if is_ai and ai_score < 30:
+        if is_ai and ai_score < evidence_prefilter.BLUR_REJECT:
             return {'is_real': False, 'is_food': False, 'is_compostable': False, 'ai_score': ai_score,
                     'message': '🤖 AI-generated image! (Not real)'}
         
-        img_array = self.preprocess_image(image_path)
+        img_array = self.preprocess_image(image)
         predictions = self.model.predict(img_array, verbose=0)
         decoded = decode_predictions(predictions, top=5)[0]
         
@@ -583,8 +1041,7 @@ def chat_interface():
             if st.button("Retry last prompt", key="retry_prompt"):
                 with st.spinner("Retrying last prompt..."):
                     try:
-                        ai_prompt = f"You are EcoBot, a fun sustainability expert for students. Keep it short (2-3 sentences) and encouraging. Answer: {st.session_state['last_prompt']}"
-                        reply = get_groq_response(ai_prompt)
+                        reply = get_ecobot_reply(st.session_state['last_prompt'], bypass_cache=True)
                         if reply:
                             st.session_state['messages'].append({"role": "assistant", "content": reply})
                             st.success("Retry successful — response added to chat.")
@@ -594,6 +1051,31 @@ def chat_interface():
                         st.session_state['last_groq_error'] = str(e)
                         st.error(f"Retry failed: {st.session_state['last_groq_error']}")
 
+        cache_stats = chat_cache.get_stats()
+        st.write(
+            f"**Response cache:** {cache_stats['entries']} answers · "
+            f"hit ratio {cache_stats['hit_ratio'] * 100:.0f}% ({cache_stats['hits']}/{cache_stats['lookups']}) · "
+            f"{cache_stats['saved_seconds']:.1f}s of model time saved"
+        )
+
+        if groq_api:
+            gateway_stats = groq_api.stats()
+            chat_route = groq_router.stats()['chat'] if gateway_stats['routes'].get('chat') else None
+            st.write(
+                f"**Gateway:** breaker {gateway_stats['breaker']}"
+                + (f" · chat on {chat_route['model']}, p95 {chat_route['p95_ms']:.0f} ms, "
+                   f"{chat_route['hedges']} hedged, {chat_route['deadline_misses']} over budget" if chat_route else "")
+            )
+
+        timings = st.session_state.get('chat_timings')
+        if timings:
+            ttfts = sorted(t['ttft'] for t in timings)
+            st.write(
+                f"**Streaming:** first token in {timings[-1]['ttft'] * 1000:.0f} ms, "
+                f"full answer in {timings[-1]['total']:.2f}s (last) · "
+                f"median first token {ttfts[len(ttfts) // 2] * 1000:.0f} ms over {len(ttfts)} answers"
+            )
+
         if st.session_state.get('last_groq_error'):
             if st.checkbox("Show raw error (debug)", key="show_raw_err"):
                 st.code(st.session_state['last_groq_error'])
@@ -607,23 +1089,36 @@ def chat_interface():
         else:
             st.markdown(f'<div class="chat-message assistant-message">🌿 {msg["content"]}</div>', unsafe_allow_html=True)
 
+    # Regenerate the last answer, skipping the shared response cache
+    messages = st.session_state.messages
+    if len(messages) >= 2 and messages[-1]["role"] == "assistant" and messages[-2]["role"] == "user":
+        if st.button("🔄 Regenerate answer", key="regenerate_answer"):
+            with st.spinner("EcoBot is thinking... 🌱"):
+                try:
+                    messages[-1] = {"role": "assistant", "content": get_ecobot_reply(messages[-2]["content"], bypass_cache=True)}
+                    st.rerun()
+                except Exception as e:
+                    st.session_state['last_groq_error'] = str(e)
+                    st.error(f"Groq error: {st.session_state['last_groq_error']} (see diagnostics)")
+
     # Chat input
     if prompt := st.chat_input("How can I recycle glass?"):
         st.session_state.messages.append({"role": "user", "content": prompt})
 
-        with st.spinner("EcoBot is thinking... 🌱"):
-            try:
-                ai_prompt = f"You are EcoBot, a fun sustainability expert for students. Keep it short (2-3 sentences) and encouraging. Answer: {prompt}"
-                reply = get_groq_response(ai_prompt)
-            except Exception as e:
-                # Store the raw error and last prompt for diagnostics and show a friendly message to the user
-                st.session_state['last_groq_error'] = str(e)
-                st.session_state['last_prompt'] = prompt
-                st.session_state['last_error_time'] = time.time()
-                reply = "I'm having trouble connecting to the nature network. Try the 'Test Groq Connection' in the diagnostics or check your API key. 🌍"
-                # Also display a brief, non-sensitive notice in the UI for quick help
-                st.error(f"Groq error: {st.session_state.get('last_groq_error', 'Unknown error')} (see diagnostics)")
-        
+        st.markdown(f'<div class="chat-message user-message">{prompt}</div>', unsafe_allow_html=True)
+        answer_box = st.empty()
+        answer_box.markdown('<div class="chat-message assistant-message">🌿 EcoBot is thinking... 🌱</div>', unsafe_allow_html=True)
+        try:
+            reply = stream_ecobot_reply(prompt, answer_box)
+        except Exception as e:
+            # Store the raw error and last prompt for diagnostics and show a friendly message to the user
+            st.session_state['last_groq_error'] = str(e)
+            st.session_state['last_prompt'] = prompt
+            st.session_state['last_error_time'] = time.time()
+            reply = "I'm having trouble connecting to the nature network. Try the 'Test Groq Connection' in the diagnostics or check your API key. 🌍"
+            # Also display a brief, non-sensitive notice in the UI for quick help
+            st.error(f"Groq error: {st.session_state.get('last_groq_error', 'Unknown error')} (see diagnostics)")
+    
         st.session_state.messages.append({"role": "assistant", "content": reply})
         st.rerun()
 
@@ -653,8 +1148,9 @@ def quiz_interface():
                         ("Hard", "🌱 1,00,000")
                     ]
                     
-                    for diff, prize in levels:
-                        q_data = generate_ai_quiz_question(difficulty=diff)
+                    # All levels at once (prefetched or generated concurrently)
+                    generated = generate_quiz_set([diff for diff, _ in levels])
+                    for (diff, prize), q_data in zip(levels, generated):
                         if q_data:
                             q_data['prize'] = prize
                             qs.append(q_data)
@@ -748,80 +1244,19 @@ def mission_tracker():
         }
         st.metric(label="Points Value", value=points_map[action])
     
+    username = st.session_state.get('username', 'Student_User')
+    
     if action == "Planted a Tree":
         st.info("📸 **Verification Required:** Please upload a real photo of you planting the tree. AI-generated or fake images will be rejected.")
         uploaded_file = st.file_uploader("Upload Evidence", type=['jpg', 'jpeg', 'png'])
         
         if uploaded_file is not None:
             if st.button("🔍 Verify & Log Mission", key="verify_mission"):
-                with st.spinner("🤖 Verifying image authenticity..."):
-                    try:
-                        if not groq_client:
-                            st.error("Groq API Key not configured or client initialization failed.")
-                        else:
-                            # Resize image to max 1024x1024 to ensure API compatibility and speed
-                            image = Image.open(uploaded_file)
-                            image.thumbnail((1024, 1024))
-                            
-                            # Convert back to bytes for base64 encoding
-                            img_byte_arr = io.BytesIO()
-                            # Default to JPEG if format is not detected
-                            fmt = image.format if image.format else 'JPEG'
-                            image.save(img_byte_arr, format=fmt)
-                            base64_image = base64.b64encode(img_byte_arr.getvalue()).decode('utf-8')
-                            mime_type = uploaded_file.type
-                            
-                            prompt = (
-                                "Analyze this image for a mission verification. "
-                                "Is this a REAL photo of a person planting a tree? "
-                                "Strictly reject AI-generated images, screenshots, digital art, or stock photos. "
-                                "Look for natural lighting, realistic textures, and imperfections typical of a phone camera. "
-                                "It must show a person engaged in the act of planting. "
-                                "Respond with 'VERIFIED' if it passes, otherwise 'REJECTED' with a reason."
-                            )
-                            
-                            completion = None
-                            # Retry logic for 503 Service Unavailable / Over Capacity
-                            for attempt in range(3):
-                                try:
-                                    completion = groq_client.chat.completions.create(
-                                        model="meta-llama/llama-4-scout-17b-16e-instruct",
-                                        messages=[
-                                            {
-                                                "role": "user",
-                                                "content": [
-                                                    {"type": "text", "text": prompt},
-                                                    {
-                                                        "type": "image_url",
-                                                        "image_url": {
-                                                            "url": f"data:{mime_type};base64,{base64_image}",
-                                                        },
-                                                    },
-                                                ],
-                                            }
-                                        ],
-                                        temperature=0.1,
-                                        max_tokens=1024,
-                                    )
-                                    break
-                                except Exception as e:
-                                    if ("503" in str(e) or "over capacity" in str(e).lower()) and attempt < 2:
-                                        time.sleep(2 ** (attempt + 1))
-                                        continue
-                                    raise e
-                            
-                            response_text = completion.choices[0].message.content
-                            
-                            if "VERIFIED" in response_text.upper():
-                                log_action("Planted a Tree (Verified)", 25)
-                                st.success("✅ Verified! +25 Eco-Points added.")
-                                st.balloons()
-                                time.sleep(2)
-                                st.rerun()
-                            else:
-                                st.error(f"❌ Verification Failed: {response_text}")
-                    except Exception as e:
-                        st.error(f"Verification Error: {str(e)}")
+                if not groq_api:
+                    st.error("Groq API Key not configured or client initialization failed.")
+                else:
+                    submit_verification(action, verify_photo, action, uploaded_file.getvalue(), username, check_tree_photo)
+        show_verification(action)
     
     elif action == "Walking to School":
         st.info("🎥 **Verification Required:** Upload a SHORT VIDEO (15-60 seconds) of you walking to school. We'll verify it's real using AI!")
@@ -832,132 +1267,11 @@ def mission_tracker():
         if video_file is not None:
             st.video(video_file)
             if st.button("🔍 Verify Video & Log Mission", key="verify_walked"):
-                with st.spinner("🤖 Analyzing video for walking activity..."):
-                    try:
-                        if not groq_client:
-                            st.error("Groq API Key not configured or client initialization failed.")
-                        else:
-                            
-                            # Save uploaded video to temp file
-                            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
-                                tmp_file.write(video_file.getbuffer())
-                                tmp_path = tmp_file.name
-                            
-                            try:
-                                # Open video and extract key frames
-                                cap = cv2.VideoCapture(tmp_path)
-                                total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                                fps = cap.get(cv2.CAP_PROP_FPS)
-                                duration = total_frames / fps if fps > 0 else 0
-                                
-                                # Check video duration (should be 15-60 seconds)
-                                if duration < 10 or duration > 120:
-                                    st.error(f"❌ Video duration is {duration:.1f} seconds. Please upload a video between 15-60 seconds.")
-                                    cap.release()
-                                else:
-                                    # Extract 3 key frames from different parts of video
-                                    frames_to_extract = [
-                                        int(total_frames * 0.25),
-                                        int(total_frames * 0.5),
-                                        int(total_frames * 0.75)
-                                    ]
-                                    
-                                    extracted_frames = []
-                                    frame_analysis = []
-                                    
-                                    for frame_idx in frames_to_extract:
-                                        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-                                        ret, frame = cap.read()
-                                        
-                                        if ret:
-                                            # Resize frame for API compatibility
-                                            frame = cv2.resize(frame, (512, 512))
-                                            extracted_frames.append(frame)
-                                            
-                                            # Convert frame to base64
-                                            _, buffer = cv2.imencode('.jpg', frame)
-                                            base64_frame = base64.b64encode(buffer).decode('utf-8')
-                                            frame_analysis.append(base64_frame)
-                                    
-                                    cap.release()
-                                    
-                                    if not frame_analysis:
-                                        st.error("Could not extract frames from video. Try a different video format.")
-                                    else:
-                                        # Analyze frames with Groq
-                                        prompt = (
-                                            "Analyze these video frames for a 'Walking to School' mission verification. "
-                                            "Requirements:\n"
-                                            "1. AUTHENTICITY: Are these REAL video frames or AI-generated/fake? "
-                                            "   Look for natural motion blur, realistic lighting, and video artifacts.\n"
-                                            "2. ACTIVITY DETECTION: Does the person appear to be WALKING? "
-                                            "   Look for body posture and leg movement while walking.\n"
-                                            "3. ENVIRONMENT: Is this outdoors? Look for sky, trees, buildings, roads, or vehicles.\n"
-                                            "4. MOTION CONSISTENCY: Do frames show progression of movement (not static)?\n"
-                                            "\n"
-                                            "RESPONSE FORMAT:\n"
-                                            "Start with 'VERIFIED|' if (Real Video + Walking Activity + Outdoor Environment + Motion Detected)\n"
-                                            "Start with 'REJECTED|' if fake, indoors, or no walking detected.\n"
-                                            "Follow with: Description|Activity_Type|Energy_Estimate\n"
-                                            "\n"
-                                            "Example: 'VERIFIED|Clear walking motion detected outdoors|Walking|Burned ~50 calories, Saved ~500g CO2'\n"
-                                            "Example: 'REJECTED|Frames appear AI-generated or person is stationary indoors'"
-                                        )
-                                        
-                                        # Build message with multiple image frames
-                                        content = [{"type": "text", "text": prompt}]
-                                        for base64_frame in frame_analysis:
-                                            content.append({
-                                                "type": "image_url",
-                                                "image_url": {"url": f"data:image/jpeg;base64,{base64_frame}"}
-                                            })
-                                        
-                                        completion = None
-                                        for attempt in range(3):
-                                            try:
-                                                completion = groq_client.chat.completions.create(
-                                                    model="meta-llama/llama-4-scout-17b-16e-instruct",
-                                                    messages=[{"role": "user", "content": content}],
-                                                    temperature=0.1,
-                                                    max_tokens=500,
-                                                )
-                                                break
-                                            except Exception as e:
-                                                if ("503" in str(e) or "over capacity" in str(e).lower()) and attempt < 2:
-                                                    time.sleep(2 ** (attempt + 1))
-                                                    continue
-                                                raise e
-                                        
-                                        resp = completion.choices[0].message.content
-                                        
-                                        if "VERIFIED" in resp:
-                                            parts = resp.split('|')
-                                            description = parts[1] if len(parts) > 1 else "Great job!"
-                                            activity = parts[2] if len(parts) > 2 else "Walking"
-                                            energy = parts[3] if len(parts) > 3 else "Energy saved"
-                                            
-                                            log_action("Walked to School (Verified)", 10)
-                                            st.success("✅ Verified! +10 Eco-Points added.")
-                                            st.info(f"🚶 **Analysis:** {description}\n\n**Activity:** {activity}\n\n⚡ **Impact:** {energy}")
-                                            st.balloons()
-                                            time.sleep(3)
-                                            st.rerun()
-                                        else:
-                                            reason = resp.split('|')[1] if '|' in resp else resp.replace("REJECTED", "")
-                                            st.error(f"❌ Verification Failed: {reason}")
-                                            st.warning("💡 **Tips:**\n- Ensure clear outdoor visibility\n- Film yourself actively walking or biking\n- Use natural lighting\n- Keep video 15-60 seconds")
-                            
-                            finally:
-                                # Clean up temp file
-                                try:
-                                    os.remove(tmp_path)
-                                except:
-                                    pass
-                                    
-                    except ImportError:
-                        st.error("⚠️ OpenCV not installed. Please run: pip install opencv-python")
-                    except Exception as e:
-                        st.error(f"Verification Error: {str(e)}")
+                if not groq_api:
+                    st.error("Groq API Key not configured or client initialization failed.")
+                else:
+                    submit_verification(action, verify_walking_video, video_file.getvalue())
+        show_verification(action)
     
     elif action == "Recycled Plastic":
         st.info("📸 **Verification Required:** Capture or upload a photo of the plastic item. We'll verify it's real and recyclable!")
@@ -973,79 +1287,11 @@ def mission_tracker():
         if img_file:
             st.image(img_file, caption="Item to Verify", width=300)
             if st.button("🔍 Verify & Recycle", key="verify_plastic"):
-                with st.spinner("🤖 Analyzing image authenticity and plastic type..."):
-                    try:
-                        if not groq_client:
-                            st.error("Groq API Key not configured.")
-                        else:
-                            # Prepare image
-                            image = Image.open(img_file)
-                            image.thumbnail((1024, 1024))
-                            img_byte_arr = io.BytesIO()
-                            fmt = image.format if image.format else 'JPEG'
-                            image.save(img_byte_arr, format=fmt)
-                            base64_image = base64.b64encode(img_byte_arr.getvalue()).decode('utf-8')
-                            
-                            prompt = (
-                                "Analyze this image for a plastic recycling mission. "
-                                "1. AUTHENTICITY: Is this a REAL photo captured by a camera? Reject AI-generated images, digital art, or screens. "
-                                "2. MATERIAL: Is the main object made of PLASTIC? "
-                                "3. RECYCLABILITY: Is it a recyclable plastic item? "
-                                "If verified (Real Photo + Plastic + Recyclable), start response with 'VERIFIED|'. "
-                                "Then provide the Object Name and a Quick Recycling Tip. "
-                                "Example: 'VERIFIED|Plastic Water Bottle|Empty it, crush it, and put it in the blue bin.' "
-                                "If rejected, start with 'REJECTED|' and explain why."
-                            )
-                            
-                            completion = None
-                            # Retry logic for 503 Service Unavailable / Over Capacity
-                            for attempt in range(3):
-                                try:
-                                    completion = groq_client.chat.completions.create(
-                                        model="meta-llama/llama-4-scout-17b-16e-instruct",
-                                        messages=[
-                                            {
-                                                "role": "user",
-                                                "content": [
-                                                    {"type": "text", "text": prompt},
-                                                    {
-                                                        "type": "image_url",
-                                                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-                                                    },
-                                                ],
-                                            }
-                                        ],
-                                        temperature=0.1,
-                                        max_tokens=300,
-                                    )
-                                    break
-                                except Exception as e:
-                                    if ("503" in str(e) or "over capacity" in str(e).lower()) and attempt < 2:
-                                        time.sleep(2 ** (attempt + 1))
-                                        continue
-                                    raise e
-                            
-                            resp = completion.choices[0].message.content
-                            
-                            if "VERIFIED" in resp:
-                                parts = resp.split('|')
-                                if len(parts) >= 3:
-                                    details = f"**Object:** {parts[1].strip()}\n\n**Tip:** {parts[2].strip()}"
-                                else:
-                                    details = resp.replace("VERIFIED", "").replace("|", " ").strip()
-                                
-                                log_action("Recycled Plastic (Verified)", 15)
-                                st.success("✅ Verified! +15 Eco-Points added.")
-                                st.info(f"♻️ **Analysis:**\n{details}")
-                                st.balloons()
-                                time.sleep(4)
-                                st.rerun()
-                            else:
-                                reason = resp.split('|')[1] if '|' in resp else resp.replace("REJECTED", "")
-                                st.error(f"❌ Verification Failed: {reason}")
-                                
-                    except Exception as e:
-                        st.error(f"Verification Error: {str(e)}")
+                if not groq_api:
+                    st.error("Groq API Key not configured.")
+                else:
+                    submit_verification(action, verify_photo, action, img_file.getvalue(), username, check_plastic_photo)
+        show_verification(action)
 
     elif action == "Saved Electricity":
         st.info("📸 **Verification Required:** Capture the electric board/switch to verify energy saving.")
@@ -1062,96 +1308,11 @@ def mission_tracker():
         if img_file:
             st.image(img_file, caption="Evidence", width=300)
             if st.button("🔍 Verify & Save Energy", key="verify_elec"):
-                with st.spinner("⚡ Analyzing energy usage and authenticity..."):
-                    try:
-                        if not groq_client:
-                            st.error("Groq API Key not configured.")
-                        else:
-                            # Prepare image
-                            image = Image.open(img_file)
-                            image.thumbnail((1024, 1024))
-                            img_byte_arr = io.BytesIO()
-                            fmt = image.format if image.format else 'JPEG'
-                            image.save(img_byte_arr, format=fmt)
-                            base64_image = base64.b64encode(img_byte_arr.getvalue()).decode('utf-8')
-                            
-                            prompt = (
-                                "Analyze this image for a 'Saved Electricity' mission. "
-                                "1. AUTHENTICITY: Is this a REAL photo? Reject AI-generated, digital art, or screens. "
-                                "2. LIGHTING: Is the environment dark or light? Suggest turning off lights if bright, or on if too dark. "
-                                "3. SWITCH/CHARGER STATUS: Look at the electric socket/switch. "
-                                "   - Is the switch ON or OFF? "
-                                "   - Is a charger plugged in? Is a mobile connected? "
-                                "4. SCENARIO EVALUATION: "
-                                "   - If Switch is ON + Charger plugged + NO Mobile = WASTEFUL (Phantom Load). "
-                                "   - If Switch is ON + No device = WASTEFUL. "
-                                "   - If Switch is OFF = GOOD (Saved Electricity). "
-                                "   - If Switch is ON + Device Charging = NEUTRAL (Usage). "
-                                "5. ENERGY: Estimate power consumption/waste in Watts. "
-                                "RESPONSE FORMAT: "
-                                "Start with 'VERIFIED_PASS|' if (Switch OFF) or (Good behavior). "
-                                "Start with 'VERIFIED_FAIL|' if (Switch ON + Wasteful). "
-                                "Start with 'REJECTED|' if fake. "
-                                "Follow with: Message|Energy_Estimate. "
-                                "Example: 'VERIFIED_FAIL|Switch is ON with charger but no phone. Please switch off the key!|Wasted: ~0.5 Watts' "
-                                "Example: 'VERIFIED_PASS|Switch is OFF. Excellent habit!|Saved: ~0.5 Watts'"
-                            )
-                            
-                            completion = None
-                            for attempt in range(3):
-                                try:
-                                    completion = groq_client.chat.completions.create(
-                                        model="meta-llama/llama-4-scout-17b-16e-instruct",
-                                        messages=[
-                                            {
-                                                "role": "user",
-                                                "content": [
-                                                    {"type": "text", "text": prompt},
-                                                    {
-                                                        "type": "image_url",
-                                                        "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-                                                    },
-                                                ],
-                                            }
-                                        ],
-                                        temperature=0.1,
-                                        max_tokens=300,
-                                    )
-                                    break
-                                except Exception as e:
-                                    if ("503" in str(e) or "over capacity" in str(e).lower()) and attempt < 2:
-                                        time.sleep(2 ** (attempt + 1))
-                                        continue
-                                    raise e
-                            
-                            resp = completion.choices[0].message.content
-                            
-                            if "VERIFIED_PASS" in resp:
-                                parts = resp.split('|')
-                                msg = parts[1] if len(parts) > 1 else "Good job!"
-                                energy = parts[2] if len(parts) > 2 else "Saved energy"
-                                
-                                log_action("Saved Electricity (Verified)", 15)
-                                st.success("✅ Verified! +15 Eco-Points added.")
-                                st.info(f"💡 **Analysis:** {msg}")
-                                st.metric("⚡ Energy Impact", energy)
-                                st.balloons()
-                                time.sleep(4)
-                                st.rerun()
-                            elif "VERIFIED_FAIL" in resp:
-                                parts = resp.split('|')
-                                msg = parts[1] if len(parts) > 1 else "Please switch off."
-                                energy = parts[2] if len(parts) > 2 else "Wasted energy"
-                                
-                                st.warning(f"⚠️ **Action Needed:** {msg}")
-                                st.error("❌ No points awarded. Switch off the key/switch when not in use!")
-                                st.metric("⚡ Energy Consumption", energy)
-                            else:
-                                reason = resp.split('|')[1] if '|' in resp else resp.replace("REJECTED", "")
-                                st.error(f"❌ Verification Failed: {reason}")
-                                
-                    except Exception as e:
-                        st.error(f"Verification Error: {str(e)}")
+                if not groq_api:
+                    st.error("Groq API Key not configured.")
+                else:
+                    submit_verification(action, verify_photo, action, img_file.getvalue(), username, check_electricity_photo)
+        show_verification(action)
 
     elif action == "Composted Food":
         st.markdown("### 🌱 Eco Food Analyzer - Compost Checker")
@@ -1173,70 +1334,11 @@ def mission_tracker():
         if img_input:
             st.image(img_input, caption="Food to Analyze", width=300)
             if st.button("🔍 Check if Compostable", key="analyze_food"):
-                with st.spinner("🔬 Analyzing with AI... Checking if food is compostable..."):
-                    # Save to temp file for CV2 reading
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp:
-                        tmp.write(img_input.getvalue())
-                        tmp_path = tmp.name
-                    
-                    try:
-                        # Initialize classifier
-                        classifier = EcoFoodClassifier()
-                        result = classifier.classify_food(tmp_path)
-                        
-                        # ❌ NOT A REAL IMAGE
-                        if not result.get('is_real', True):
-                            st.error("🤖 " + result.get('message'))
-                        # ❌ NOT FOOD AT ALL
-                        elif not result.get('is_food', True):
-                            st.error("🚫 " + result.get('message'))
-                            st.info("Please upload an image of actual food items!")
-                        # ❌ FOOD BUT NOT COMPOSTABLE
-                        elif not result.get('is_compostable', False):
-                            st.warning("⚠️ " + result.get('message'))
-                            st.metric("🌟 Eco Points", "0 (Not awarded)")
-                            st.info("💡 **Tip:** Only raw, uncooked fruits, vegetables, and grains can be composted. Avoid cooked meals, meat, dairy, and processed foods!")
-                        # ✅ COMPOSTABLE FOOD - AWARD POINTS
-                        else:
-                            st.success("✅ " + result.get('message'))
-                            
-                            # Fixed points for Composted Food mission = 20 points (consistent with points_map)
-                            composted_points = 20
-                            
-                            col_res1, col_res2 = st.columns(2)
-                            col_res1.metric("🍽️ Food", result['food_name'])
-                            col_res2.metric("🌟 Eco Points", f"+{composted_points} 🎉")
-                            
-                            st.markdown(f"**Category:** {result['category']}")
-                            st.markdown(f"**Confidence:** {result['confidence']:.1f}%")
-                            st.markdown(f"**Carbon Footprint:** {result['carbon_footprint']} kg CO₂")
-                            
-                            # Groq Insights
-                            if groq_client:
-                                prompt = f"""
-                                Explain why this food is compostable in English (short & friendly):
-                                Food: {result['food_name']}
-                                Confidence: {result['confidence']:.0f}%
-                                Category: {result['category']}
-                                
-                                Give me in English (50-100 words):
-                                1. Why it's compostable
-                                2. How to compost it
-                                3. Environmental benefits
-                                Keep it SHORT, conversational English, use emojis!
-                                """
-                                insights = get_groq_response(prompt, model="llama-3.1-8b-instant")
-                                st.markdown(f'<div class="eco-card" style="background: #e3f2fd; border-left: 5px solid #4caf50;"><strong>🎙️ Eco Insights:</strong><br>{insights}</div>', unsafe_allow_html=True)
-                            
-                            # Log Mission - AWARD FIXED 20 POINTS FOR COMPOSTED FOOD (consistent with points_map)
-                            log_action(f"Composted Food ({result['food_name']})", composted_points)
-                            st.balloons()
-                            time.sleep(2)
-                            st.rerun()
-                        
-                    finally:
-                        os.unlink(tmp_path)
-
+                # Initialize classifier here; EfficientNet then runs on the verification worker
+                classifier = EcoFoodClassifier()
+                submit_verification(action, verify_photo, action, img_input.getvalue(), username,
+                                    functools.partial(check_compost_photo, classifier))
+        show_verification(action)
     else:
         if st.button("✅ Log Mission", key="log_mission"):
             log_action(action, points_map[action])
@@ -1290,33 +1392,26 @@ def mission_tracker():
                     st.markdown(f"**Certificate ID:** `{cert_info['certificate_id']}`")
                 
                 with col3:
-                    # Generate and display QR code
-                    qr_img = auth.generate_qr_code(cert_info['certificate_id'], st.session_state['username'])
-                    
-                    # Save QR to buffer
-                    qr_buffer = io.BytesIO()
-                    qr_img.save(qr_buffer, format='PNG')
-                    qr_buffer.seek(0)
-                    
-                    st.image(qr_buffer, caption="Scan to Download Certificate", width=150)
+                    # QR code PNG (rendered once, then served from the certificate cache)
+                    qr_png = auth.get_certificate_qr_png(cert_info['certificate_id'], st.session_state['username'])
+                    st.image(qr_png, caption="Scan to Download Certificate", width=150)
                 
                 st.divider()
                 
-                # Download button
-                pdf_buffer = auth.generate_certificate_pdf(
-                    st.session_state['username'],
-                    cert_info['eco_score'],
-                    cert_info['rank'],
-                    len(auth.get_leaderboard_data())
-                )
-                
-                st.download_button(
-                    label="⬇️ Download Your Certificate (PDF)",
-                    data=pdf_buffer,
-                    file_name=f"Certificate_{st.session_state['username']}.pdf",
-                    mime="application/pdf",
-                    use_container_width=True
-                )
+                # Render the PDF only once the student asks for it
+                pdf_ready_key = f"certificate_pdf_ready_{cert_info['certificate_id']}"
+                if not st.session_state.get(pdf_ready_key):
+                    if st.button("📄 Prepare Certificate PDF", use_container_width=True):
+                        st.session_state[pdf_ready_key] = True
+                        st.rerun()
+                else:
+                    st.download_button(
+                        label="⬇️ Download Your Certificate (PDF)",
+                        data=auth.get_certificate_pdf(cert_info, auth.get_total_users()),
+                        file_name=f"Certificate_{st.session_state['username']}.pdf",
+                        mime="application/pdf",
+                        use_container_width=True
+                    )
             elif eligible:
                 st.markdown("#### 🎯 Earn Your Certificate")
                 st.markdown("You are now eligible for a certificate! Here are your options:")
@@ -1599,31 +1694,40 @@ def games_hub():
 def admin_dashboard():
     st.markdown('<div class="eco-card"><h3>🏫 School Sustainability Dashboard</h3></div>', unsafe_allow_html=True)
     
-    # Load global data from CSV instead of session data to show old records
+    # Time window for the activity metrics, charts and log
+    window = st.selectbox("📅 Time Window", ["Last 7 Days", "Last 30 Days", "Last 90 Days", "All Time"], index=1, key="dashboard_window")
+    window_days = {"Last 7 Days": 7, "Last 30 Days": 30, "Last 90 Days": 90}.get(window)
+    window_start = datetime.date.today() - datetime.timedelta(days=window_days - 1) if window_days else None
+    
+    # Read materialized aggregates instead of scanning the raw activity log
+    summary = None
     try:
-        global_df = auth.get_all_activities()
-        if not global_df.empty:
-            # Normalize columns to match session data format for charts
-            df = global_df.rename(columns={
-                'timestamp': 'Date',
-                'username': 'Student_ID',
-                'action': 'Action',
-                'points': 'Points'
-            })
-        else:
-            df = st.session_state['student_data']
+        summary = auth.get_activity_summary(start=window_start)
+        if summary['total_actions'] == 0:
+            summary = None
     except Exception as e:
-        df = st.session_state['student_data']
+        summary = None
     
-    if df.empty:
-        st.info("📊 No data yet. Start logging missions and playing games!")
-        return
+    if summary is None:
+        # Fall back to this session's data
+        session_df = st.session_state['student_data']
+        if session_df.empty:
+            st.info("📊 No data yet. Start logging missions and playing games!")
+            return
+        action_summary = session_df.groupby('Action')['Points'].agg(['sum', 'count']).reset_index()
+        action_summary.columns = ['Action', 'Points', 'Count']
+        summary = {
+            'total_points': session_df['Points'].sum(),
+            'total_actions': len(session_df),
+            'by_action': action_summary
+        }
+    action_summary = summary['by_action']
 
     # Metrics
     col1, col2, col3 = st.columns(3)
-    col1.metric("🌱 Total Eco-Points", df['Points'].sum())
-    col2.metric("📊 Total Actions", len(df))
-    col3.metric("🌳 Trees Planted", len(df[df['Action'] == "Planted a Tree"]))
+    col1.metric("🌱 Total Eco-Points", summary['total_points'])
+    col2.metric("📊 Total Actions", summary['total_actions'])
+    col3.metric("🌳 Trees Planted", int(action_summary.loc[action_summary['Action'] == "Planted a Tree", 'Count'].sum()))
     
     st.divider()
     
@@ -1631,31 +1735,126 @@ def admin_dashboard():
     chart_col1, chart_col2 = st.columns(2)
     
     with chart_col1:
-        fig_pie = px.pie(df, names='Action', values='Points', 
+        fig_pie = px.pie(action_summary, names='Action', values='Points', 
                         title="Impact Distribution", 
                         color_discrete_sequence=px.colors.sequential.Greens_r)
         st.plotly_chart(fig_pie, use_container_width=True)
     
     with chart_col2:
-        action_summary = df.groupby('Action')['Points'].sum().reset_index()
         fig_bar = px.bar(action_summary, x='Action', y='Points', 
                         title="Top Activities",
                         color='Points',
                         color_continuous_scale='Greens')
         st.plotly_chart(fig_bar, use_container_width=True)
     
-    # Activity Log
+    # Activity Log (newest entries only; older history stays in the sealed segments)
     st.markdown("### 📈 Activity Log")
     try:
-        all_activities = auth.get_all_activities()
-        if not all_activities.empty:
-            st.dataframe(all_activities.sort_index(ascending=False), use_container_width=True)
+        recent = auth.get_recent_activities(limit=500, start=window_start)
+        if not recent.empty:
+            st.dataframe(recent, use_container_width=True)
         else:
             st.info("No activities logged yet.")
     except Exception as e:
         st.error(f"Could not load activity log: {e}")
         # Fallback to session data
-        st.dataframe(df.sort_index(ascending=False), use_container_width=True)
+        st.dataframe(st.session_state['student_data'].sort_index(ascending=False), use_container_width=True)
+
+    # Storage health: writer lock contention in this server process
+    with st.expander("🔒 Storage Health", expanded=False):
+        lock_metrics = auth.get_storage_metrics()
+        if lock_metrics.empty:
+            st.info("No writes recorded by this server process yet.")
+        else:
+            st.dataframe(lock_metrics, use_container_width=True, hide_index=True)
+            if (lock_metrics['timeouts'] > 0).any():
+                st.warning("⚠️ Some writes timed out waiting for a lock — writer contention is limiting throughput.")
+
+    with st.expander("🎮 Quiz Prefetch Pool", expanded=False):
+        pool_stats = quiz_generator.get_pool_stats()
+        if pool_stats is None:
+            st.info("No AI quiz has been requested by this server process yet.")
+        else:
+            p1, p2, p3 = st.columns(3)
+            p1.metric("Pool Hit Rate", f"{pool_stats['hit_rate'] * 100:.0f}%", f"{pool_stats['pool_hits']}/{pool_stats['requests']} requests")
+            p2.metric("Avg Refill", f"{pool_stats['avg_refill_ms']:.0f} ms", f"max {pool_stats['max_refill_ms']:.0f} ms", delta_color="off")
+            p3.metric("Refills", pool_stats['refills'], f"{pool_stats['refill_failures']} failed", delta_color="off")
+            st.caption("Questions ready: " + ", ".join(f"{d} {n}" for d, n in pool_stats['pooled'].items()))
+            if pool_stats['batch_calls']:
+                st.caption(
+                    f"Batched generation: {pool_stats['batch_calls']} call(s), "
+                    f"{pool_stats['batch_yield'] * 100:.0f}% of requested questions valid, "
+                    f"{pool_stats['batch_rejected']} malformed item(s) dropped"
+                )
+
+    with st.expander("📡 Groq Gateway", expanded=False):
+        if not groq_api:
+            st.info("Groq is not configured; AI features use local fallbacks.")
+        else:
+            gateway_stats = groq_api.stats()
+            g1, g2, g3 = st.columns(3)
+            g1.metric("Circuit Breaker", gateway_stats['breaker'].title(), f"{gateway_stats['breaker_trips']} trip(s)", delta_color="off")
+            g2.metric("Rate Limit", f"{groq_gateway.RATE_LIMIT:g} req/s", f"burst {groq_gateway.RATE_BURST}", delta_color="off")
+            g3.metric(
+                "In Flight", f"{gateway_stats['in_flight']} / {groq_gateway.MAX_IN_FLIGHT}",
+                f"peak {gateway_stats['peak_in_flight']}, {gateway_stats['cap_waits']} queued", delta_color="off"
+            )
+            if gateway_stats['routes']:
+                st.dataframe(pd.DataFrame.from_dict(gateway_stats['routes'], orient='index'), use_container_width=True)
+            else:
+                st.caption("No Groq calls made by this server process yet.")
+            st.markdown("**Model routes** (model choice, hedging and end-to-end latency)")
+            st.dataframe(pd.DataFrame.from_dict(groq_router.stats(), orient='index'), use_container_width=True)
+
+    with st.expander("🧬 Duplicate Evidence", expanded=False):
+        try:
+            evidence_stats = evidence_index.get_stats()
+            e1, e2 = st.columns(2)
+            e1.metric("Photos Indexed", evidence_stats['originals'])
+            e2.metric("Re-submissions Caught", evidence_stats['duplicates'], "model calls saved", delta_color="off")
+            clusters = evidence_index.duplicate_clusters()
+            if clusters.empty:
+                st.caption("No photo has been submitted twice yet.")
+            else:
+                st.dataframe(clusters, use_container_width=True, hide_index=True)
+                shared = clusters[clusters['other_users'] > 0]
+                if not shared.empty:
+                    st.warning(f"⚠️ {len(shared)} photo(s) were re-submitted from another account.")
+        except Exception as e:
+            st.error(f"Could not load evidence index: {e}")
+
+    with st.expander("🧹 Local Prefilter", expanded=False):
+        prefilter_stats = evidence_prefilter.get_stats()
+        f1, f2, f3 = st.columns(3)
+        f1.metric("Photos Screened", prefilter_stats['photos'])
+        f2.metric("Videos Screened", prefilter_stats['videos'])
+        f3.metric("Rejected Locally", prefilter_stats['rejected'], "model calls saved", delta_color="off")
+        if prefilter_stats['reasons']:
+            st.caption("Rejections: " + ", ".join(f"{code} {n}" for code, n in prefilter_stats['reasons'].items()))
+        else:
+            st.caption("No submission has been rejected locally by this server process yet.")
+
+    with st.expander("🧵 Verification Queue", expanded=False):
+        queue_stats = verification_jobs.get_stats()
+        if queue_stats is None:
+            st.caption("No verification was submitted to this server process yet.")
+        else:
+            v1, v2, v3 = st.columns(3)
+            v1.metric(
+                "Pending", f"{queue_stats['pending']} / {queue_stats['max_pending']}",
+                f"peak {queue_stats['peak_pending']}, {queue_stats['refused']} refused", delta_color="off"
+            )
+            v2.metric("Finished", queue_stats['completed'], f"{queue_stats['failed']} failed", delta_color="off")
+            v3.metric(
+                "Median Run", f"{queue_stats['median_run_ms']:.0f} ms",
+                f"waited {queue_stats['median_wait_ms']:.0f} ms on {queue_stats['workers']} workers", delta_color="off"
+            )
+        try:
+            jobs = verification_jobs.recent_jobs()
+            if jobs:
+                st.dataframe(pd.DataFrame(jobs), use_container_width=True, hide_index=True)
+        except Exception as e:
+            st.error(f"Could not load verification jobs: {e}")
 
     # Global Leaderboard
     st.markdown("---")
@@ -1769,6 +1968,13 @@ def admin_dashboard():
                     col_rank1.info(f"📍 Your Rank: **#{user_rank}** out of {len(leaderboard_data)}")
                     col_rank2.success(f"🎯 Your Percentile: **{user_percentile}%**")
                     col_rank3.warning(f"⭐ Your Score: **{user_score}** points")
+                    
+                    nearby = auth.get_ranks_around(st.session_state['username'], k=2)
+                    if not nearby.empty:
+                        st.markdown("#### 🧭 Guardians Near You")
+                        nearby_df = nearby[['rank', 'username', 'full_name', 'eco_score']].copy()
+                        nearby_df.columns = ['🏅 Rank', '👤 Username', '📝 Full Name', '⭐ Eco-Score']
+                        st.dataframe(nearby_df, use_container_width=True, hide_index=True)
             
             # Top user highlight
             top_user = leaderboard_data.iloc[0]
@@ -1789,7 +1995,7 @@ def admin_dashboard():
     st.markdown("### 🎖️ Certificate Status (View Only)")
     st.info("📌 **Note:** Certificates are now automatically issued in the Student Hub when eligible users scan their QR code. Admins can view all issued certificates below.")
     
-    cert_tab = st.tabs(["✅ View Issued Certificates"])
+    cert_tab = st.tabs(["✅ View Issued Certificates", "🔍 Verify Certificate", "🎓 Bulk Issue"])
     
     with cert_tab[0]:
         st.markdown("#### View All Issued Certificates")
@@ -1800,6 +2006,18 @@ def admin_dashboard():
             if all_certs.empty:
                 st.info("📜 No certificates issued yet.")
             else:
+                # Bulk export (PDFs not yet cached are rendered in parallel)
+                if st.button("📦 Export All Certificates (ZIP)", key="export_certificates_zip"):
+                    with st.spinner(f"Rendering {len(all_certs)} certificates..."):
+                        zip_bytes = auth.export_certificates_zip()
+                    st.download_button(
+                        label="⬇️ Download Certificates ZIP",
+                        data=zip_bytes,
+                        file_name=f"certificates_{datetime.date.today():%Y%m%d}.zip",
+                        mime="application/zip",
+                        key="download_certificates_zip"
+                    )
+                
                 # Display certificates
                 for idx, (_, cert) in enumerate(all_certs.iterrows()):
                     col1, col2, col3 = st.columns([2, 1, 1])
@@ -1815,22 +2033,52 @@ def admin_dashboard():
                     
                     with col3:
                         if st.button(f"Download", key=f"download_{cert['certificate_id']}"):
-                            # Generate PDF
-                            pdf_buffer = auth.generate_certificate_pdf(
-                                cert['username'],
-                                cert['eco_score'],
-                                cert['rank'],
-                                len(all_certs)
+                            # Same cached PDF the student downloads
+                            pdf_bytes = auth.get_certificate_pdf(
+                                cert,
+                                auth.get_total_users(),
+                                full_name=user_data.get('full_name') if user_data else None
                             )
                             st.download_button(
                                 label="⬇️ PDF Certificate",
-                                data=pdf_buffer,
+                                data=pdf_bytes,
                                 file_name=f"Certificate_{cert['username']}.pdf",
                                 mime="application/pdf",
                                 key=f"pdf_download_{cert['certificate_id']}"
                             )
         except Exception as e:
             st.error(f"Error loading certificates: {e}")
+    
+    with cert_tab[1]:
+        st.markdown("#### Verify a Scanned Certificate")
+        scanned = st.text_input(
+            "QR payload, Certificate ID or QR Code ID",
+            placeholder="certificate_CERT_username_1700000000_username",
+            key="verify_certificate_input"
+        )
+        if scanned:
+            record = auth.verify_certificate(scanned)
+            if record:
+                st.success(f"✅ Valid certificate for **{record['username']}**")
+                st.json(record)
+            else:
+                st.error("❌ No issued certificate matches this code.")
+    
+    with cert_tab[2]:
+        st.markdown("#### Issue Certificates to All Eligible Guardians")
+        st.caption("Issues a certificate to every user with 500+ eco-points who does not have one yet, in a single transaction.")
+        prerender = st.checkbox("Pre-render certificate PDFs (parallel)", value=False, key="bulk_issue_prerender")
+        if st.button("🎓 Issue Certificates Now", key="bulk_issue_certificates"):
+            try:
+                with st.spinner("Issuing certificates..."):
+                    issued = auth.issue_certificates_to_eligible(render_pdfs=prerender)
+                if issued.empty:
+                    st.info("No eligible users without a certificate.")
+                else:
+                    st.success(f"✅ Issued {len(issued)} certificate(s).")
+                    st.dataframe(issued[['username', 'eco_score', 'rank', 'certificate_id']], use_container_width=True, hide_index=True)
+            except Exception as e:
+                st.error(f"Bulk issuance failed: {e}")
 
 # ==========================================
 # 9. MAIN LAYOUT
@@ -1861,6 +2109,9 @@ def main():
         return
     
     # User is logged in - show main app
+    # Award points for verifications that finished since the last rerun
+    apply_finished_verifications()
+    
     # Sidebar
     with st.sidebar:
         st.title("🌍 ClimateGuardian AI")
@@ -1890,9 +2141,9 @@ def main():
         
         # Logout button
         if st.button("🚪 Logout", key="logout_btn", use_container_width=True):
-            # Update user score before logout
+            # Persist any buffered score changes before logout
             if st.session_state['username']:
-                auth.update_user_score(st.session_state['username'], st.session_state['eco_score'])
+                auth.flush_scores()
             auth.logout()
         
         st.caption("Developed by Environment Cleaner")
@@ -6,114 +6,116 @@
 import streamlit as st
 import pandas as pd
 import hashlib
-import os
 import time
 from datetime import datetime
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-import io
-import qrcode
 import base64
-
-# Database file path
-USER_DB_FILE = "users_database.csv"
-ACTIVITY_DB_FILE = "user_activities.csv"
-CERTIFICATES_DB_FILE = "certificates_database.csv"
+import storage
+import score_ledger
+import leaderboard
+import activity_log
+import activity_aggregates
+import file_lock
+import certificates
+import certificate_pdf
+import certificate_cache
+import storage_service
+
+# Users, certificates and recent activities live in storage.STORE_DB_FILE;
+# older activities are sealed into daily segments under activity_log.ACTIVITY_SEGMENTS_DIR
 
 def hash_password(password):
     """Hash password using SHA256"""
     return hashlib.sha256(password.encode()).hexdigest()
 
 def load_users():
-    """Load users from CSV database"""
-    if os.path.exists(USER_DB_FILE):
-        df = pd.read_csv(USER_DB_FILE)
-        # Ensure eco_score is numeric (avoid strings) and fill missing values
-        if 'eco_score' in df.columns:
-            df['eco_score'] = pd.to_numeric(df['eco_score'], errors='coerce').fillna(0).astype(int)
-        else:
-            df['eco_score'] = 0
-        return df
-    else:
-        # Create new database with headers
-        df = pd.DataFrame(columns=['username', 'email', 'password_hash', 'full_name', 'created_at', 'eco_score'])
-        df.to_csv(USER_DB_FILE, index=False)
-        return df
+    """Load all users from the store as a DataFrame"""
+    return storage.load_users_df()
 
 def save_users(df):
-    """Save users to CSV database"""
-    df.to_csv(USER_DB_FILE, index=False)
+    """Replace all users in the store with the rows of a DataFrame"""
+    storage.replace_users(df)
 
 def user_exists(username, email):
     """Check if user already exists"""
-    users_df = load_users()
-    return ((users_df['username'] == username) | (users_df['email'] == email)).any()
+    return storage.user_exists(username, email)
 
 def create_user(username, email, password, full_name):
     """Create a new user account"""
-    users_df = load_users()
-    
-    new_user = pd.DataFrame({
-        'username': [username],
-        'email': [email],
-        'password_hash': [hash_password(password)],
-        'full_name': [full_name],
-        'created_at': [datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
-        'eco_score': [0]
-    })
-    
-    users_df = pd.concat([users_df, new_user], ignore_index=True)
-    save_users(users_df)
-    return True
+    return storage.insert_user(
+        username,
+        email,
+        hash_password(password),
+        full_name,
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        0
+    )
 
 def verify_user(username, password):
     """Verify user credentials"""
-    users_df = load_users()
-    user_row = users_df[users_df['username'] == username]
+    user = storage.get_user(username)
     
-    if user_row.empty:
+    if user is None:
         return False
     
-    stored_hash = user_row.iloc[0]['password_hash']
-    return stored_hash == hash_password(password)
+    return user['password_hash'] == hash_password(password)
+
+def _get_user(username):
+    """Point lookup of a user, including score deltas not yet flushed"""
+    user, pending = score_ledger.get_buffer().read(username, storage.get_user)
+    if user is not None:
+        user['eco_score'] = int(user['eco_score'] + pending)
+    return user
 
 def get_user_info(username):
     """Get user information"""
-    users_df = load_users()
-    user_row = users_df[users_df['username'] == username]
-    
-    if not user_row.empty:
-        return user_row.iloc[0].to_dict()
-    return None
+    return _get_user(username)
 
 def update_user_score(username, new_score):
-    """Update user's eco score"""
-    users_df = load_users()
-    users_df.loc[users_df['username'] == username, 'eco_score'] = new_score
-    save_users(users_df)
+    """Set user's eco score to an absolute value"""
+    score_ledger.flush()
+    score_ledger.set_score(username, new_score)
+
+def add_user_score(username, delta):
+    """Add points to a user's eco score (buffered and coalesced per user)"""
+    try:
+        storage_service.submit('score_delta', username, delta)
+        return
+    except storage_service.WriterUnavailable:
+        pass
+    score_ledger.add_delta(username, delta)
+
+def get_user_score(username):
+    """Get user's latest eco score, including buffered deltas"""
+    return score_ledger.get_score(username)
+
+def flush_scores():
+    """Persist any buffered score deltas"""
+    score_ledger.flush()
 
 def log_activity(username, action, points):
-    """Log user activity to persistent CSV storage"""
-    if not os.path.exists(ACTIVITY_DB_FILE):
-        df = pd.DataFrame(columns=['timestamp', 'username', 'action', 'points'])
-        df.to_csv(ACTIVITY_DB_FILE, index=False)
-    
-    new_row = pd.DataFrame({
-        'timestamp': [datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
-        'username': [username],
-        'action': [action],
-        'points': [points]
-    })
-    # Append to CSV
-    new_row.to_csv(ACTIVITY_DB_FILE, mode='a', header=False, index=False)
-
-def get_all_activities():
-    """Load all activities for global dashboard"""
-    if os.path.exists(ACTIVITY_DB_FILE):
-        return pd.read_csv(ACTIVITY_DB_FILE)
-    return pd.DataFrame(columns=['timestamp', 'username', 'action', 'points'])
+    """Log user activity to the persistent activity log"""
+    try:
+        storage_service.submit('log_activity', username, action, points)
+        return
+    except storage_service.WriterUnavailable:
+        pass
+    activity_log.append(username, action, points)
+
+def get_all_activities(start=None, end=None, columns=None):
+    """Load activities for the global dashboard, optionally limited to a date window and columns"""
+    return activity_log.read_activities(start=start, end=end, columns=columns)
+
+def get_recent_activities(limit=500, start=None):
+    """Load the newest activities (newest first) for the dashboard log"""
+    return activity_log.read_recent(limit=limit, start=start)
+
+def get_activity_summary(start=None, end=None):
+    """Get materialized activity totals and per-action points/counts"""
+    return activity_aggregates.get_summary(start=start, end=end)
+
+def get_storage_metrics():
+    """Get write-lock contention metrics for this process"""
+    return pd.DataFrame(file_lock.get_lock_metrics())
 
 def login_page():
     """Display login page"""
@@ -309,9 +311,10 @@ def signup_page():
 def get_leaderboard_data():
     """Get sorted leaderboard data with rankings"""
     try:
+        flush_scores()
         df = load_users()
-        # Sort by eco_score in descending order
-        df_sorted = df.sort_values('eco_score', ascending=False).reset_index(drop=True)
+        # Sort by eco_score in descending order (ties by username, matching the rank index)
+        df_sorted = df.sort_values(['eco_score', 'username'], ascending=[False, True]).reset_index(drop=True)
         # Add rank column
         df_sorted['rank'] = df_sorted.index + 1
         return df_sorted
@@ -321,33 +324,43 @@ def get_leaderboard_data():
         print(f"Error loading leaderboard: {e}")
         return pd.DataFrame(columns=['rank', 'username', 'full_name', 'eco_score'])
 
+def _rank_index():
+    """Rank index with buffered scores flushed and store changes applied"""
+    flush_scores()
+    return leaderboard.get_index()
+
+def get_total_users():
+    """Get number of ranked users"""
+    return len(_rank_index())
+
 def get_user_rank(username):
     """Get user's current global rank"""
-    leaderboard = get_leaderboard_data()
-    if not leaderboard.empty:
-        user_row = leaderboard[leaderboard['username'] == username]
-        if not user_row.empty:
-            return int(user_row.iloc[0]['rank'])
-    return None
+    return _rank_index().rank(username)
 
 def get_top_users(n=10):
     """Get top N users by eco score"""
-    leaderboard = get_leaderboard_data()
-    return leaderboard.head(n)
+    return _rank_rows_df(_rank_index().top(n))
+
+def get_ranks_around(username, k=2):
+    """Get the users ranked within k places above and below a user"""
+    return _rank_rows_df(_rank_index().around(username, k))
 
 def get_user_percentile(username):
     """Get user's percentile ranking"""
-    leaderboard = get_leaderboard_data()
-    total_users = len(leaderboard)
-    
-    if total_users == 0:
-        return 0
-    
-    user_rank = get_user_rank(username)
-    if user_rank:
-        percentile = ((total_users - user_rank + 1) / total_users) * 100
-        return round(percentile, 1)
-    return 0
+    return _rank_index().percentile(username)
+
+def _rank_rows_df(rows):
+    """Build a leaderboard-shaped DataFrame for (rank, username, score) rows"""
+    records = []
+    for rank, username, score in rows:
+        user = storage.get_user(username) or {}
+        records.append({
+            'rank': rank,
+            'username': username,
+            'full_name': user.get('full_name', username),
+            'eco_score': int(score)
+        })
+    return pd.DataFrame(records, columns=['rank', 'username', 'full_name', 'eco_score'])
 
 # ==========================================
 # CERTIFICATE FUNCTIONS
@@ -355,205 +368,114 @@ def get_user_percentile(username):
 
 def load_certificates():
     """Load certificates database"""
-    if os.path.exists(CERTIFICATES_DB_FILE):
-        return pd.read_csv(CERTIFICATES_DB_FILE)
-    else:
-        df = pd.DataFrame(columns=['username', 'eco_score', 'rank', 'issued_date', 'certificate_id', 'qr_code_id'])
-        df.to_csv(CERTIFICATES_DB_FILE, index=False)
-        return df
+    return storage.load_certificates_df()
 
 def save_certificates(df):
     """Save certificates to database"""
-    df.to_csv(CERTIFICATES_DB_FILE, index=False)
-
-def generate_certificate_pdf(username, eco_score, rank, total_users):
-    """Generate certificate PDF with ReportLab"""
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=landscape(letter))
-    w, h = landscape(letter)
-
-    # Get full name from database
-    user_info = get_user_info(username)
-    full_name = user_info.get('full_name', username) if user_info else username
-
-    # 🌿 Background
-    c.setFillColor(colors.HexColor("#e9f7ef"))
-    c.rect(0, 0, w, h, fill=1, stroke=0)
-
-    # 🎀 Curved ribbon (top-left)
-    c.setFillColor(colors.HexColor("#2e7d32"))
-    path = c.beginPath()
-    path.moveTo(0, h)
-    path.curveTo(300, h-30, 400, h-120, 450, h-180)
-    path.lineTo(450, h)
-    path.close()
-    c.drawPath(path, fill=1, stroke=0)
-
-    # 🌱 Abstract leaf shapes (right side)
-    c.setFillColor(colors.HexColor("#43a047"))
-    leaf = c.beginPath()
-    leaf.moveTo(w-200, 100)
-    leaf.curveTo(w-50, 250, w-50, 450, w-220, 580)
-    leaf.curveTo(w-160, 420, w-180, 260, w-200, 100)
-    leaf.close()
-    c.drawPath(leaf, fill=1, stroke=0)
-
-    c.setFillColor(colors.HexColor("#66bb6a"))
-    leaf2 = c.beginPath()
-    leaf2.moveTo(w-260, 120)
-    leaf2.curveTo(w-140, 280, w-160, 450, w-300, 600)
-    leaf2.close()
-    c.drawPath(leaf2, fill=1, stroke=0)
-
-    # 🏅 Golden Award Seal
-    cx, cy = w/2 + 220, h/2 + 50
-    c.setFillColor(colors.HexColor("#f9a825"))
-    c.circle(cx, cy, 45, fill=1, stroke=0)
-
-    c.setFillColor(colors.HexColor("#ffd54f"))
-    c.circle(cx, cy, 38, fill=1, stroke=0)
-
-    c.setFillColor(colors.darkgreen)
-    c.setFont("Helvetica-Bold", 10)
-    c.drawCentredString(cx, cy+5, "BEST")
-    c.drawCentredString(cx, cy-10, "AWARD")
-
-    # 📜 Certificate Title
-    c.setFillColor(colors.HexColor("#1b5e20"))
-    c.setFont("Helvetica-Bold", 36)
-    c.drawCentredString(w/2 - 100, h - 1.7*inch, "CERTIFICATE")
-
-    c.setFont("Helvetica", 16)
-    c.drawCentredString(w/2 - 100, h - 2.3*inch, "OF APPRECIATION")
-
-    # 👤 Name (Full Name instead of username)
-    c.setFont("Helvetica-Bold", 30)
-    c.drawCentredString(w/2 - 100, h - 3.5*inch, full_name)
-
-    # 📝 Content
-    c.setFont("Helvetica", 14)
-    c.drawCentredString(
-        w/2 - 100,
-        h - 4.2*inch,
-        "For outstanding contribution towards climate sustainability"
-    )
-
-    c.setFont("Helvetica-Bold", 18)
-    c.drawCentredString(
-        w/2 - 100,
-        h - 4.9*inch,
-        f"ECO SCORE: {eco_score}"
-    )
-
-    c.setFont("Helvetica", 13)
-    c.drawCentredString(
-        w/2 - 100,
-        h - 5.4*inch,
-        f"Rank #{rank} among {total_users} Climate Guardians"
-    )
-
-    # ✍ Signatures (moved text above signature line)
-    c.setFont("Helvetica-Bold", 12)
-    c.drawCentredString(2.75*inch, 1.5*inch, "Director")
-    c.line(1.5*inch, 1.2*inch, 4*inch, 1.2*inch)
-
-    c.drawCentredString(w-2.75*inch, 1.5*inch, "ClimateGuardian AI")
-    c.line(w-4*inch, 1.2*inch, w-1.5*inch, 1.2*inch)
-
-    # 📅 Date
-    c.setFont("Helvetica-Oblique", 11)
-    c.drawCentredString(
-        w/2,
-        0.7*inch,
-        f"Issued on {datetime.now().strftime('%d %B %Y')}"
-    )
+    storage.replace_certificates(df)
 
-    c.save()
-    buffer.seek(0)
-    return buffer
+def generate_certificate_pdf(username, eco_score, rank, total_users, full_name=None):
+    """Generate certificate PDF from the cached artwork template"""
+    if full_name is None:
+        # Get full name from database
+        user_info = storage.get_user(username)
+        full_name = user_info.get('full_name', username) if user_info else username
+    return certificate_pdf.render(full_name, eco_score, rank, total_users)
 
 def generate_qr_code(certificate_id, username):
     """Generate QR code for certificate download"""
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr_data = f"certificate_{certificate_id}_{username}"
-    qr.add_data(qr_data)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    return img
+    return certificate_pdf.render_qr(certificate_id, username)
 
 def issue_certificate(username):
     """Issue certificate to user (only if eco_score >= 500)"""
-    users_df = load_users()
-    user_row = users_df[users_df['username'] == username]
-    
-    if user_row.empty:
-        return False, "User not found"
-    
-    eco_score = int(user_row.iloc[0]['eco_score'])
-    
-    if eco_score < 500:
-        return False, f"User must have at least 500 eco-points. Current score: {eco_score}"
-    
-    # Check if certificate already issued
-    certs_df = load_certificates()
-    if not certs_df.empty and (certs_df['username'] == username).any():
-        return False, "Certificate already issued to this user"
-    
-    # Generate certificate ID
-    certificate_id = f"CERT_{username}_{int(datetime.now().timestamp())}"
-    leaderboard = get_leaderboard_data()
-    rank = get_user_rank(username) or len(leaderboard)
-    total_users = len(leaderboard)
-    
-    # Create certificate record
-    new_cert = pd.DataFrame({
-        'username': [username],
-        'eco_score': [eco_score],
-        'rank': [rank],
-        'issued_date': [datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
-        'certificate_id': [certificate_id],
-        'qr_code_id': [f"QR_{certificate_id}"]
-    })
-    
-    certs_df = pd.concat([certs_df, new_cert], ignore_index=True)
-    save_certificates(certs_df)
-    
-    # Log activity
-    log_activity(username, "Certificate Issued", 50)
-    
-    return True, certificate_id
+    flush_scores()
+    try:
+        return tuple(storage_service.submit('issue_certificate', username))
+    except storage_service.WriterUnavailable:
+        pass
+    except storage_service.WriterError as e:
+        return False, f"Certificate could not be issued: {e}"
+    with storage.transaction() as conn:
+        return certificates.issue(username, conn)
+
+def issue_certificates_to_eligible(render_pdfs=False, workers=None):
+    """Issue certificates to every user with eco_score >= 500 who has none (one transaction).
+
+    With render_pdfs the new certificates are pre-rendered in parallel into the
+    artifact cache. Returns the new certificate records as a DataFrame.
+    """
+    flush_scores()
+    with storage.transaction() as conn:
+        records = certificates.issue_all_eligible(conn)
+    if records and render_pdfs:
+        names = load_users().set_index('username')['full_name'].to_dict()
+        total_users = get_total_users()
+        certificate_cache.render_all(
+            [_certificate_record(r, total_users, names.get(r['username']) or r['username']) for r in records],
+            workers=workers
+        )
+    return pd.DataFrame(records, columns=storage.CERTIFICATE_COLUMNS)
 
 def check_certificate_eligibility(username):
     """Check if user is eligible for certificate"""
-    users_df = load_users()
-    user_row = users_df[users_df['username'] == username]
+    user = _get_user(username)
     
-    if user_row.empty:
+    if user is None:
         return False, 0
     
-    eco_score = int(user_row.iloc[0]['eco_score'])
-    return eco_score >= 500, eco_score
+    eco_score = int(user['eco_score'])
+    return eco_score >= certificates.CERTIFICATE_MIN_SCORE, eco_score
 
 def get_certificate_info(username):
     """Get certificate information for user"""
-    certs_df = load_certificates()
-    cert_row = certs_df[certs_df['username'] == username]
-    
-    if cert_row.empty:
-        return None
-    
-    return cert_row.iloc[0].to_dict()
+    return storage.get_certificate_by_username(username)
+
+def verify_certificate(identifier):
+    """Look up a certificate from a scanned QR payload, certificate ID or QR code ID"""
+    return certificates.lookup(identifier)
 
 def get_all_certificates():
     """Get all issued certificates"""
     return load_certificates()
 
+def _certificate_record(cert, total_users, full_name=None):
+    """Everything drawn on a certificate, used as its cache address"""
+    if full_name is None:
+        user_info = storage.get_user(cert['username'])
+        full_name = user_info.get('full_name', cert['username']) if user_info else cert['username']
+    return {
+        'username': cert['username'],
+        'certificate_id': cert['certificate_id'],
+        'eco_score': int(cert['eco_score']),
+        'rank': int(cert['rank']),
+        'full_name': full_name,
+        'total_users': int(total_users),
+        'issued_date': cert['issued_date'],
+    }
+
+def get_certificate_pdf(cert, total_users, full_name=None):
+    """Get certificate PDF bytes, rendered once and then served from the artifact cache"""
+    return certificate_cache.get_pdf(_certificate_record(cert, total_users, full_name))
+
+def get_certificate_qr_png(certificate_id, username):
+    """Get certificate QR code PNG bytes from the artifact cache"""
+    return certificate_cache.get_qr_png(certificate_id, username)
+
+def export_certificates_zip(workers=None):
+    """Render every issued certificate into one ZIP archive (bytes)"""
+    certs = load_certificates()
+    names = load_users().set_index('username')['full_name'].to_dict()
+    total_users = get_total_users()
+    records = [
+        _certificate_record(cert, total_users, names.get(cert['username']) or cert['username'])
+        for cert in certs.to_dict('records')
+    ]
+    return certificate_cache.export_zip(records, workers=workers)
+
+def get_certificate_cache_stats():
+    """Get hit/miss counters of the certificate artifact cache"""
+    return certificate_cache.get_cache().stats()
+
 def logout():
     """Logout user"""
     st.session_state['logged_in'] = False
@@ -0,0 +1,197 @@
+# ==========================================
+# CERTIFICATE CACHE MODULE
+# Content-addressed cache of rendered certificate PDFs and QR codes
+# ==========================================
+
+import io
+import os
+import json
+import hashlib
+import zipfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import certificate_pdf
+import certificates
+import file_lock
+
+# Optional on-disk tier shared by all app processes (unset = memory only)
+CACHE_DIR_ENV = "CLIMATE_GUARDIAN_CERT_CACHE"
+
+# In-memory budget per process
+MEMORY_CACHE_BYTES = 32 * 1024 * 1024
+
+# Below this many missing PDFs an export renders in-process
+PARALLEL_EXPORT_MIN = 8
+
+
+def artifact_key(kind, *fields):
+    """Content address of an artifact: a hash of everything that is drawn on it"""
+    payload = json.dumps([kind, *fields], default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ArtifactCache:
+    """LRU cache of rendered bytes with an optional on-disk second tier"""
+
+    def __init__(self, max_bytes=MEMORY_CACHE_BYTES, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key[:2], f"{key}{suffix}")
+
+    def get(self, key, suffix=""):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return data
+        if self.directory:
+            try:
+                with open(self._path(key, suffix), 'rb') as f:
+                    data = f.read()
+            except OSError:
+                data = None
+            if data is not None:
+                with self.lock:
+                    self.disk_hits += 1
+                self._remember(key, data)
+                return data
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, data, suffix=""):
+        self._remember(key, data)
+        if self.directory:
+            try:
+                file_lock.atomic_write(self._path(key, suffix), data)
+            except OSError as e:
+                print(f"Certificate cache write failed: {e}")
+
+    def get_or_render(self, key, render, suffix=""):
+        data = self.get(key, suffix)
+        if data is None:
+            data = render()
+            self.put(key, data, suffix)
+        return data
+
+    def _remember(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, old = self.entries.popitem(last=False)
+                self.size -= len(old)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+
+_cache = ArtifactCache(directory=os.environ.get(CACHE_DIR_ENV) or None)
+
+
+def get_cache():
+    return _cache
+
+# ==========================================
+# CERTIFICATE ARTIFACTS
+# ==========================================
+
+def pdf_key(record):
+    return artifact_key(
+        'pdf', record['certificate_id'], record['eco_score'], record['rank'],
+        record['full_name'], record['total_users'], record['issued_date']
+    )
+
+
+def _render_pdf(record):
+    return certificate_pdf.render(
+        record['full_name'], record['eco_score'], record['rank'],
+        record['total_users'], record['issued_date']
+    ).getvalue()
+
+
+def get_pdf(record):
+    """PDF bytes for a certificate record, rendered at most once per content.
+
+    ``record`` holds certificate_id, eco_score, rank, full_name, total_users
+    and issued_date.
+    """
+    return _cache.get_or_render(pdf_key(record), lambda: _render_pdf(record), ".pdf")
+
+
+def get_qr_png(certificate_id, username):
+    """QR code PNG bytes for a certificate"""
+    key = artifact_key('qr', certificates.qr_payload(certificate_id, username))
+    return _cache.get_or_render(
+        key, lambda: certificate_pdf.render_qr_png(certificate_id, username), ".png"
+    )
+
+
+def _render_job(record):
+    # Runs in a worker process
+    return pdf_key(record), _render_pdf(record)
+
+
+def render_all(records, workers=None):
+    """PDF bytes for many certificate records, keyed by pdf_key.
+
+    Cached PDFs are reused; the rest are rendered in a process pool and added
+    to the cache.
+    """
+    rendered = {}
+    missing = []
+    for record in records:
+        key = pdf_key(record)
+        data = _cache.get(key, ".pdf")
+        if data is None:
+            missing.append(record)
+        else:
+            rendered[key] = data
+
+    if len(missing) >= PARALLEL_EXPORT_MIN and (workers is None or workers > 1):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_render_job, missing, chunksize=max(1, len(missing) // 32)))
+    else:
+        results = [_render_job(record) for record in missing]
+    for key, data in results:
+        _cache.put(key, data, ".pdf")
+        rendered[key] = data
+    return rendered
+
+
+def export_zip(records, workers=None):
+    """ZIP archive (bytes) with one PDF per certificate record"""
+    records = list(records)
+    rendered = render_all(records, workers=workers)
+    buffer = io.BytesIO()
+    # PDFs are already compressed, so store them as-is
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for record in records:
+            archive.writestr(f"Certificate_{record['username']}.pdf", rendered[pdf_key(record)])
+    return buffer.getvalue()
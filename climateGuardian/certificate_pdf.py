@@ -0,0 +1,261 @@
+# ==========================================
+# CERTIFICATE PDF MODULE
+# Certificate PDF and QR rendering from a pre-drawn artwork template
+# ==========================================
+
+import io
+import sys
+import time
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+import qrcode
+import certificates
+from reportlab.lib.pagesizes import letter, landscape
+from reportlab.pdfgen import canvas
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+
+PAGE_SIZE = landscape(letter)
+
+# Certificates are downloaded, never embedded in text, so their streams are kept
+# binary (Flate only), skipping ReportLab's pure-Python ASCII85 pass. useA85 is
+# a ReportLab global read when a document is saved, so it is switched off only
+# around certificate saves and restored afterwards.
+_a85_lock = threading.Lock()
+
+# Fonts used by the artwork, registered in this order in every document so the
+# cached page operators refer to the same internal font names
+TEMPLATE_FONTS = ("Helvetica", "Helvetica-Bold", "Helvetica-Oblique")
+
+
+def _draw_artwork(c, w, h):
+    """Draw everything that is identical on every certificate"""
+    # 🌿 Background
+    c.setFillColor(colors.HexColor("#e9f7ef"))
+    c.rect(0, 0, w, h, fill=1, stroke=0)
+
+    # 🎀 Curved ribbon (top-left)
+    c.setFillColor(colors.HexColor("#2e7d32"))
+    path = c.beginPath()
+    path.moveTo(0, h)
+    path.curveTo(300, h-30, 400, h-120, 450, h-180)
+    path.lineTo(450, h)
+    path.close()
+    c.drawPath(path, fill=1, stroke=0)
+
+    # 🌱 Abstract leaf shapes (right side)
+    c.setFillColor(colors.HexColor("#43a047"))
+    leaf = c.beginPath()
+    leaf.moveTo(w-200, 100)
+    leaf.curveTo(w-50, 250, w-50, 450, w-220, 580)
+    leaf.curveTo(w-160, 420, w-180, 260, w-200, 100)
+    leaf.close()
+    c.drawPath(leaf, fill=1, stroke=0)
+
+    c.setFillColor(colors.HexColor("#66bb6a"))
+    leaf2 = c.beginPath()
+    leaf2.moveTo(w-260, 120)
+    leaf2.curveTo(w-140, 280, w-160, 450, w-300, 600)
+    leaf2.close()
+    c.drawPath(leaf2, fill=1, stroke=0)
+
+    # 🏅 Golden Award Seal
+    cx, cy = w/2 + 220, h/2 + 50
+    c.setFillColor(colors.HexColor("#f9a825"))
+    c.circle(cx, cy, 45, fill=1, stroke=0)
+
+    c.setFillColor(colors.HexColor("#ffd54f"))
+    c.circle(cx, cy, 38, fill=1, stroke=0)
+
+    c.setFillColor(colors.darkgreen)
+    c.setFont("Helvetica-Bold", 10)
+    c.drawCentredString(cx, cy+5, "BEST")
+    c.drawCentredString(cx, cy-10, "AWARD")
+
+    # 📜 Certificate Title
+    c.setFillColor(colors.HexColor("#1b5e20"))
+    c.setFont("Helvetica-Bold", 36)
+    c.drawCentredString(w/2 - 100, h - 1.7*inch, "CERTIFICATE")
+
+    c.setFont("Helvetica", 16)
+    c.drawCentredString(w/2 - 100, h - 2.3*inch, "OF APPRECIATION")
+
+    # 📝 Content
+    c.setFont("Helvetica", 14)
+    c.drawCentredString(
+        w/2 - 100,
+        h - 4.2*inch,
+        "For outstanding contribution towards climate sustainability"
+    )
+
+    # ✍ Signatures (moved text above signature line)
+    c.setFont("Helvetica-Bold", 12)
+    c.drawCentredString(2.75*inch, 1.5*inch, "Director")
+    c.line(1.5*inch, 1.2*inch, 4*inch, 1.2*inch)
+
+    c.drawCentredString(w-2.75*inch, 1.5*inch, "ClimateGuardian AI")
+    c.line(w-4*inch, 1.2*inch, w-1.5*inch, 1.2*inch)
+
+
+def _draw_details(c, w, h, full_name, eco_score, rank, total_users, issued_on):
+    """Draw the per-certificate text"""
+    c.setFillColor(colors.HexColor("#1b5e20"))
+
+    # 👤 Name (Full Name instead of username)
+    c.setFont("Helvetica-Bold", 30)
+    c.drawCentredString(w/2 - 100, h - 3.5*inch, full_name)
+
+    c.setFont("Helvetica-Bold", 18)
+    c.drawCentredString(
+        w/2 - 100,
+        h - 4.9*inch,
+        f"ECO SCORE: {eco_score}"
+    )
+
+    c.setFont("Helvetica", 13)
+    c.drawCentredString(
+        w/2 - 100,
+        h - 5.4*inch,
+        f"Rank #{rank} among {total_users} Climate Guardians"
+    )
+
+    # 📅 Date
+    c.setFont("Helvetica-Oblique", 11)
+    c.drawCentredString(
+        w/2,
+        0.7*inch,
+        f"Issued on {issued_on.strftime('%d %B %Y')}"
+    )
+
+
+@contextmanager
+def _binary_streams():
+    with _a85_lock:
+        previous = rl_config.useA85
+        rl_config.useA85 = 0
+        try:
+            yield
+        finally:
+            rl_config.useA85 = previous
+
+
+def _save(c, binary_streams):
+    if binary_streams:
+        with _binary_streams():
+            c.save()
+    else:
+        c.save()
+
+
+def _new_canvas(buffer):
+    c = canvas.Canvas(buffer, pagesize=PAGE_SIZE)
+    for font in TEMPLATE_FONTS:
+        c.setFont(font, 12)
+    return c
+
+
+_template = None
+_template_lock = threading.Lock()
+
+
+def get_template():
+    """PDF operators for the static artwork, drawn once per process"""
+    global _template
+    with _template_lock:
+        if _template is None:
+            c = _new_canvas(io.BytesIO())
+            prefix = c.getCurrentPageContent()
+            _draw_artwork(c, *PAGE_SIZE)
+            _template = c.getCurrentPageContent()[len(prefix):]
+        return _template
+
+
+def _issued_on(issued_on):
+    """Date printed on the certificate (a datetime or a stored issued_date string)"""
+    if isinstance(issued_on, str):
+        try:
+            return datetime.strptime(issued_on, "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return datetime.now()
+    return issued_on or datetime.now()
+
+
+def render(full_name, eco_score, rank, total_users, issued_on=None, binary_streams=True):
+    """Render a certificate: stamp the cached artwork, then draw only the variable text"""
+    issued_on = _issued_on(issued_on)
+    buffer = io.BytesIO()
+    c = _new_canvas(buffer)
+    w, h = PAGE_SIZE
+    c.saveState()
+    c.addLiteral(get_template())
+    c.restoreState()
+    _draw_details(c, w, h, full_name, eco_score, rank, total_users, issued_on)
+    _save(c, binary_streams)
+    buffer.seek(0)
+    return buffer
+
+
+def render_uncached(full_name, eco_score, rank, total_users, issued_on=None, binary_streams=False):
+    """Render a certificate drawing the artwork from scratch (benchmark baseline)"""
+    issued_on = _issued_on(issued_on)
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=PAGE_SIZE)
+    w, h = PAGE_SIZE
+    _draw_artwork(c, w, h)
+    _draw_details(c, w, h, full_name, eco_score, rank, total_users, issued_on)
+    _save(c, binary_streams)
+    buffer.seek(0)
+    return buffer
+
+
+def render_qr(certificate_id, username):
+    """QR code image for a certificate"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(certificates.qr_payload(certificate_id, username))
+    qr.make(fit=True)
+    return qr.make_image(fill_color="black", back_color="white")
+
+
+def render_qr_png(certificate_id, username):
+    """QR code for a certificate as PNG bytes"""
+    buffer = io.BytesIO()
+    render_qr(certificate_id, username).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def benchmark(count=500):
+    """Certificates rendered per second, changing one thing per step.
+
+    before: full redraw, ASCII85 streams; template: cached artwork, still
+    ASCII85; after: cached artwork with binary streams.
+    """
+    results = {}
+    for label, fn, binary in (("before", render_uncached, False), ("template", render, False), ("after", render, True)):
+        fn("Benchmark Guardian", 750, 1, 100, binary_streams=binary)  # warm-up (builds the template once)
+        start = time.perf_counter()
+        for i in range(count):
+            fn(f"Guardian {i}", 500 + i, i + 1, count, binary_streams=binary)
+        results[label] = count / (time.perf_counter() - start)
+    return results
+
+
+if __name__ == "__main__":
+    # Usage: python certificate_pdf.py bench [count]
+    command = sys.argv[1] if len(sys.argv) >= 2 else ""
+    if command == "bench":
+        count = int(sys.argv[2]) if len(sys.argv) >= 3 else 500
+        results = benchmark(count)
+        for label, rate in results.items():
+            print(f"{label:>8}: {rate:8.1f} certificates/sec")
+        print(f"{'artwork':>8}: {results['template'] / results['before']:8.2f}x (cached template)")
+        print(f"{'streams':>8}: {results['after'] / results['template']:8.2f}x (binary, no ASCII85)")
+        print(f"{'speedup':>8}: {results['after'] / results['before']:8.2f}x")
+    else:
+        print("Usage: python certificate_pdf.py bench [count]")
@@ -0,0 +1,115 @@
+# ==========================================
+# CERTIFICATES MODULE
+# Certificate issuance and verification against the store
+# ==========================================
+
+from datetime import datetime
+import storage
+import leaderboard
+import activity_log
+
+# Minimum eco score for a certificate
+CERTIFICATE_MIN_SCORE = 500
+
+# Activity logged when a certificate is issued
+CERTIFICATE_ACTIVITY = ("Certificate Issued", 50)
+
+# QR codes encode f"{QR_PAYLOAD_PREFIX}{certificate_id}_{username}"
+QR_PAYLOAD_PREFIX = "certificate_"
+
+
+def qr_payload(certificate_id, username):
+    """Text encoded in a certificate's QR code"""
+    return f"{QR_PAYLOAD_PREFIX}{certificate_id}_{username}"
+
+
+def verify_payload(payload):
+    """Resolve a scanned QR payload to its certificate record, or None.
+
+    Usernames and certificate IDs may both contain underscores, so every split
+    point is a candidate; all candidates are resolved in one indexed query and
+    only a record whose username matches its split is accepted.
+    """
+    payload = (payload or "").strip()
+    if not payload.startswith(QR_PAYLOAD_PREFIX):
+        return None
+    body = payload[len(QR_PAYLOAD_PREFIX):]
+    candidates = {}
+    for i, ch in enumerate(body):
+        if ch == "_" and 0 < i < len(body) - 1:
+            candidates[body[:i]] = body[i + 1:]
+    for record in storage.find_certificates_by_ids(candidates):
+        if candidates.get(record['certificate_id']) == record['username']:
+            return record
+    return None
+
+
+def lookup(identifier):
+    """Find a certificate by QR payload, certificate_id or qr_code_id"""
+    identifier = (identifier or "").strip()
+    return (verify_payload(identifier)
+            or storage.get_certificate_by_id(identifier)
+            or storage.get_certificate_by_qr_code_id(identifier))
+
+
+def issue(username, conn):
+    """Issue a certificate inside the caller's write transaction.
+
+    Returns (True, certificate_id) or (False, reason), like auth.issue_certificate.
+    """
+    row = conn.execute("SELECT eco_score FROM users WHERE username = ?", (username,)).fetchone()
+    if row is None:
+        return False, "User not found"
+
+    eco_score = int(row['eco_score'] or 0)
+    if eco_score < CERTIFICATE_MIN_SCORE:
+        return False, f"User must have at least {CERTIFICATE_MIN_SCORE} eco-points. Current score: {eco_score}"
+
+    # Check if certificate already issued
+    if conn.execute("SELECT 1 FROM certificates WHERE username = ? LIMIT 1", (username,)).fetchone():
+        return False, "Certificate already issued to this user"
+
+    index = leaderboard.get_index(conn=conn)
+    record = _new_record(username, eco_score, index.rank(username) or len(index), datetime.now())
+    storage.insert_certificate(record, conn=conn)
+    activity_log.append_many([(username, *CERTIFICATE_ACTIVITY)], conn=conn)
+    return True, record['certificate_id']
+
+
+def issue_all_eligible(conn, min_score=CERTIFICATE_MIN_SCORE):
+    """Issue certificates to every eligible user without one, inside the caller's transaction.
+
+    Eligible users are selected in one set-based query and ranked from a single
+    leaderboard snapshot; all certificate rows and activity entries are written
+    in bulk. Returns the new certificate records.
+    """
+    eligible = conn.execute(
+        "SELECT u.username, u.eco_score FROM users u "
+        "WHERE u.eco_score >= ? AND NOT EXISTS (SELECT 1 FROM certificates c WHERE c.username = u.username) "
+        "ORDER BY u.eco_score DESC, u.username",
+        (min_score,)
+    ).fetchall()
+    if not eligible:
+        return []
+
+    index = leaderboard.get_index(conn=conn)
+    now = datetime.now()
+    records = [
+        _new_record(r['username'], int(r['eco_score'] or 0), index.rank(r['username']) or len(index), now)
+        for r in eligible
+    ]
+    storage.insert_certificates(records, conn=conn)
+    activity_log.append_many([(r['username'], *CERTIFICATE_ACTIVITY) for r in records], conn=conn)
+    return records
+
+
+def _new_record(username, eco_score, rank, now):
+    certificate_id = f"CERT_{username}_{int(now.timestamp())}"
+    return {
+        'username': username,
+        'eco_score': eco_score,
+        'rank': rank,
+        'issued_date': now.strftime("%Y-%m-%d %H:%M:%S"),
+        'certificate_id': certificate_id,
+        'qr_code_id': f"QR_{certificate_id}"
+    }
@@ -0,0 +1,238 @@
+# ==========================================
+# CHAT CACHE MODULE
+# Persistent EcoBot response cache keyed on normalized prompts
+# ==========================================
+#
+# Lookups are read-only. Hit/miss counters and last-used times are buffered in
+# memory and written in the background every STATS_FLUSH_INTERVAL seconds, so
+# no question waits on the cache's write lock before reaching Groq.
+
+import sys
+import time
+import atexit
+import hashlib
+import threading
+import unicodedata
+import storage
+
+CHAT_CACHE_DB_FILE = "ecobot_cache.db"
+
+# Cached answers older than this are regenerated
+CHAT_CACHE_TTL = 7 * 24 * 3600
+
+# Least recently used answers beyond this count are evicted
+CHAT_CACHE_MAX_ENTRIES = 5000
+
+# Seconds between background writes of buffered lookup stats
+STATS_FLUSH_INTERVAL = 2.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    response TEXT NOT NULL,
+    model TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    latency REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    lookups INTEGER NOT NULL DEFAULT 0,
+    hits INTEGER NOT NULL DEFAULT 0,
+    saved_seconds REAL NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO cache_stats (id) VALUES (1);
+"""
+
+# Write-lock waits and holds are reported under this name in file_lock stats
+LOCK_NAME = "ecobot_cache.db"
+
+_local = threading.local()
+
+
+def _conn():
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'path', None) != CHAT_CACHE_DB_FILE:
+        conn = storage.connect(CHAT_CACHE_DB_FILE)
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+        _local.path = CHAT_CACHE_DB_FILE
+    return conn
+
+
+def normalize(text):
+    """Fold case, punctuation and whitespace so near-identical questions share a key"""
+    folded = unicodedata.normalize('NFKC', text or "").casefold()
+    kept = "".join(" " if unicodedata.category(ch)[0] in "PSZC" else ch for ch in folded)
+    return " ".join(kept.split())
+
+
+def cache_key(question, model, template=""):
+    """Key for a question under a model and prompt template"""
+    raw = "\0".join((model, template, normalize(question)))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class _LookupStats:
+    """Lookup counters and last-used times not yet written to the cache database"""
+
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0
+        self.saved_seconds = 0.0
+        self.used = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.thread = None
+
+    def record(self, key=None, now=None, latency=0.0):
+        with self.lock:
+            self.lookups += 1
+            if key is not None:
+                self.hits += 1
+                self.saved_seconds += latency
+                self.used[key] = (now, self.used.get(key, (now, 0))[1] + 1)
+        self._ensure_thread()
+
+    def pending(self):
+        with self.lock:
+            return self.lookups, self.hits, self.saved_seconds
+
+    def flush(self):
+        """Write buffered stats in one transaction; kept for the next flush if that fails"""
+        with self.flush_lock:
+            with self.lock:
+                lookups, hits, saved, used = self.lookups, self.hits, self.saved_seconds, self.used
+                self.lookups, self.hits, self.saved_seconds, self.used = 0, 0, 0.0, {}
+            if not lookups:
+                return
+            try:
+                conn = _conn()
+                with storage.transaction(conn, lock_name=LOCK_NAME):
+                    conn.executemany(
+                        "UPDATE responses SET last_used = MAX(last_used, ?), hits = hits + ? WHERE key = ?",
+                        [(last_used, count, key) for key, (last_used, count) in used.items()]
+                    )
+                    conn.execute(
+                        "UPDATE cache_stats SET lookups = lookups + ?, hits = hits + ?, saved_seconds = saved_seconds + ? WHERE id = 1",
+                        (lookups, hits, saved)
+                    )
+            except Exception:
+                with self.lock:
+                    self.lookups += lookups
+                    self.hits += hits
+                    self.saved_seconds += saved
+                    for key, (last_used, count) in used.items():
+                        previous = self.used.get(key, (last_used, 0))
+                        self.used[key] = (max(previous[0], last_used), previous[1] + count)
+                raise
+
+    def clear(self):
+        with self.lock:
+            self.lookups, self.hits, self.saved_seconds, self.used = 0, 0, 0.0, {}
+
+    def _ensure_thread(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, name="chat-cache-stats", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(STATS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"EcoBot cache stats flush failed: {e}")
+
+
+_stats = _LookupStats()
+atexit.register(lambda: _stats.flush())
+
+
+def get(question, model, template=""):
+    """Cached response for a question, or None (a miss or an expired entry); read-only"""
+    conn = _conn()
+    now = time.time()
+    key = cache_key(question, model, template)
+    row = conn.execute(
+        "SELECT response, latency FROM responses WHERE key = ? AND created_at >= ?",
+        (key, now - CHAT_CACHE_TTL)
+    ).fetchone()
+    if row is None:
+        _stats.record()
+        return None
+    _stats.record(key, now, row['latency'])
+    return row['response']
+
+
+def flush_stats():
+    """Write buffered lookup stats now"""
+    _stats.flush()
+
+
+def put(question, model, response, latency, template=""):
+    """Store (or refresh) a response and evict expired and least recently used entries"""
+    if not response:
+        return
+    conn = _conn()
+    now = time.time()
+    with storage.transaction(conn, lock_name=LOCK_NAME):
+        conn.execute(
+            "INSERT INTO responses (key, question, response, model, created_at, last_used, latency) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET response = excluded.response, created_at = excluded.created_at, "
+            "last_used = excluded.last_used, latency = excluded.latency",
+            (cache_key(question, model, template), question, response, model, now, now, latency)
+        )
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (now - CHAT_CACHE_TTL,))
+        excess = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - CHAT_CACHE_MAX_ENTRIES
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+
+
+def get_stats():
+    """Entries, lookups, hit ratio and model time saved by the cache (all processes, plus this one's unflushed lookups)"""
+    conn = _conn()
+    stats = conn.execute("SELECT lookups, hits, saved_seconds FROM cache_stats WHERE id = 1").fetchone()
+    entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    pending_lookups, pending_hits, pending_saved = _stats.pending()
+    lookups, hits = stats['lookups'] + pending_lookups, stats['hits'] + pending_hits
+    return {
+        'entries': entries,
+        'lookups': lookups,
+        'hits': hits,
+        'hit_ratio': round(hits / lookups, 3) if lookups else 0.0,
+        'saved_seconds': round(stats['saved_seconds'] + pending_saved, 1),
+    }
+
+
+def clear():
+    """Drop every cached response and reset the counters"""
+    _stats.clear()
+    conn = _conn()
+    with storage.transaction(conn, lock_name=LOCK_NAME):
+        conn.execute("DELETE FROM responses")
+        conn.execute("UPDATE cache_stats SET lookups = 0, hits = 0, saved_seconds = 0 WHERE id = 1")
+
+
+if __name__ == "__main__":
+    # Usage: python chat_cache.py stats|clear
+    command = sys.argv[1] if len(sys.argv) >= 2 else ""
+    if command == "stats":
+        for name, value in get_stats().items():
+            print(f"{name}: {value}")
+    elif command == "clear":
+        clear()
+        print("EcoBot response cache cleared.")
+    else:
+        print("Usage: python chat_cache.py stats|clear")
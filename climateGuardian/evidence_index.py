@@ -0,0 +1,224 @@
+# ==========================================
+# EVIDENCE INDEX MODULE
+# Perceptual hashes of mission photos to reuse verdicts for re-uploads
+# ==========================================
+#
+# Every checked photo is stored in the evidence_hashes table with its 64-bit
+# pHash (DCT) and dHash (gradient), the mission, the verdict and the model's
+# answer. A multi-index hash table per mission (Hamming distance on pHash,
+# confirmed with dHash) finds near-duplicates, so a re-uploaded, resized or re-compressed
+# photo gets the stored verdict without another vision or EfficientNet call.
+# The indexes are process-wide and pick up rows written by other processes on
+# each lookup.
+
+import sys
+import threading
+from datetime import datetime
+import numpy as np
+import cv2
+import pandas as pd
+import storage
+
+# Largest Hamming distances still treated as the same photo
+PHASH_DISTANCE = 8
+DHASH_DISTANCE = 12
+
+VERIFIED = "verified"
+REJECTED = "rejected"
+
+
+def _to_int(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def _signed(value):
+    """64-bit hash as a signed integer (SQLite INTEGER range)"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def phash(gray):
+    """DCT perceptual hash: sign of the 8x8 low frequencies against their median"""
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8]
+    return _to_int(low > np.median(low.ravel()[1:]))
+
+
+def dhash(gray):
+    """Difference hash: brightness gradient between horizontal neighbours"""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return _to_int(small[:, 1:] > small[:, :-1])
+
+
+def hashes(image):
+    """(phash, dhash) of an image_ingest.IngestedImage"""
+    gray = image.gray()
+    return phash(gray), dhash(gray)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class MultiIndexHash:
+    """Multi-index hashing over 64-bit hashes: four 16-bit substrings, each in its own table.
+
+    Two hashes within distance r differ by at most r // 4 bits in at least one
+    substring (pigeonhole), so probing each table with every substring value
+    within r // 4 bits finds all matches without scanning the whole set.
+    """
+
+    CHUNKS = 4
+    CHUNK_BITS = 16
+
+    def __init__(self):
+        self.entries = []
+        self.tables = [{} for _ in range(self.CHUNKS)]
+        self._masks = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _chunks(self, value):
+        mask = (1 << self.CHUNK_BITS) - 1
+        return [(value >> (i * self.CHUNK_BITS)) & mask for i in range(self.CHUNKS)]
+
+    def _neighbour_masks(self, radius):
+        if radius not in self._masks:
+            masks = [0]
+            for _ in range(radius):
+                masks = sorted({m | (1 << bit) for m in masks for bit in range(self.CHUNK_BITS)} | set(masks))
+            self._masks[radius] = masks
+        return self._masks[radius]
+
+    def add(self, value, item):
+        position = len(self.entries)
+        self.entries.append((value, item))
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            table.setdefault(chunk, []).append(position)
+
+    def search(self, value, radius):
+        """(distance, item) pairs within ``radius`` of ``value``, nearest first"""
+        masks = self._neighbour_masks(radius // self.CHUNKS)
+        seen = set()
+        found = []
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            for mask in masks:
+                for position in table.get(chunk ^ mask, ()):
+                    if position in seen:
+                        continue
+                    seen.add(position)
+                    stored, item = self.entries[position]
+                    distance = hamming(value, stored)
+                    if distance <= radius:
+                        found.append((distance, item))
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+
+class EvidenceIndex:
+    """Per-mission hash indexes of original (non-duplicate) submissions"""
+
+    def __init__(self):
+        self.indexes = {}
+        self.last_id = 0
+        self.lock = threading.Lock()
+
+    def _refresh(self, conn):
+        rows = conn.execute(
+            "SELECT id, mission, phash, dhash FROM evidence_hashes "
+            "WHERE id > ? AND duplicate_of IS NULL ORDER BY id",
+            (self.last_id,)
+        ).fetchall()
+        for row in rows:
+            self.indexes.setdefault(row['mission'], MultiIndexHash()).add(
+                _unsigned(row['phash']), (row['id'], _unsigned(row['dhash']))
+            )
+        if rows:
+            self.last_id = rows[-1]['id']
+
+    def find(self, mission, image_hashes):
+        """Stored submission for a near-duplicate photo in this mission, or None"""
+        p, d = image_hashes
+        conn = storage.get_connection()
+        with self.lock:
+            self._refresh(conn)
+            index = self.indexes.get(mission)
+            candidates = index.search(p, PHASH_DISTANCE) if index else []
+        for _, (row_id, stored_d) in candidates:
+            if hamming(d, stored_d) <= DHASH_DISTANCE:
+                row = conn.execute("SELECT * FROM evidence_hashes WHERE id = ?", (row_id,)).fetchone()
+                return dict(row) if row is not None else None
+        return None
+
+    def record(self, mission, image_hashes, username, verdict, response, points=0, duplicate_of=None):
+        """Store a checked submission; returns its id"""
+        p, d = image_hashes
+        with storage.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO evidence_hashes (mission, phash, dhash, username, verdict, response, points, duplicate_of, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (mission, _signed(p), _signed(d), username, verdict, response, points, duplicate_of,
+                 datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            return cursor.lastrowid
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Process-wide evidence index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = EvidenceIndex()
+        return _index
+
+
+def find(mission, image_hashes):
+    return get_index().find(mission, image_hashes)
+
+
+def record(mission, image_hashes, username, verdict, response, points=0, duplicate_of=None):
+    return get_index().record(mission, image_hashes, username, verdict, response, points, duplicate_of)
+
+
+def duplicate_clusters():
+    """One row per photo that was re-submitted: who first sent it, its verdict and its re-uploads"""
+    return pd.read_sql_query(
+        """
+        SELECT o.id AS evidence_id, o.mission, o.username AS first_user, o.verdict,
+               o.created_at AS first_seen, COUNT(d.id) AS resubmissions,
+               COUNT(DISTINCT CASE WHEN d.username != o.username THEN d.username END) AS other_users,
+               GROUP_CONCAT(DISTINCT d.username) AS resubmitted_by,
+               MAX(d.created_at) AS last_seen
+        FROM evidence_hashes o
+        JOIN evidence_hashes d ON d.duplicate_of = o.id
+        GROUP BY o.id
+        ORDER BY resubmissions DESC, last_seen DESC
+        """,
+        storage.get_connection()
+    )
+
+
+def get_stats():
+    """Indexed photos and duplicates caught (each one a model call saved)"""
+    row = storage.get_connection().execute(
+        "SELECT SUM(duplicate_of IS NULL) AS originals, SUM(duplicate_of IS NOT NULL) AS duplicates "
+        "FROM evidence_hashes"
+    ).fetchone()
+    return {'originals': row['originals'] or 0, 'duplicates': row['duplicates'] or 0}
+
+
+if __name__ == "__main__":
+    # Usage: python evidence_index.py clusters
+    command = sys.argv[1] if len(sys.argv) >= 2 else ""
+    if command == "clusters":
+        print(duplicate_clusters().to_string(index=False))
+    else:
+        print("Usage: python evidence_index.py clusters")
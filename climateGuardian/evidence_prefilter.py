@@ -0,0 +1,146 @@
+# ==========================================
+# EVIDENCE PREFILTER MODULE
+# Millisecond local checks that reject clear failures before any model call
+# ==========================================
+#
+# Photos are checked for blur (the Laplacian variance EcoFoodClassifier uses
+# for its AI-generated check) and exposure (near-black, blown-out or blank
+# frames). Walking videos are checked for motion energy: the mean absolute
+# difference between consecutive sampled frames after downscaling and
+# blurring, which stays near zero for a static camera, a filmed photo or a
+# screen recording of a still. Only submissions that pass go to the vision
+# model or EfficientNet.
+#
+# The thresholds only catch clear failures; anything borderline is forwarded.
+#
+#     python evidence_prefilter.py photo <image> | video <video>
+
+import sys
+import time
+import threading
+import numpy as np
+import cv2
+
+# Laplacian variance on the ingested (<=1024 px) image
+BLUR_SUSPECT = 50   # flagged by EcoFoodClassifier.detect_ai_generated
+BLUR_REJECT = 30    # too smooth for a camera photo: rejected
+
+# Mean brightness (0-255) outside [DARK_MEAN, BRIGHT_MEAN], or a near-uniform frame
+DARK_MEAN = 16
+BRIGHT_MEAN = 245
+BLANK_STD = 6
+
+# Mean absolute difference (0-255) between consecutive sampled frames
+MOTION_MIN = 3.0
+MOTION_WIDTH = 160
+
+REASONS = {
+    'dark': "The photo is too dark to see anything. Turn on a light or move closer to one.",
+    'bright': "The photo is overexposed (almost white). Avoid pointing the camera at a bright light.",
+    'blank': "The photo is blank — nothing is visible in it.",
+    'blurry': "The photo is too blurry or does not look like a real camera photo. Hold steady and retake it.",
+    'unlit_video': "The video is too dark, overexposed or blank. Film outdoors in daylight.",
+    'static': "No movement was detected — the video looks static. Film yourself while actually walking.",
+}
+
+
+class Screening:
+    """Outcome of a local check: passed, or a rejection ``code`` and its user-facing ``reason``"""
+
+    def __init__(self, code, metrics, elapsed_ms):
+        self.ok = code is None
+        self.code = code
+        self.reason = REASONS.get(code)
+        self.metrics = metrics
+        self.elapsed_ms = elapsed_ms
+
+
+_stats = {'photos': 0, 'videos': 0, 'rejected': {}}
+_stats_lock = threading.Lock()
+
+
+def _finish(kind, code, metrics, started):
+    with _stats_lock:
+        _stats[kind] += 1
+        if code:
+            _stats['rejected'][code] = _stats['rejected'].get(code, 0) + 1
+    return Screening(code, metrics, (time.perf_counter() - started) * 1000)
+
+
+def exposure_problem(gray):
+    """'dark', 'bright' or 'blank' when a grayscale frame is unusable, else None"""
+    mean, std = float(gray.mean()), float(gray.std())
+    if mean < DARK_MEAN:
+        return 'dark'
+    if mean > BRIGHT_MEAN:
+        return 'bright'
+    if std < BLANK_STD:
+        return 'blank'
+    return None
+
+
+def check_photo(image):
+    """Screen an image_ingest.IngestedImage for blur and exposure"""
+    started = time.perf_counter()
+    gray = image.gray()
+    metrics = {'sharpness': round(float(image.laplacian_variance()), 1), 'brightness': round(float(gray.mean()), 1)}
+    code = exposure_problem(gray)
+    if code is None and metrics['sharpness'] < BLUR_REJECT:
+        code = 'blurry'
+    return _finish('photos', code, metrics, started)
+
+
+def _motion_frame(frame):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    height, width = gray.shape
+    small = cv2.resize(gray, (MOTION_WIDTH, max(1, round(height * MOTION_WIDTH / width))), interpolation=cv2.INTER_AREA)
+    # Blur away sensor noise and compression artifacts so only scene changes count
+    return cv2.GaussianBlur(small, (5, 5), 0)
+
+
+def motion_energy(frames):
+    """Mean absolute difference between consecutive frames (0-255), or None for fewer than two"""
+    if len(frames) < 2:
+        return None
+    small = [_motion_frame(frame) for frame in frames]
+    return float(np.mean([cv2.absdiff(a, b).mean() for a, b in zip(small, small[1:])]))
+
+
+def check_video(frames):
+    """Screen sampled BGR video frames for exposure and motion"""
+    started = time.perf_counter()
+    grays = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+    energy = motion_energy(grays)
+    metrics = {'motion': round(energy, 2) if energy is not None else None, 'frames': len(frames)}
+    code = None
+    if grays and all(exposure_problem(gray) for gray in grays):
+        code = 'unlit_video'
+    elif energy is not None and energy < MOTION_MIN:
+        code = 'static'
+    return _finish('videos', code, metrics, started)
+
+
+def get_stats():
+    """Submissions screened and rejected locally in this server process (each rejection is a model call saved)"""
+    with _stats_lock:
+        rejected = dict(_stats['rejected'])
+        return {'photos': _stats['photos'], 'videos': _stats['videos'],
+                'rejected': sum(rejected.values()), 'reasons': rejected}
+
+
+if __name__ == "__main__":
+    # Usage: python evidence_prefilter.py photo <image> | video <video>
+    command = sys.argv[1] if len(sys.argv) >= 2 else ""
+    if command == "photo" and len(sys.argv) >= 3:
+        import image_ingest
+        result = check_photo(image_ingest.ingest_file(sys.argv[2]))
+    elif command == "video" and len(sys.argv) >= 3:
+        import video_sampler
+        with open(sys.argv[2], 'rb') as f:
+            result = check_video(video_sampler.sample(f.read()).frames)
+    else:
+        print("Usage: python evidence_prefilter.py photo <image> | video <video>")
+        sys.exit(1)
+    print(f"{'PASS' if result.ok else 'REJECT'} in {result.elapsed_ms:.1f} ms {result.metrics}")
+    if result.reason:
+        print(result.reason)
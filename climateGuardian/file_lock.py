@@ -0,0 +1,195 @@
+# ==========================================
+# FILE LOCK MODULE
+# Advisory inter-process locks, atomic file replace and contention metrics
+# ==========================================
+
+import os
+import time
+import threading
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# Default longest time a writer waits for a lock before giving up
+LOCK_TIMEOUT = 10.0
+
+# Polling interval bounds while waiting on a held lock
+_MIN_POLL = 0.001
+_MAX_POLL = 0.05
+
+
+class LockTimeout(TimeoutError):
+    """Raised when a lock could not be acquired within its wait bound"""
+
+
+class LockStats:
+    """Contention counters for one named lock (per process)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.acquisitions = 0
+        self.contended = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_hold = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, waited, contended, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.acquisitions += 1
+            if contended:
+                self.contended += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def record_hold(self, held):
+        with self._lock:
+            self.total_hold += held
+
+    def as_dict(self):
+        with self._lock:
+            attempts = self.acquisitions + self.timeouts
+            return {
+                'lock': self.name,
+                'acquisitions': self.acquisitions,
+                'contended': self.contended,
+                'contention_rate': round(self.contended / attempts, 3) if attempts else 0.0,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(self.total_wait / attempts * 1000, 2) if attempts else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 2),
+                'avg_hold_ms': round(self.total_hold / self.acquisitions * 1000, 2) if self.acquisitions else 0.0,
+            }
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_stats(name):
+    """Counters for a named lock, created on first use"""
+    with _stats_lock:
+        if name not in _stats:
+            _stats[name] = LockStats(name)
+        return _stats[name]
+
+
+def get_lock_metrics():
+    """Contention metrics for every lock used in this process"""
+    with _stats_lock:
+        stats = list(_stats.values())
+    return [s.as_dict() for s in stats]
+
+
+def wait_with_backoff(try_acquire, name, timeout=LOCK_TIMEOUT):
+    """Call try_acquire() until it returns True or the wait bound expires.
+
+    Records wait time and contention under ``name``; raises LockTimeout.
+    """
+    stats = get_stats(name)
+    start = time.perf_counter()
+    deadline = start + timeout
+    poll = _MIN_POLL
+    contended = False
+    while not try_acquire():
+        contended = True
+        now = time.perf_counter()
+        if now >= deadline:
+            stats.record(now - start, contended, timed_out=True)
+            raise LockTimeout(f"Timed out after {timeout:.1f}s waiting for lock '{name}'")
+        time.sleep(min(poll, deadline - now))
+        poll = min(poll * 2, _MAX_POLL)
+    stats.record(time.perf_counter() - start, contended)
+
+
+def _try_lock_fd(fd):
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+# Threads in one process share a file lock, so serialize them first
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path):
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+@contextmanager
+def file_lock(path, timeout=LOCK_TIMEOUT, name=None):
+    """Hold an exclusive advisory lock on ``path`` (created if missing)"""
+    name = name or os.path.basename(path)
+    local = _thread_lock(path)
+    start = time.perf_counter()
+    if not local.acquire(timeout=timeout):
+        get_stats(name).record(time.perf_counter() - start, True, timed_out=True)
+        raise LockTimeout(f"Timed out after {timeout:.1f}s waiting for lock '{name}'")
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            remaining = max(timeout - (time.perf_counter() - start), 0.0)
+            wait_with_backoff(lambda: _try_lock_fd(fd), name, remaining)
+            acquired = time.perf_counter()
+            try:
+                yield
+            finally:
+                _unlock_fd(fd)
+                get_stats(name).record_hold(time.perf_counter() - acquired)
+        finally:
+            os.close(fd)
+    finally:
+        local.release()
+
+
+def atomic_write(path, data):
+    """Write bytes or text to ``path`` via a temp file and an atomic rename"""
+    mode = 'wb' if isinstance(data, (bytes, bytearray)) else 'w'
+    with atomic_replace(path, mode) as f:
+        f.write(data)
+
+
+@contextmanager
+def atomic_replace(path, mode='wb', encoding=None):
+    """Yield a temp file next to ``path``; on success it is fsynced and renamed over ``path``"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, mode, encoding=encoding if 'b' not in mode else None) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
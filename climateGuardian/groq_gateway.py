@@ -0,0 +1,379 @@
+# ==========================================
+# GROQ GATEWAY MODULE
+# One process-wide access layer for Groq text and vision calls
+# ==========================================
+#
+# Every call goes through the same pooled HTTP client, a token-bucket rate
+# limiter, jittered exponential backoff on transient errors (429, 5xx,
+# "over capacity", timeouts) and a circuit breaker. While the breaker is open
+# calls fail fast with CircuitOpenError so callers drop to their local
+# fallbacks instead of waiting on a degraded API. Nothing here touches
+# Streamlit; the app decides how failures are shown.
+
+import time
+import random
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+try:
+    import httpx
+    import groq
+except ImportError:
+    httpx = None
+    groq = None
+
+# Requests per second allowed for the whole process, and the burst size
+RATE_LIMIT = 5.0
+RATE_BURST = 10
+
+# Attempts after the first one for transient errors
+MAX_RETRIES = 2
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 8.0
+
+# Consecutive failures that open the breaker, and how long it stays open
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+
+# Upstream requests allowed at once for the whole process (bursts queue behind this)
+MAX_IN_FLIGHT = 8
+
+# Pooled connections shared by all sessions
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE = 10
+
+DEFAULT_TIMEOUT = 30.0
+
+# Latency samples kept per route for percentiles
+LATENCY_WINDOW = 200
+
+
+class GatewayError(RuntimeError):
+    """Groq could not be reached or is not configured"""
+
+
+class CircuitOpenError(GatewayError):
+    """Groq is degraded; the call was refused without contacting it"""
+
+
+class DeadlineExceeded(GatewayError):
+    """The caller's deadline passed before Groq answered"""
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``acquire`` blocks until a token is available"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """Take a token; returns seconds waited, or raises DeadlineExceeded after ``timeout``"""
+        started = time.monotonic()
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return now - started
+                wait = (1 - self.tokens) / self.rate
+            if timeout is not None and now + wait - started > timeout:
+                raise DeadlineExceeded("Groq rate limit: no capacity within the deadline")
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Closed -> open after ``threshold`` consecutive failures -> half-open after ``cooldown``.
+
+    In the half-open state one trial call is let through; its outcome closes or
+    re-opens the breaker. A trial that is abandoned before reaching Groq
+    (rate limit, slot or deadline) is handed back with ``release_trial``.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.trial_thread = None
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self.lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self.lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial:
+                self.trial = True
+                self.trial_thread = threading.get_ident()
+                return True
+            return False
+
+    def release_trial(self):
+        """Let another call take the half-open trial if this thread holds it (no outcome recorded)"""
+        with self.lock:
+            if self.trial and self.trial_thread == threading.get_ident():
+                self.trial = False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                if self.opened_at is None or self.trial:
+                    self.trips += 1
+                self.opened_at = time.monotonic()
+                self.trial = False
+
+
+def is_transient(error):
+    """Whether an error is worth retrying (rate limits, server errors, timeouts)"""
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return status == 429 or status >= 500
+    if groq is not None and isinstance(error, (groq.APIConnectionError, groq.APITimeoutError)):
+        return True
+    text = str(error).lower()
+    return "503" in text or "over capacity" in text or "timed out" in text
+
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff, never shorter than a server Retry-After"""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt + 1)))
+    return max(delay, retry_after or 0)
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.short_circuited = 0
+        self.throttle_wait = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def snapshot(self):
+        ordered = sorted(self.latencies)
+
+        def pct(p):
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 1) if ordered else 0.0
+
+        return {
+            'calls': self.calls,
+            'successes': self.successes,
+            'failures': self.failures,
+            'retries': self.retries,
+            'short_circuited': self.short_circuited,
+            'throttle_wait_s': round(self.throttle_wait, 2),
+            'p50_ms': pct(0.5),
+            'p95_ms': pct(0.95),
+        }
+
+
+class GroqGateway:
+    """Pooled Groq client with rate limiting, retries, a circuit breaker and per-route metrics"""
+
+    def __init__(self, api_key, base_url=None, rate=RATE_LIMIT, burst=RATE_BURST):
+        if groq is None:
+            raise GatewayError("The groq package is not installed.")
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE),
+            timeout=DEFAULT_TIMEOUT,
+        )
+        # Retries are handled here so they share the breaker and the metrics
+        self.client = groq.Groq(api_key=api_key, base_url=base_url, http_client=self.http_client, max_retries=0)
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker()
+        self.slots = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.cap_waits = 0
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _route(self, route):
+        with self.lock:
+            return self.metrics.setdefault(route, RouteMetrics())
+
+    def _count(self, metrics, field, amount=1):
+        with self.lock:
+            setattr(metrics, field, getattr(metrics, field) + amount)
+
+    @contextmanager
+    def slot(self, timeout):
+        """Hold one of the MAX_IN_FLIGHT upstream request slots"""
+        started = time.monotonic()
+        if not self.slots.acquire(timeout=max(timeout, 0)):
+            raise DeadlineExceeded("Too many Groq requests in flight; no slot freed up in time.")
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            if time.monotonic() - started > 0.001:
+                self.cap_waits += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+            self.slots.release()
+
+    def create(self, route, timeout=DEFAULT_TIMEOUT, retries=MAX_RETRIES, deadline=None, hold_slot=True, **params):
+        """``chat.completions.create`` with rate limiting, retries and the breaker.
+
+        ``route`` names the caller (chat, quiz, vision, ...) for metrics.
+        ``deadline`` is an absolute ``time.monotonic()`` time: each attempt's
+        timeout is cut to fit it and no retry is started that could not finish
+        before it. Each attempt holds an in-flight slot unless ``hold_slot`` is
+        False (the caller holds one). Raises CircuitOpenError when Groq is degraded,
+        DeadlineExceeded when the deadline passes, otherwise the last API error.
+        """
+        metrics = self._route(route)
+        self._count(metrics, 'calls')
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self._count(metrics, 'short_circuited')
+                raise CircuitOpenError("Groq is temporarily unavailable (circuit open); using local fallback.")
+            # Until the request is sent, an abort must hand a half-open trial back
+            sent = False
+            try:
+                budget = timeout
+                if deadline is not None:
+                    budget = min(timeout, deadline - time.monotonic())
+                    if budget <= 0:
+                        raise DeadlineExceeded(f"Groq call on route '{route}' ran out of time.")
+                self._count(metrics, 'throttle_wait', self.bucket.acquire(budget))
+                if deadline is not None:
+                    budget = min(timeout, deadline - time.monotonic())
+                with self.slot(budget) if hold_slot else nullcontext():
+                    if deadline is not None:
+                        budget = min(timeout, deadline - time.monotonic())
+                    sent = True
+                    completion = self.client.chat.completions.create(timeout=max(budget, 0.001), **params)
+            except DeadlineExceeded:
+                self._count(metrics, 'failures')
+                raise
+            except Exception as e:
+                transient = is_transient(e)
+                if transient:
+                    self.breaker.record_failure()
+                delay = backoff_delay(attempt, _retry_after(e)) if transient else 0
+                in_time = deadline is None or time.monotonic() + delay < deadline
+                if transient and attempt < retries and in_time:
+                    self._count(metrics, 'retries')
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                if not transient:
+                    # Bad requests and auth errors say nothing about Groq's health:
+                    # neither a success nor a failure, but a half-open trial is handed back
+                    self.breaker.release_trial()
+                self._count(metrics, 'failures')
+                if transient and not in_time:
+                    raise DeadlineExceeded(f"Groq call on route '{route}' ran out of time: {e}") from e
+                raise
+            finally:
+                if not sent:
+                    self.breaker.release_trial()
+            self.breaker.record_success()
+            with self.lock:
+                metrics.successes += 1
+                metrics.latencies.append(time.perf_counter() - started)
+            return completion
+
+    def complete(self, prompt, model, route="text", temperature=0.7, max_tokens=1024, **kwargs):
+        """Text of a single-prompt completion"""
+        completion = self.create(
+            route, model=model, messages=[{"role": "user", "content": prompt}],
+            temperature=temperature, max_tokens=max_tokens, **kwargs
+        )
+        return completion.choices[0].message.content
+
+    def vision(self, prompt, images, model, route="vision", temperature=0.1, max_tokens=300, **kwargs):
+        """Text of a completion over a prompt and ``images`` given as (mime_type, base64) pairs"""
+        content = [{"type": "text", "text": prompt}]
+        for mime_type, data in images:
+            content.append({"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{data}"}})
+        completion = self.create(
+            route, model=model, messages=[{"role": "user", "content": content}],
+            temperature=temperature, max_tokens=max_tokens, **kwargs
+        )
+        return completion.choices[0].message.content
+
+    def stream(self, prompt, model, route="stream", temperature=0.7, max_tokens=1024, deadline=None, **kwargs):
+        """Yield text chunks of a streamed completion (retries apply until the stream opens).
+
+        The in-flight slot is held until the stream ends.
+        """
+        wait_for = DEFAULT_TIMEOUT if deadline is None else deadline - time.monotonic()
+        with self.slot(wait_for):
+            stream = self.create(
+                route, model=model, messages=[{"role": "user", "content": prompt}],
+                temperature=temperature, max_tokens=max_tokens, stream=True,
+                deadline=deadline, hold_slot=False, **kwargs
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    def stats(self):
+        """Breaker state, trip count, in-flight requests and per-route call metrics"""
+        with self.lock:
+            routes = {name: m.snapshot() for name, m in self.metrics.items()}
+            in_flight, peak, cap_waits = self.in_flight, self.peak_in_flight, self.cap_waits
+        return {
+            'breaker': self.breaker.state,
+            'breaker_trips': self.breaker.trips,
+            'in_flight': in_flight,
+            'peak_in_flight': peak,
+            'cap_waits': cap_waits,
+            'routes': routes,
+        }
+
+
+_gateways = {}
+_gateways_lock = threading.Lock()
+
+
+def get_gateway(api_key, base_url=None):
+    """Process-wide gateway for an API key (shared by every session)"""
+    with _gateways_lock:
+        key = (api_key, base_url)
+        if key not in _gateways:
+            _gateways[key] = GroqGateway(api_key, base_url=base_url)
+        return _gateways[key]
@@ -0,0 +1,501 @@
+# ==========================================
+# GROQ STAND-IN MODULE
+# Offline OpenAI-compatible Groq server, fixture recorder and load benchmark
+# ==========================================
+#
+# The stand-in answers POST /openai/v1/chat/completions like Groq does (plain
+# and streamed), so the real app code runs against it unchanged:
+#
+#     python groq_standin.py serve [port]
+#     GROQ_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+#
+# Responses are replayed from recorded fixtures (matched on the prompt text and
+# image digests, not the model) or synthesized per call type (chat, quiz,
+# vision) when no fixture matches. Latency and faults come from a profile set
+# in GROQ_STANDIN_PROFILE, e.g. "median=0.8,sigma=0.5,p503=0.1,p429=0.05,malformed=0.05":
+#
+#   median, sigma  log-normal latency (seconds) of a full response
+#   recorded=1     use each fixture's recorded latency instead
+#   p503, p429     share of requests answered "over capacity" / rate limited
+#   malformed      share of answers deliberately broken (bad JSON, no verdict)
+#   seed           random seed for repeatable runs
+#
+# Recording proxies real traffic to Groq and appends every answer to the
+# fixture file:
+#
+#     python groq_standin.py record [port] [upstream]
+#
+# Benchmark the gateway, router, quiz pool and chat cache against an
+# in-process stand-in (no network needed):
+#
+#     python groq_standin.py bench [requests] [concurrency]
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import hashlib
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GROQ_FIXTURES_FILE = os.path.join('assets', 'groq_fixtures.jsonl')
+PROFILE_ENV = "GROQ_STANDIN_PROFILE"
+DEFAULT_PORT = 8765
+DEFAULT_UPSTREAM = "https://api.groq.com"
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+DEFAULT_PROFILE = {
+    'median': 0.6,
+    'sigma': 0.5,
+    'recorded': 0,
+    'p503': 0.0,
+    'p429': 0.0,
+    'malformed': 0.0,
+    'seed': None,
+}
+
+
+def parse_profile(text):
+    """Profile dict from "key=value,..." (unknown keys are rejected)"""
+    profile = dict(DEFAULT_PROFILE)
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        name, _, value = item.partition("=")
+        if name not in profile:
+            raise ValueError(f"Unknown stand-in profile setting '{name}'")
+        profile[name] = float(value)
+    return profile
+
+# ==========================================
+# FIXTURES
+# ==========================================
+
+def _message_parts(messages):
+    """Prompt texts and image digests of a chat request, in order"""
+    parts = []
+    for message in messages or []:
+        content = message.get('content')
+        if isinstance(content, str):
+            parts.append(content)
+            continue
+        for item in content or []:
+            if item.get('type') == 'text':
+                parts.append(item.get('text', ''))
+            elif item.get('type') == 'image_url':
+                url = item.get('image_url', {}).get('url', '')
+                parts.append("image:" + hashlib.sha256(url.encode('utf-8')).hexdigest())
+    return parts
+
+
+def fixture_key(messages):
+    """Replay key for a request: prompt text and images, independent of the model"""
+    return hashlib.sha256(json.dumps(_message_parts(messages)).encode('utf-8')).hexdigest()
+
+
+def request_kind(messages):
+    """'vision', 'quiz' or 'chat' for a request"""
+    parts = _message_parts(messages)
+    if any(p.startswith("image:") for p in parts):
+        return 'vision'
+    if any("multiple choice question" in p for p in parts):
+        return 'quiz'
+    return 'chat'
+
+
+class FixtureStore:
+    """Recorded answers by request key, with the answers of each kind for fallback sampling"""
+
+    def __init__(self, path=GROQ_FIXTURES_FILE):
+        self.path = path
+        self.by_key = {}
+        self.by_kind = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        self._index(json.loads(line))
+
+    def _index(self, record):
+        self.by_key[record['key']] = record
+        self.by_kind.setdefault(record['kind'], []).append(record)
+
+    def __len__(self):
+        return len(self.by_key)
+
+    def lookup(self, messages):
+        return self.by_key.get(fixture_key(messages))
+
+    def append(self, messages, model, response, latency):
+        """Record one answer (appended to the fixture file)"""
+        prompt = next((p for p in _message_parts(messages) if not p.startswith("image:")), "")
+        record = {
+            'key': fixture_key(messages),
+            'kind': request_kind(messages),
+            'model': model,
+            'prompt': prompt[:200],
+            'response': response,
+            'latency': round(latency, 4),
+        }
+        with self.lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._index(record)
+
+# ==========================================
+# SYNTHETIC ANSWERS
+# ==========================================
+
+_LEVEL_COUNTS = re.compile(r"(\d+) (Easy|Medium|Hard)")
+
+
+def _synthetic_question(level, n):
+    return {
+        "q": f"Stand-in {level} question #{n}: which habit saves the most energy?",
+        "options": ["Switching off idle chargers", "Leaving lights on", "Running a half-empty dishwasher", "Heating an open room"],
+        "ans": "A",
+        "exp": "Idle chargers draw phantom power.",
+        "difficulty": level,
+    }
+
+
+def synthesize(messages, rng):
+    """A well-formed answer of the right shape for a request with no fixture"""
+    kind = request_kind(messages)
+    prompt = " ".join(p for p in _message_parts(messages) if not p.startswith("image:"))
+    if kind == 'vision':
+        if "VERIFIED_PASS" in prompt:
+            return "VERIFIED_PASS|Stand-in: switch is OFF.|Saved: ~0.5 Watts"
+        return "VERIFIED|Stand-in verdict: looks like a real photo|Walking|Saved ~500g CO2"
+    if kind == 'quiz':
+        if "JSON object per line" in prompt:
+            lines = []
+            for count, level in _LEVEL_COUNTS.findall(prompt):
+                for _ in range(int(count)):
+                    lines.append(json.dumps(_synthetic_question(level, rng.randrange(10 ** 6))))
+            return "\n".join(lines)
+        level = next((d for d in ("Easy", "Medium", "Hard") if d in prompt), "Medium")
+        q = _synthetic_question(level, rng.randrange(10 ** 6))
+        return " | ".join([q['q'], *q['options'], q['ans'], q['exp']])
+    return "Stand-in EcoBot: reuse what you can, recycle the rest, and switch off what you are not using! 🌱"
+
+
+def malform(text, kind, rng):
+    """A deliberately broken version of an answer"""
+    if kind == 'quiz':
+        # Cut mid-object and add a stray trailing comma, like a truncated completion
+        return text[:max(1, int(len(text) * rng.uniform(0.3, 0.8)))] + ",\n{"
+    if kind == 'vision':
+        return "I am not able to determine that from the image."
+    return ""
+
+# ==========================================
+# SERVER
+# ==========================================
+
+def _completion_body(model, text):
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(text.split()), "total_tokens": len(text.split())},
+    }
+
+
+def _chunk_body(chunk_id, model, text=None, finish=None):
+    delta = {"content": text} if text is not None else {}
+    return {
+        "id": chunk_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+    }
+
+
+class StandinServer(ThreadingHTTPServer):
+    """Threaded HTTP server replaying fixtures under a latency and fault profile"""
+
+    daemon_threads = True
+
+    def __init__(self, address, profile=None, fixtures=None, upstream=None):
+        super().__init__(address, _Handler)
+        self.profile = dict(profile or DEFAULT_PROFILE)
+        self.fixtures = fixtures if fixtures is not None else FixtureStore()
+        self.upstream = upstream
+        seed = self.profile.get('seed')
+        self.rng = random.Random(None if seed is None else int(seed))
+        self.rng_lock = threading.Lock()
+        self.counts = {'requests': 0, 'fixture_hits': 0, 'synthetic': 0, '503': 0, '429': 0, 'malformed': 0, 'recorded': 0}
+        self.counts_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name):
+        with self.counts_lock:
+            self.counts[name] += 1
+
+    def draw(self, fn, *args):
+        with self.rng_lock:
+            return fn(*args)
+
+    def latency(self, fixture):
+        if fixture is not None and self.profile['recorded']:
+            return fixture['latency']
+        return self.draw(self.rng.lognormvariate, math.log(max(self.profile['median'], 1e-6)), self.profile['sigma'])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.server.counts_lock:
+                counts = dict(self.server.counts)
+            self._send_json(200, {'counts': counts, 'fixtures': len(self.server.fixtures), 'profile': self.server.profile})
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+        request = json.loads(body or b"{}")
+        self.server.count('requests')
+        if self.server.upstream:
+            self._proxy(body, request)
+        else:
+            self._replay(request)
+
+    def _replay(self, request):
+        server = self.server
+        profile = server.profile
+        messages = request.get('messages', [])
+        model = request.get('model', 'standin')
+
+        roll = server.draw(server.rng.random)
+        if roll < profile['p503']:
+            server.count('503')
+            time.sleep(server.draw(server.rng.uniform, 0.05, 0.3))
+            self._send_json(503, {"error": {"message": "Service Unavailable: model is over capacity", "type": "internal_server_error"}})
+            return
+        if roll < profile['p503'] + profile['p429']:
+            server.count('429')
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}}, {"retry-after": "0.5"})
+            return
+
+        fixture = server.fixtures.lookup(messages)
+        if fixture is not None:
+            server.count('fixture_hits')
+            text = fixture['response']
+        else:
+            server.count('synthetic')
+            text = server.draw(synthesize, messages, server.rng)
+        if server.draw(server.rng.random) < profile['malformed']:
+            server.count('malformed')
+            text = server.draw(malform, text, request_kind(messages), server.rng)
+
+        delay = server.latency(fixture)
+        if not request.get('stream'):
+            time.sleep(delay)
+            self._send_json(200, _completion_body(model, text))
+            return
+
+        # Stream: first token after ~30% of the latency, the rest spread over the remainder
+        tokens = re.findall(r"\S+\s*|\s+", text) or [""]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        time.sleep(delay * 0.3)
+        gap = delay * 0.7 / len(tokens)
+        try:
+            for i, token in enumerate(tokens):
+                if i:
+                    time.sleep(gap)
+                self.wfile.write(f"data: {json.dumps(_chunk_body(chunk_id, model, token))}\n\n".encode('utf-8'))
+                self.wfile.flush()
+            self.wfile.write(f"data: {json.dumps(_chunk_body(chunk_id, model, finish='stop'))}\n\n".encode('utf-8'))
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _proxy(self, body, request):
+        """Forward to the real API and record the answer as a fixture"""
+        import httpx
+        server = self.server
+        headers = {name: self.headers[name] for name in ("Authorization", "Content-Type") if self.headers.get(name)}
+        url = server.upstream.rstrip("/") + self.path
+        started = time.perf_counter()
+        with httpx.Client(timeout=120) as client:
+            with client.stream("POST", url, content=body, headers=headers) as upstream:
+                self.send_response(upstream.status_code)
+                self.send_header("Content-Type", upstream.headers.get("content-type", "application/json"))
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                # Decoded bytes: the Content-Encoding header is not forwarded
+                raw = b""
+                for data in upstream.iter_bytes():
+                    raw += data
+                    self.wfile.write(data)
+                    self.wfile.flush()
+        if upstream.status_code != 200:
+            return
+        text = raw.decode('utf-8', errors='replace')
+        if request.get('stream'):
+            pieces = []
+            for line in text.splitlines():
+                if line.startswith("data: ") and line != "data: [DONE]":
+                    delta = json.loads(line[6:])['choices'][0].get('delta', {})
+                    pieces.append(delta.get('content') or "")
+            answer = "".join(pieces)
+        else:
+            answer = json.loads(text)['choices'][0]['message']['content']
+        server.fixtures.append(request.get('messages', []), request.get('model', ''), answer, time.perf_counter() - started)
+        server.count('recorded')
+
+
+def start(port=0, profile=None, fixtures=None, upstream=None):
+    """Start a stand-in (or recording proxy) on a background thread; returns the server"""
+    server = StandinServer(("127.0.0.1", port), profile, fixtures, upstream)
+    threading.Thread(target=server.serve_forever, name="groq-standin", daemon=True).start()
+    return server
+
+# ==========================================
+# BENCHMARK
+# ==========================================
+
+_BENCH_QUESTIONS = [
+    "How can I recycle glass?",
+    "What is a carbon footprint?",
+    "Why should I compost food scraps?",
+    "How do solar panels work?",
+    "What is phantom power?",
+]
+
+
+def benchmark(requests=200, concurrency=16, profile=None):
+    """Drive the gateway, router, quiz pool and chat cache against an in-process stand-in.
+
+    Returns per-workload latency percentiles and outcome counts, plus the
+    gateway, router and stand-in counters.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import chat_cache
+    import groq_gateway
+    import model_router
+    import quiz_generator
+
+    profile = profile or parse_profile(os.environ.get(PROFILE_ENV))
+    server = start(profile=profile, fixtures=FixtureStore())
+    gateway = groq_gateway.GroqGateway("standin-key", base_url=server.url)
+    router = model_router.ModelRouter(gateway)
+    pool = quiz_generator.QuestionPool(lambda prompt, model: router.complete('quiz', prompt))
+    tiny_image = [("image/jpeg", "c3RhbmQtaW4=")]
+
+    cache_dir = tempfile.mkdtemp(prefix="groq-standin-")
+    cache_file = chat_cache.CHAT_CACHE_DB_FILE
+    chat_cache.CHAT_CACHE_DB_FILE = os.path.join(cache_dir, "ecobot_cache.db")
+
+    results = {name: {'latencies': [], 'outcomes': {}} for name in ("chat", "quiz", "vision")}
+    lock = threading.Lock()
+
+    def job(i):
+        name = ("chat", "chat", "quiz", "vision")[i % 4]
+        started = time.perf_counter()
+        try:
+            if name == "chat":
+                question = _BENCH_QUESTIONS[i % len(_BENCH_QUESTIONS)]
+                answer = chat_cache.get(question, "bench")
+                outcome = "cache_hit" if answer else "ok"
+                if not answer:
+                    answer = router.complete('chat', question)
+                    chat_cache.put(question, "bench", answer, time.perf_counter() - started)
+                if not answer:
+                    outcome = "empty"
+            elif name == "quiz":
+                questions, errors = pool.generate_set(list(quiz_generator.DIFFICULTIES))
+                missing = sum(q is None for q in questions)
+                outcome = "ok" if not missing else "local_fallback"
+            else:
+                verdict = router.vision('vision', "Bench verification: respond VERIFIED or REJECTED.", tiny_image)
+                outcome = "ok" if "VERIFIED" in verdict else "unparsed"
+        except groq_gateway.CircuitOpenError:
+            outcome = "circuit_open"
+        except groq_gateway.DeadlineExceeded:
+            outcome = "deadline"
+        except Exception as e:
+            outcome = type(e).__name__
+        elapsed = time.perf_counter() - started
+        with lock:
+            results[name]['latencies'].append(elapsed)
+            results[name]['outcomes'][outcome] = results[name]['outcomes'].get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(job, range(requests)))
+    finally:
+        chat_cache.flush_stats()
+        chat_cache.CHAT_CACHE_DB_FILE = cache_file
+        server.shutdown()
+    wall = time.perf_counter() - started
+
+    report = {'wall_s': round(wall, 2), 'throughput_rps': round(requests / wall, 1), 'workloads': {}}
+    for name, data in results.items():
+        ordered = sorted(data['latencies'])
+        pct = lambda p: round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 1) if ordered else 0.0
+        report['workloads'][name] = {'count': len(ordered), 'p50_ms': pct(0.5), 'p95_ms': pct(0.95), 'outcomes': data['outcomes']}
+    report['standin'] = dict(server.counts)
+    report['gateway'] = gateway.stats()
+    report['router'] = router.stats()
+    report['quiz_pool'] = pool.stats()
+    return report
+
+
+if __name__ == "__main__":
+    # Usage: python groq_standin.py serve [port] | record [port] [upstream] | bench [requests] [concurrency]
+    command = sys.argv[1] if len(sys.argv) >= 2 else ""
+    if command in ("serve", "record"):
+        port = int(sys.argv[2]) if len(sys.argv) >= 3 else DEFAULT_PORT
+        upstream = (sys.argv[3] if len(sys.argv) >= 4 else DEFAULT_UPSTREAM) if command == "record" else None
+        server = StandinServer(("127.0.0.1", port), parse_profile(os.environ.get(PROFILE_ENV)), upstream=upstream)
+        mode = f"recording {upstream} into {GROQ_FIXTURES_FILE}" if upstream else f"replaying {len(server.fixtures)} fixture(s)"
+        print(f"Groq stand-in on {server.url} ({mode}); set GROQ_BASE_URL={server.url}")
+        server.serve_forever()
+    elif command == "bench":
+        requests = int(sys.argv[2]) if len(sys.argv) >= 3 else 200
+        concurrency = int(sys.argv[3]) if len(sys.argv) >= 4 else 16
+        print(json.dumps(benchmark(requests, concurrency), indent=2))
+    else:
+        print("Usage: python groq_standin.py serve [port] | record [port] [upstream] | bench [requests] [concurrency]")
@@ -0,0 +1,186 @@
+# ==========================================
+# IMAGE INGEST MODULE
+# Decode each mission upload once and share the pixels with every consumer
+# ==========================================
+#
+# Phone photos are decoded with JPEG draft mode (DCT-domain 1/2, 1/4 or 1/8
+# scaling), so a 12-megapixel upload is never expanded to full resolution,
+# then fitted to INGEST_MAX_SIDE. The resulting RGB array is the only decoded
+# copy: the blur (Laplacian) check, the EfficientNet input and the Groq vision
+# payload (a JPEG re-encode at PAYLOAD_QUALITY) are all derived from it.
+#
+#     python image_ingest.py bench [count]
+
+import io
+import sys
+import time
+import base64
+import numpy as np
+import cv2
+from PIL import Image, ImageOps
+
+# Longest side kept after decoding (what the vision model receives)
+INGEST_MAX_SIDE = 1024
+
+# JPEG quality of the vision payload; 4:2:0 chroma and optimized Huffman tables keep it small
+PAYLOAD_QUALITY = 80
+
+MODEL_INPUT_SIZE = 224
+
+
+class IngestedImage:
+    """One decoded upload (RGB uint8 array) with lazily derived views"""
+
+    mime_type = "image/jpeg"
+
+    def __init__(self, rgb, source_size, source_format):
+        self.rgb = rgb
+        self.source_size = source_size
+        self.source_format = source_format
+        self._gray = None
+        self._jpeg = None
+
+    @property
+    def size(self):
+        return self.rgb.shape[1], self.rgb.shape[0]
+
+    def gray(self):
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.rgb, cv2.COLOR_RGB2GRAY)
+        return self._gray
+
+    def laplacian_variance(self):
+        """Sharpness score used by the blur / AI-generated check"""
+        return cv2.Laplacian(self.gray(), cv2.CV_64F).var()
+
+    def model_input(self, size=MODEL_INPUT_SIZE):
+        """Float batch of one (1, size, size, 3) for ImageNet classifiers"""
+        resized = cv2.resize(self.rgb, (size, size), interpolation=cv2.INTER_AREA)
+        return resized.astype(np.float32)[np.newaxis]
+
+    def jpeg(self, quality=PAYLOAD_QUALITY):
+        if self._jpeg is None:
+            out = io.BytesIO()
+            Image.fromarray(self.rgb).save(out, format="JPEG", quality=quality, subsampling="4:2:0", optimize=True)
+            self._jpeg = out.getvalue()
+        return self._jpeg
+
+    def payload(self):
+        """(mime_type, base64) pair for a Groq vision request"""
+        return self.mime_type, base64.b64encode(self.jpeg()).decode('ascii')
+
+
+def ingest(data, max_side=INGEST_MAX_SIDE):
+    """Decode image bytes (or a file-like upload) once, downscaled to ``max_side``"""
+    if hasattr(data, 'getvalue'):
+        data = data.getvalue()
+    image = Image.open(io.BytesIO(data))
+    source_size, source_format = image.size, image.format
+    # JPEG only: decode straight at the smallest 1/2^n scale that still covers max_side
+    image.draft("RGB", (max_side, max_side))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.thumbnail((max_side, max_side))
+    return IngestedImage(np.asarray(image), source_size, source_format)
+
+
+def ingest_file(path, max_side=INGEST_MAX_SIDE):
+    with open(path, 'rb') as f:
+        return ingest(f.read(), max_side)
+
+# ==========================================
+# BENCHMARK
+# ==========================================
+
+def _write_sample_jpeg(path, width=4000, height=3000):
+    """A 12-megapixel phone-like JPEG: smooth shapes with mild sensor noise"""
+    rng = np.random.default_rng(0)
+    small = cv2.resize(rng.integers(0, 256, (12, 16, 3), dtype=np.uint8), (width, height), interpolation=cv2.INTER_CUBIC)
+    noise = rng.integers(-6, 7, small.shape, dtype=np.int16)
+    rgb = np.clip(small.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    Image.fromarray(rgb).save(path, format="JPEG", quality=92)
+
+
+def _previous_pipeline(data):
+    """What mission_tracker did per upload: thumbnail + re-encode, and a temp-file decode for compost"""
+    import os
+    import tempfile
+    image = Image.open(io.BytesIO(data))
+    image.thumbnail((1024, 1024))
+    out = io.BytesIO()
+    image.save(out, format=image.format or 'JPEG')
+    payload = base64.b64encode(out.getvalue()).decode('utf-8')
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp:
+        tmp.write(data)
+        path = tmp.name
+    try:
+        gray = cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2GRAY)
+        score = cv2.Laplacian(gray, cv2.CV_64F).var()
+        # keras.preprocessing.image.load_img(path, target_size=(224, 224)) decodes the file again
+        model_input = np.asarray(Image.open(path).convert("RGB").resize((224, 224), Image.NEAREST), dtype=np.float32)
+    finally:
+        os.remove(path)
+    return len(payload), score, model_input.shape
+
+
+def _ingest_pipeline(data):
+    image = ingest(data)
+    _, payload = image.payload()
+    return len(payload), image.laplacian_variance(), image.model_input().shape
+
+
+def _measure(name, path, count, queue):
+    import resource
+    pipeline = {"previous": _previous_pipeline, "ingest": _ingest_pipeline}[name]
+    with open(path, 'rb') as f:
+        data = f.read()
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    times = []
+    for _ in range(count):
+        start = time.perf_counter()
+        result = pipeline(data)
+        times.append(time.perf_counter() - start)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put({'ms': sorted(times)[len(times) // 2] * 1000, 'peak_mb': (peak - base) / 1024, 'payload_bytes': result[0]})
+
+
+def benchmark(count=10):
+    """Median time and peak memory growth per 12 MP upload, each pipeline in a fresh process.
+
+    The sample is built in its own process too: the peak RSS counter carries
+    over to child processes, so building it here would hide the pipelines' peaks.
+    """
+    import os
+    import tempfile
+    import multiprocessing
+    context = multiprocessing.get_context("spawn")
+    fd, path = tempfile.mkstemp(suffix=".jpg")
+    os.close(fd)
+    try:
+        maker = context.Process(target=_write_sample_jpeg, args=(path,))
+        maker.start()
+        maker.join()
+        results = {}
+        for name in ("previous", "ingest"):
+            queue = context.Queue()
+            process = context.Process(target=_measure, args=(name, path, count, queue))
+            process.start()
+            results[name] = queue.get()
+            process.join()
+    finally:
+        os.remove(path)
+    return results
+
+
+if __name__ == "__main__":
+    # Usage: python image_ingest.py bench [count]
+    command = sys.argv[1] if len(sys.argv) >= 2 else ""
+    if command == "bench":
+        count = int(sys.argv[2]) if len(sys.argv) >= 3 else 10
+        results = benchmark(count)
+        for label, r in results.items():
+            print(f"{label:>9}: {r['ms']:7.1f} ms/upload, peak +{r['peak_mb']:6.1f} MB, payload {r['payload_bytes'] / 1024:6.1f} KB (base64)")
+        print(f"{'speedup':>9}: {results['previous']['ms'] / results['ingest']['ms']:7.2f}x")
+    else:
+        print("Usage: python image_ingest.py bench [count]")
@@ -0,0 +1,254 @@
+# ==========================================
+# LEADERBOARD MODULE
+# In-memory order-statistic index over eco scores
+# ==========================================
+
+import bisect
+import threading
+import storage
+
+
+class FenwickTree:
+    """Binary indexed tree of counts supporting prefix sums and k-th element search"""
+
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def add(self, index, amount):
+        """Add amount at a 0-based index"""
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += amount
+            i += i & -i
+
+    def prefix(self, index):
+        """Sum of counts at 0-based indexes [0, index]"""
+        total = 0
+        i = min(index + 1, self.size)
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, k):
+        """Smallest 0-based index whose prefix sum is >= k (k is 1-based)"""
+        pos = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self.tree[nxt] < k:
+                pos = nxt
+                k -= self.tree[nxt]
+            step >>= 1
+        return pos
+
+
+class RankIndex:
+    """Ranks users by eco score in O(log n).
+
+    Scores are bucketed by integer value in a Fenwick tree; users that share a
+    score are ordered by username, so ranks are unique like the sorted table.
+    """
+
+    def __init__(self):
+        self.scores = {}
+        self.buckets = {}
+        self.offset = 0
+        self.tree = FenwickTree(1)
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.scores)
+
+    def rebuild(self, items):
+        """Replace the index contents with (username, score) pairs"""
+        with self.lock:
+            self.scores = {}
+            self.buckets = {}
+            values = [int(score) for _, score in items]
+            low = min(values, default=0)
+            high = max(values, default=0)
+            self._resize(low, high)
+            for username, score in items:
+                self._insert(username, float(score))
+
+    def update(self, username, score):
+        """Set a user's score (inserting the user if new)"""
+        with self.lock:
+            if username in self.scores:
+                self._remove(username)
+            self._insert(username, float(score))
+
+    def add(self, username, delta):
+        """Add a delta to a user's score"""
+        with self.lock:
+            self.update(username, self.scores.get(username, 0.0) + delta)
+
+    def remove(self, username):
+        """Drop a user from the index"""
+        with self.lock:
+            if username in self.scores:
+                self._remove(username)
+
+    def score(self, username):
+        with self.lock:
+            return self.scores.get(username)
+
+    def rank(self, username):
+        """1-based rank of a user, or None if unknown"""
+        with self.lock:
+            if username not in self.scores:
+                return None
+            key = int(self.scores[username])
+            higher = len(self.scores) - self.tree.prefix(key - self.offset)
+            return higher + bisect.bisect_left(self.buckets[key], username) + 1
+
+    def percentile(self, username):
+        """Share of users at or below this user's rank, as a percentage"""
+        with self.lock:
+            total = len(self.scores)
+            rank = self.rank(username)
+            if not total or not rank:
+                return 0
+            return round(((total - rank + 1) / total) * 100, 1)
+
+    def at_rank(self, rank):
+        """(username, score) of the user at a 1-based rank"""
+        with self.lock:
+            total = len(self.scores)
+            if rank < 1 or rank > total:
+                return None
+            # k-th highest is the (total - rank + 1)-th smallest bucket entry
+            k = total - rank + 1
+            index = self.tree.find(k)
+            key = index + self.offset
+            below = self.tree.prefix(index - 1) if index > 0 else 0
+            bucket = self.buckets[key]
+            # Within a bucket users are ranked by username ascending
+            username = bucket[len(bucket) - 1 - (k - below - 1)]
+            return username, self.scores[username]
+
+    def top(self, n=10):
+        """Top n users as (rank, username, score) tuples"""
+        with self.lock:
+            return self.range(1, n)
+
+    def around(self, username, k=2):
+        """Users ranked within +/- k of a user, as (rank, username, score) tuples"""
+        with self.lock:
+            rank = self.rank(username)
+            if rank is None:
+                return []
+            return self.range(max(1, rank - k), rank + k)
+
+    def range(self, first, last):
+        """Users with ranks first..last inclusive"""
+        with self.lock:
+            rows = []
+            for rank in range(first, min(last, len(self.scores)) + 1):
+                username, score = self.at_rank(rank)
+                rows.append((rank, username, score))
+            return rows
+
+    def _resize(self, low, high):
+        """Size the tree to cover scores in [low, high] with headroom"""
+        span = max(high - low + 1, 1)
+        size = 1 << (span * 2).bit_length()
+        self.offset = low - (size - span) // 2
+        self.tree = FenwickTree(size)
+        for key, bucket in self.buckets.items():
+            self.tree.add(key - self.offset, len(bucket))
+
+    def _insert(self, username, score):
+        key = int(score)
+        if key < self.offset or key >= self.offset + self.tree.size:
+            keys = list(self.buckets) + [key]
+            self._resize(min(keys), max(keys))
+        self.scores[username] = score
+        bisect.insort(self.buckets.setdefault(key, []), username)
+        self.tree.add(key - self.offset, 1)
+
+    def _remove(self, username):
+        key = int(self.scores.pop(username))
+        bucket = self.buckets[key]
+        del bucket[bisect.bisect_left(bucket, username)]
+        if not bucket:
+            del self.buckets[key]
+        self.tree.add(key - self.offset, -1)
+
+
+class StoreRankIndex(RankIndex):
+    """RankIndex kept consistent with the persistent store.
+
+    Built from the users table at startup, then caught up on each read from
+    new users rows and new score_ledger rows, so writes from other sessions and
+    processes are picked up without re-sorting everyone.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.last_user_id = None
+        self.last_ledger_id = 0
+        self.users_epoch = None
+
+    def sync(self, conn=None):
+        """Apply store changes made since the last sync.
+
+        Pass ``conn`` when already inside a transaction on it; otherwise the
+        sync reads from its own snapshot.
+        """
+        with self.lock:
+            conn = conn or storage.get_connection()
+            own_snapshot = not conn.in_transaction
+            if own_snapshot:
+                conn.execute("BEGIN")
+            try:
+                epoch = storage.get_meta('users_epoch', '0', conn=conn)
+                if self.last_user_id is None or epoch != self.users_epoch:
+                    self._load(conn, epoch)
+                else:
+                    self._catch_up(conn)
+            finally:
+                if own_snapshot:
+                    conn.execute("COMMIT")
+
+    def _load(self, conn, epoch):
+        rows = conn.execute("SELECT username, eco_score FROM users").fetchall()
+        self.rebuild([(r['username'], r['eco_score'] or 0) for r in rows])
+        self.last_user_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0]
+        self.last_ledger_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM score_ledger").fetchone()[0]
+        self.users_epoch = epoch
+
+    def _catch_up(self, conn):
+        # New users already include any ledger rows written for them
+        new_users = conn.execute(
+            "SELECT id, username, eco_score FROM users WHERE id > ?", (self.last_user_id,)
+        ).fetchall()
+        fresh = set()
+        for r in new_users:
+            self.update(r['username'], r['eco_score'] or 0)
+            fresh.add(r['username'])
+            self.last_user_id = max(self.last_user_id, r['id'])
+
+        for r in conn.execute(
+            "SELECT id, username, delta FROM score_ledger WHERE id > ? ORDER BY id", (self.last_ledger_id,)
+        ):
+            if r['username'] not in fresh and r['username'] in self.scores:
+                self.add(r['username'], r['delta'])
+            self.last_ledger_id = r['id']
+
+
+_index = StoreRankIndex()
+
+
+def get_index(conn=None):
+    """Process-wide rank index, synced with the store"""
+    _index.sync(conn=conn)
+    return _index
+
+
+def invalidate():
+    """Force a full rebuild on the next sync (e.g. after a rolled-back write)"""
+    with _index.lock:
+        _index.last_user_id = None
@@ -0,0 +1,383 @@
+# ==========================================
+# MODEL ROUTER MODULE
+# Latency-aware model choice, deadlines and hedged requests per call type
+# ==========================================
+#
+# Each route (chat, quiz, insights, vision) lists candidate models from the
+# preferred one to the fastest, a latency budget and a hedge threshold:
+#
+# - The first candidate whose observed p95 fits the budget is used (the
+#   fastest one when none does).
+# - The budget becomes a deadline that is passed down to the gateway, so
+#   retries and rate-limit waits never run past it.
+# - When the first request has not answered by the hedge threshold (a
+#   percentile of that model's recent latencies), a second request goes to
+#   the next, faster candidate. The first answer wins; the other request is
+#   left to finish in the background and its result is dropped. Routes with a
+#   single candidate are not hedged.
+# - Model latencies come from successful calls only; a call that runs out of
+#   time counts as taking the whole budget. Fast errors (auth, bad requests)
+#   say nothing about speed and are not recorded.
+#
+# Identical requests in flight at the same time (same route, prompt, images
+# and parameters) are coalesced: one upstream call runs and every waiting
+# session gets its result. Sampled text completions (temperature > 0, e.g.
+# quiz questions) are never coalesced, since each caller expects its own
+# sample. Vision verdicts are shared like the evidence index shares them, and
+# EcoBot streams like the chat cache does, with late joiners replaying the
+# chunks received so far.
+#
+# End-to-end latency (p50/p95), hedges fired and won, coalesced requests and
+# deadline misses are recorded per route.
+
+import json
+import time
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import groq_gateway
+
+ROUTES = {
+    # Short EcoBot replies: the large model while it stays fast, else the instant one
+    'chat': {
+        'models': ("llama-3.3-70b-versatile", "llama-3.1-8b-instant"),
+        'budget': 6.0, 'hedge_percentile': 0.9, 'hedge_after': 2.5,
+    },
+    # Quiz generation (single question or a JSON-lines batch)
+    'quiz': {
+        'models': ("llama-3.3-70b-versatile", "llama-3.1-8b-instant"),
+        'budget': 15.0, 'hedge_percentile': 0.9, 'hedge_after': 6.0,
+    },
+    # Compost insights
+    'insights': {
+        'models': ("llama-3.1-8b-instant",),
+        'budget': 6.0, 'hedge_percentile': 0.9, 'hedge_after': 2.5,
+    },
+    # Mission verification (one model, so never hedged)
+    'vision': {
+        'models': ("meta-llama/llama-4-scout-17b-16e-instruct",),
+        'budget': 40.0, 'hedge_percentile': 0.95, 'hedge_after': 15.0,
+    },
+}
+
+# Samples needed before observed latencies replace the configured defaults
+MIN_SAMPLES = 10
+LATENCY_WINDOW = 200
+
+# Never hedge sooner than this
+MIN_HEDGE_AFTER = 0.5
+
+HEDGE_WORKERS = 16
+
+
+def _percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))] if ordered else None
+
+
+def request_key(route, *parts):
+    """Single-flight key for a route and the request's prompt, images and parameters"""
+    raw = json.dumps([route, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class _Flight:
+    """One upstream call whose outcome is shared with every identical request"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _SharedStream:
+    """Chunks of one upstream stream, readable by any number of sessions"""
+
+    def __init__(self):
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def push(self, chunk):
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def finish(self, error=None):
+        with self.cond:
+            self.finished = True
+            self.error = error
+            self.cond.notify_all()
+
+    def read(self, deadline):
+        position = 0
+        while True:
+            with self.cond:
+                while position >= len(self.chunks) and not self.finished:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise groq_gateway.DeadlineExceeded("Shared stream stalled past its deadline.")
+                    self.cond.wait(remaining)
+                batch = self.chunks[position:]
+                position = len(self.chunks)
+                if not batch:
+                    if self.error is not None:
+                        raise self.error
+                    return
+            yield from batch
+
+
+class _RouteStats:
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadline_misses = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+
+class ModelRouter:
+    """Chooses models per route, enforces the route's deadline and hedges slow calls"""
+
+    def __init__(self, gateway, routes=None):
+        self.gateway = gateway
+        self.routes = dict(routes or ROUTES)
+        self.model_latencies = {}
+        self.route_stats = {}
+        self.flights = {}
+        self.streams = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="groq-hedge")
+
+    def _config(self, route):
+        if route not in self.routes:
+            raise KeyError(f"Unknown model route '{route}'")
+        return self.routes[route]
+
+    def _samples(self, model):
+        with self.lock:
+            return list(self.model_latencies.get(model, ()))
+
+    def _observe(self, model, seconds):
+        with self.lock:
+            self.model_latencies.setdefault(model, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def plan(self, route):
+        """(primary model, hedge model or None, hedge delay in seconds, budget) for a route"""
+        config = self._config(route)
+        models = config['models']
+        primary = models[-1]
+        for model in models:
+            samples = self._samples(model)
+            if len(samples) < MIN_SAMPLES or _percentile(samples, 0.95) <= config['budget']:
+                primary = model
+                break
+        index = models.index(primary)
+        hedge = models[index + 1] if index + 1 < len(models) else None
+        samples = self._samples(primary)
+        if len(samples) >= MIN_SAMPLES:
+            hedge_after = max(MIN_HEDGE_AFTER, _percentile(samples, config['hedge_percentile']))
+        else:
+            hedge_after = config['hedge_after']
+        return primary, hedge, hedge_after, config['budget']
+
+    def _stats(self, route):
+        with self.lock:
+            return self.route_stats.setdefault(route, _RouteStats())
+
+    def _timed(self, call, model, deadline):
+        started = time.monotonic()
+        try:
+            result = call(model, deadline)
+        except groq_gateway.DeadlineExceeded:
+            # A stalling model is charged the whole budget, however early it gave up
+            self._observe(model, max(time.monotonic(), deadline) - started)
+            raise
+        self._observe(model, time.monotonic() - started)
+        return result
+
+    def call(self, route, call, key=None):
+        """Run ``call(model, deadline)`` under the route's plan; returns the first result.
+
+        Calls sharing a ``key`` while one is in flight wait for it instead of
+        going upstream. Raises the primary request's error when every attempt
+        failed, or groq_gateway.DeadlineExceeded when nothing answered within
+        the budget.
+        """
+        stats = self._stats(route)
+        if key is None:
+            return self._run(route, call, stats)
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+            else:
+                stats.coalesced += 1
+        if not leader:
+            if not flight.done.wait(self._config(route)['budget']):
+                raise groq_gateway.DeadlineExceeded(f"No answer on route '{route}' within its budget.")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = self._run(route, call, stats)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                self.flights.pop(key, None)
+            flight.done.set()
+
+    def _run(self, route, call, stats):
+        primary, hedge, hedge_after, budget = self.plan(route)
+        started = time.perf_counter()
+        deadline = time.monotonic() + budget
+        with self.lock:
+            stats.calls += 1
+
+        futures = {self.executor.submit(self._timed, call, primary, deadline): 'primary'}
+        done, _ = wait(futures, timeout=hedge_after)
+        if hedge is not None and not done and time.monotonic() + MIN_HEDGE_AFTER < deadline:
+            futures[self.executor.submit(self._timed, call, hedge, deadline)] = 'hedge'
+            with self.lock:
+                stats.hedges += 1
+
+        errors = {}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is not None:
+                    errors[futures[future]] = future.exception()
+                    continue
+                with self.lock:
+                    stats.latencies.append(time.perf_counter() - started)
+                    if futures[future] == 'hedge':
+                        stats.hedge_wins += 1
+                return future.result()
+
+        with self.lock:
+            if not errors or pending:
+                stats.deadline_misses += 1
+            else:
+                stats.failures += 1
+        if errors and not pending:
+            raise errors.get('primary') or errors['hedge']
+        raise groq_gateway.DeadlineExceeded(f"No answer on route '{route}' within {budget:.0f}s.")
+
+    def complete(self, route, prompt, temperature=0.7, max_tokens=1024):
+        """Text completion for a prompt on a route (identical concurrent prompts share one call at temperature 0)"""
+        key = request_key(route, prompt, temperature, max_tokens) if temperature == 0 else None
+        return self.call(route, lambda model, deadline: self.gateway.complete(
+            prompt, model=model, route=route, temperature=temperature, max_tokens=max_tokens, deadline=deadline
+        ), key=key)
+
+    def vision(self, route, prompt, images, temperature=0.1, max_tokens=300):
+        """Completion over a prompt and (mime_type, base64) images on a route"""
+        images = list(images)
+        image_digest = [hashlib.sha256(data.encode('ascii')).hexdigest() for _, data in images]
+        return self.call(route, lambda model, deadline: self.gateway.vision(
+            prompt, images, model=model, route=route, temperature=temperature, max_tokens=max_tokens, deadline=deadline
+        ), key=request_key(route, prompt, image_digest, temperature, max_tokens))
+
+    def stream(self, route, prompt, temperature=0.7, max_tokens=1024):
+        """Streamed completion on the route's chosen model (not hedged), bounded by its deadline.
+
+        The upstream stream is read on a background thread into a shared
+        buffer, so identical prompts join it and a session that stops reading
+        does not stall the others.
+        """
+        primary, _, _, budget = self.plan(route)
+        stats = self._stats(route)
+        deadline = time.monotonic() + budget
+        key = request_key(route, prompt, temperature, max_tokens)
+        with self.lock:
+            shared = self.streams.get(key)
+            leader = shared is None
+            if leader:
+                shared = self.streams[key] = _SharedStream()
+                stats.calls += 1
+            else:
+                stats.coalesced += 1
+        if leader:
+            threading.Thread(
+                target=self._pump, args=(route, key, shared, primary, prompt, temperature, max_tokens, deadline),
+                name="groq-stream", daemon=True
+            ).start()
+        yield from shared.read(deadline)
+
+    def _pump(self, route, key, shared, model, prompt, temperature, max_tokens, deadline):
+        started = time.monotonic()
+        error = None
+        try:
+            for chunk in self.gateway.stream(
+                prompt, model=model, route=route, temperature=temperature,
+                max_tokens=max_tokens, deadline=deadline
+            ):
+                shared.push(chunk)
+        except Exception as e:
+            error = e
+        finally:
+            elapsed = time.monotonic() - started
+            if error is None:
+                self._observe(model, elapsed)
+            elif isinstance(error, groq_gateway.DeadlineExceeded):
+                self._observe(model, max(time.monotonic(), deadline) - started)
+            stats = self._stats(route)
+            with self.lock:
+                self.streams.pop(key, None)
+                if error is None:
+                    stats.latencies.append(elapsed)
+                else:
+                    stats.failures += 1
+            shared.finish(error)
+
+    def stats(self):
+        """Per-route model choice, hedge delay, hedges and end-to-end p50/p95"""
+        report = {}
+        for route in self.routes:
+            primary, hedge, hedge_after, budget = self.plan(route)
+            stats = self._stats(route)
+            with self.lock:
+                latencies = list(stats.latencies)
+                calls, coalesced = stats.calls, stats.coalesced
+                hedges, wins = stats.hedges, stats.hedge_wins
+                misses, failures = stats.deadline_misses, stats.failures
+            p50, p95 = _percentile(latencies, 0.5), _percentile(latencies, 0.95)
+            report[route] = {
+                'model': primary,
+                'hedge_model': hedge,
+                'budget_s': budget,
+                'hedge_after_ms': round(hedge_after * 1000),
+                'calls': calls,
+                'coalesced': coalesced,
+                'hedges': hedges,
+                'hedge_wins': wins,
+                'deadline_misses': misses,
+                'failures': failures,
+                'p50_ms': round(p50 * 1000, 1) if p50 is not None else 0.0,
+                'p95_ms': round(p95 * 1000, 1) if p95 is not None else 0.0,
+            }
+        return report
+
+
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def get_router(gateway):
+    """Process-wide router for a gateway"""
+    with _routers_lock:
+        if id(gateway) not in _routers:
+            _routers[id(gateway)] = ModelRouter(gateway)
+        return _routers[id(gateway)]
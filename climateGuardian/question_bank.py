@@ -0,0 +1,200 @@
+# ==========================================
+# QUESTION BANK MODULE
+# Local quiz questions loaded once, indexed, and served from no-repeat decks
+# ==========================================
+#
+# The bank is read from assets/questions_sustainability.json, or from a compact
+# memory-mapped .bank file built from it for large banks:
+#
+#     python question_bank.py build [source.json] [target.bank]
+#
+# .bank layout: magic, header length, JSON header (count, difficulties, topics),
+# one fixed-width record per question (offset, length, difficulty, topic), then
+# the UTF-8 JSON of each question. Only the record table is read at load time;
+# question bodies are decoded when drawn.
+
+import os
+import sys
+import json
+import mmap
+import struct
+import threading
+import numpy as np
+import file_lock
+
+QUESTION_BANK_FILE = os.path.join('assets', 'questions_sustainability.json')
+COMPACT_BANK_FILE = os.path.join('assets', 'questions_sustainability.bank')
+
+_MAGIC = b"CGQBANK1"
+_RECORD = np.dtype([('offset', '<u8'), ('length', '<u4'), ('difficulty', '<u2'), ('topic', '<u2')])
+
+
+def _level(value):
+    return str(value or 'medium').strip().lower()
+
+
+class QuestionBank:
+    """Questions addressed by position, with difficulty/topic code arrays for filtering"""
+
+    def __init__(self, difficulties, topics, difficulty_codes, topic_codes, fetch):
+        self.difficulties = list(difficulties)
+        self.topics = list(topics)
+        self.difficulty_codes = difficulty_codes
+        self.topic_codes = topic_codes
+        self._fetch = fetch
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.difficulty_codes)
+
+    def get(self, index):
+        """Raw question dict at a position"""
+        return self._fetch(int(index))
+
+    def ids(self, difficulty=None, topic=None):
+        """Positions of questions matching a difficulty and/or topic (cached per filter)"""
+        key = (_level(difficulty) if difficulty else None, topic)
+        with self._lock:
+            if key not in self._ids:
+                mask = np.ones(len(self), dtype=bool)
+                if key[0] is not None:
+                    code = self.difficulties.index(key[0]) if key[0] in self.difficulties else -1
+                    mask &= self.difficulty_codes == code
+                if topic is not None:
+                    code = self.topics.index(topic) if topic in self.topics else -1
+                    mask &= self.topic_codes == code
+                self._ids[key] = np.flatnonzero(mask)
+            return self._ids[key]
+
+    @classmethod
+    def from_items(cls, items):
+        difficulties = sorted({_level(q.get('difficulty')) for q in items})
+        topics = sorted({str(q.get('topic', '')) for q in items})
+        return cls(
+            difficulties, topics,
+            np.array([difficulties.index(_level(q.get('difficulty'))) for q in items], dtype=np.uint16),
+            np.array([topics.index(str(q.get('topic', ''))) for q in items], dtype=np.uint16),
+            items.__getitem__
+        )
+
+    @classmethod
+    def from_compact(cls, path):
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if mm[:len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"{path} is not a question bank file")
+        (header_len,) = struct.unpack_from("<I", mm, len(_MAGIC))
+        start = len(_MAGIC) + 4
+        header = json.loads(mm[start:start + header_len].decode('utf-8'))
+        records = np.frombuffer(mm, dtype=_RECORD, count=header['count'], offset=start + header_len)
+
+        def fetch(index):
+            record = records[index]
+            offset = int(record['offset'])
+            return json.loads(mm[offset:offset + int(record['length'])].decode('utf-8'))
+
+        return cls(header['difficulties'], header['topics'], records['difficulty'], records['topic'], fetch)
+
+
+def build_compact(source=QUESTION_BANK_FILE, target=COMPACT_BANK_FILE):
+    """Write the compact .bank form of a JSON question list; returns the question count"""
+    with open(source, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    bank = QuestionBank.from_items(items)
+    header = json.dumps({'count': len(items), 'difficulties': bank.difficulties, 'topics': bank.topics}).encode('utf-8')
+    bodies = [json.dumps(q, ensure_ascii=False, separators=(',', ':')).encode('utf-8') for q in items]
+
+    records = np.zeros(len(items), dtype=_RECORD)
+    offset = len(_MAGIC) + 4 + len(header) + records.nbytes
+    for i, body in enumerate(bodies):
+        records[i] = (offset, len(body), bank.difficulty_codes[i], bank.topic_codes[i])
+        offset += len(body)
+
+    with file_lock.atomic_replace(target, 'wb') as f:
+        f.write(_MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(records.tobytes())
+        for body in bodies:
+            f.write(body)
+    return len(items)
+
+
+_bank = None
+_bank_lock = threading.Lock()
+
+
+def get_bank():
+    """Process-wide bank; prefers an up-to-date compact file over the JSON source"""
+    global _bank
+    with _bank_lock:
+        if _bank is None:
+            compact_fresh = os.path.exists(COMPACT_BANK_FILE) and (
+                not os.path.exists(QUESTION_BANK_FILE)
+                or os.path.getmtime(COMPACT_BANK_FILE) >= os.path.getmtime(QUESTION_BANK_FILE)
+            )
+            if compact_fresh:
+                _bank = QuestionBank.from_compact(COMPACT_BANK_FILE)
+            else:
+                with open(QUESTION_BANK_FILE, 'r', encoding='utf-8') as f:
+                    _bank = QuestionBank.from_items(json.load(f))
+        return _bank
+
+# ==========================================
+# NO-REPEAT DECKS
+# ==========================================
+
+def _new_deck(n):
+    """A uniformly shuffled order of range(n), kept as a compact int32 array"""
+    return {'n': n, 'order': np.random.default_rng().permutation(n).astype(np.int32), 'pos': 0}
+
+
+def draw(decks, difficulty=None, topic=None):
+    """Next question for a session without repeats until its deck is exhausted.
+
+    ``decks`` is a per-session dict (e.g. in st.session_state) holding the deck
+    state for each filter. Falls back to the whole bank when nothing matches
+    the filter. Returns the question in the quiz format, or None if the bank
+    is empty.
+    """
+    bank = get_bank()
+    ids = bank.ids(difficulty, topic)
+    key = f"{_level(difficulty) if difficulty else '*'}|{topic or '*'}"
+    if len(ids) == 0:
+        ids = bank.ids()
+        key = "*|*"
+    if len(ids) == 0:
+        return None
+
+    deck = decks.get(key)
+    if deck is None or deck['n'] != len(ids) or deck['pos'] >= deck['n']:
+        deck = _new_deck(len(ids))
+        decks[key] = deck
+    position = deck['order'][deck['pos']]
+    deck['pos'] += 1
+    return to_quiz_question(bank.get(ids[position]))
+
+
+def to_quiz_question(sel):
+    """Convert a bank entry to the AI-style question dict used by the quiz"""
+    letters = ['A', 'B', 'C', 'D']
+    ans_letter = letters[sel['ans']] if 'ans' in sel and isinstance(sel['ans'], int) else 'A'
+    return {
+        'q': sel.get('q', 'No question'),
+        'options': sel.get('options', []),
+        'ans': ans_letter,
+        'exp': sel.get('exp', ''),
+        'difficulty': sel.get('difficulty', 'Medium')
+    }
+
+
+if __name__ == "__main__":
+    # Usage: python question_bank.py build [source.json] [target.bank]
+    command = sys.argv[1] if len(sys.argv) >= 2 else ""
+    if command == "build":
+        source = sys.argv[2] if len(sys.argv) >= 3 else QUESTION_BANK_FILE
+        target = sys.argv[3] if len(sys.argv) >= 4 else COMPACT_BANK_FILE
+        print(f"Wrote {build_compact(source, target)} questions to {target}")
+    else:
+        print("Usage: python question_bank.py build [source.json] [target.bank]")
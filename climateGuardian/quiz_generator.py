@@ -0,0 +1,373 @@
+# ==========================================
+# QUIZ GENERATOR MODULE
+# Batched and concurrent AI quiz generation with a background prefetch pool
+# ==========================================
+#
+# Nothing here touches Streamlit: questions are generated on worker threads,
+# and the app decides how to report failures and fall back to the local bank.
+
+import re
+import json
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+QUIZ_MODEL = "llama-3.3-70b-versatile"
+
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+
+# Pre-generated questions kept per difficulty
+POOL_TARGET = 2
+
+# Ask for all missing levels in one completion (JSON lines) instead of one call each
+BATCH_GENERATION = True
+
+# Threads for on-demand generation and for background refills
+GENERATION_WORKERS = 4
+REFILL_WORKERS = 2
+
+
+def build_prompt(difficulty):
+    return (
+        f"Generate 1 {difficulty} difficulty multiple choice question about environmental sustainability, recycling, or climate change.\n"
+        "Strictly follow this format using the pipe symbol (|) as a separator:\n"
+        "Question Text | Option A | Option B | Option C | Option D | Correct Option (A/B/C/D) | Short Explanation"
+    )
+
+
+def parse_pipe_question(text, difficulty):
+    """Parse a pipe-delimited question, or None if the format is off"""
+    if not text:
+        return None
+    parts = text.split('|')
+    if len(parts) < 6:
+        return None
+    return {
+        "q": parts[0].strip(),
+        "options": [parts[1].strip(), parts[2].strip(), parts[3].strip(), parts[4].strip()],
+        "ans": parts[5].strip().upper(),
+        "exp": parts[6].strip() if len(parts) > 6 else "Great job saving the planet!",
+        "difficulty": difficulty
+    }
+
+
+def generate_question(complete, difficulty):
+    """One question from the model via ``complete(prompt, model)``; None on bad format.
+
+    API errors propagate to the caller.
+    """
+    return parse_pipe_question(complete(build_prompt(difficulty), QUIZ_MODEL), difficulty)
+
+
+# ==========================================
+# BATCHED GENERATION
+# ==========================================
+
+def build_batch_prompt(difficulties):
+    counts = ", ".join(f"{difficulties.count(d)} {d}" for d in dict.fromkeys(difficulties))
+    return (
+        f"Generate {len(difficulties)} multiple choice questions ({counts}) about environmental sustainability, recycling, or climate change.\n"
+        "Output one JSON object per line and nothing else, each exactly like:\n"
+        '{"q": "Question text", "options": ["Option A", "Option B", "Option C", "Option D"], '
+        '"ans": "A", "exp": "Short explanation", "difficulty": "Easy"}'
+    )
+
+
+class JsonLinesParser:
+    """Incremental parser that pulls JSON objects out of free-form model output.
+
+    Feed it text as it arrives; every balanced top-level ``{...}`` is decoded
+    (with a trailing-comma repair) and returned as soon as it closes. Code
+    fences, prose, array brackets and broken objects are skipped.
+    """
+
+    _TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.depth = 0
+        self.start = None
+        self.in_string = False
+        self.escape = False
+        self.line_start = True
+        self.invalid = 0
+
+    def feed(self, chunk):
+        """Consume more text; returns the objects completed by it"""
+        self.buffer += chunk
+        found = []
+        text = self.buffer
+        for i in range(self.pos, len(text)):
+            ch = text[i]
+            if self.in_string:
+                if ch == "\n":
+                    # Raw newlines never occur inside JSON strings: the object was cut off
+                    self._abandon()
+                elif self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                if self.depth:
+                    self.in_string = True
+            elif ch == "{":
+                if self.depth and self.line_start:
+                    # A new line opens a new object while one is unfinished
+                    self._abandon()
+                if self.depth == 0:
+                    self.start = i
+                self.depth += 1
+            elif ch == "}" and self.depth:
+                self.depth -= 1
+                if self.depth == 0:
+                    obj = self._decode(text[self.start:i + 1])
+                    if obj is None:
+                        self.invalid += 1
+                    else:
+                        found.append(obj)
+                    self.start = None
+            if ch == "\n":
+                self.line_start = True
+            elif not ch.isspace() and ch != "[":
+                self.line_start = False
+        # Keep only the unfinished object (if any) in the buffer
+        keep = self.start if self.start is not None else len(text)
+        self.buffer = text[keep:]
+        self.pos = len(self.buffer)
+        if self.start is not None:
+            self.start = 0
+        return found
+
+    def _abandon(self):
+        self.invalid += 1
+        self.depth = 0
+        self.start = None
+        self.in_string = False
+        self.escape = False
+
+    def _decode(self, raw):
+        for candidate in (raw, self._TRAILING_COMMA.sub(r"\1", raw)):
+            try:
+                return json.loads(candidate)
+            except ValueError:
+                continue
+        return None
+
+
+def parse_json_questions(chunks):
+    """Valid questions from model output given as a string or an iterable of chunks.
+
+    Returns (questions, rejected) where rejected counts unparseable or invalid items.
+    """
+    parser = JsonLinesParser()
+    questions, rejected = [], 0
+    for chunk in ([chunks] if isinstance(chunks, str) else chunks):
+        for obj in parser.feed(chunk or ""):
+            q = normalize_question(obj)
+            if q is None:
+                rejected += 1
+            else:
+                questions.append(q)
+    return questions, rejected + parser.invalid
+
+
+_OPTION_PREFIX = re.compile(r"^\(?[A-Da-d][\)\.:]\s+")
+
+
+def normalize_question(obj, difficulty=None):
+    """Validate a decoded item and convert it to the app's question dict, or None"""
+    if not isinstance(obj, dict):
+        return None
+    q = str(obj.get('q') or obj.get('question') or "").strip()
+    options = obj.get('options') or obj.get('choices')
+    if isinstance(options, dict):
+        options = [options[k] for k in sorted(options)]
+    if not q or not isinstance(options, list) or len(options) != 4:
+        return None
+    options = [_OPTION_PREFIX.sub("", str(o).strip()) for o in options]
+    if not all(options):
+        return None
+
+    ans = obj.get('ans', obj.get('answer'))
+    if isinstance(ans, int) and not isinstance(ans, bool) and 0 <= ans < 4:
+        ans = "ABCD"[ans]
+    else:
+        text = str(ans or "").strip()
+        if text in options:
+            ans = "ABCD"[options.index(text)]
+        else:
+            ans = text[:1].upper()
+    if ans not in ("A", "B", "C", "D"):
+        return None
+
+    level = str(obj.get('difficulty') or difficulty or "Medium").strip().capitalize()
+    return {
+        "q": q,
+        "options": options,
+        "ans": ans,
+        "exp": str(obj.get('exp') or obj.get('explanation') or "Great job saving the planet!").strip(),
+        "difficulty": level if level in DIFFICULTIES else (difficulty or "Medium")
+    }
+
+
+def generate_batch(complete, difficulties):
+    """Questions for several levels from one completion.
+
+    Returns (questions, extras, rejected): ``questions`` is aligned with
+    ``difficulties`` (None where no valid item matched) and ``extras`` are valid
+    items that did not fit a requested slot.
+    """
+    parsed, rejected = parse_json_questions(complete(build_batch_prompt(list(difficulties)), QUIZ_MODEL))
+    questions = [None] * len(difficulties)
+    extras = []
+    for item in parsed:
+        slot = next((i for i, d in enumerate(difficulties) if questions[i] is None and d == item['difficulty']), None)
+        if slot is None:
+            extras.append(item)
+        else:
+            questions[slot] = item
+    return questions, extras, rejected
+
+# ==========================================
+# PREFETCH POOL
+# ==========================================
+
+class QuestionPool:
+    """Per-difficulty pool of pre-generated questions that refills in the background"""
+
+    def __init__(self, complete, target=POOL_TARGET):
+        self.complete = complete
+        self.target = target
+        self.pools = {d: deque() for d in DIFFICULTIES}
+        self.inflight = {d: 0 for d in DIFFICULTIES}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix="quiz-gen")
+        self.refill_executor = ThreadPoolExecutor(max_workers=REFILL_WORKERS, thread_name_prefix="quiz-refill")
+        self.requests = 0
+        self.hits = 0
+        self.refills = 0
+        self.refill_failures = 0
+        self.refill_time = 0.0
+        self.max_refill_time = 0.0
+        self.batch_calls = 0
+        self.batch_requested = 0
+        self.batch_valid = 0
+        self.batch_rejected = 0
+
+    def take(self, difficulty):
+        """A pre-generated question, or None when the pool is empty (refill is scheduled)"""
+        with self.lock:
+            pool = self.pools.setdefault(difficulty, deque())
+            self.inflight.setdefault(difficulty, 0)
+            self.requests += 1
+            question = pool.popleft() if pool else None
+            if question is not None:
+                self.hits += 1
+        self.refill(difficulty)
+        return question
+
+    def refill(self, difficulty):
+        """Top the pool for a difficulty back up to the target in the background"""
+        with self.lock:
+            needed = self.target - len(self.pools[difficulty]) - self.inflight[difficulty]
+            self.inflight[difficulty] += max(needed, 0)
+        for _ in range(max(needed, 0)):
+            self.refill_executor.submit(self._refill_one, difficulty)
+
+    def warm(self):
+        for difficulty in DIFFICULTIES:
+            self.refill(difficulty)
+
+    def _refill_one(self, difficulty):
+        start = time.perf_counter()
+        try:
+            question = generate_question(self.complete, difficulty)
+        except Exception:
+            question = None
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.inflight[difficulty] -= 1
+            if question is None:
+                self.refill_failures += 1
+                return
+            self.refills += 1
+            self.refill_time += elapsed
+            self.max_refill_time = max(self.max_refill_time, elapsed)
+            self.pools[difficulty].append(question)
+
+    def generate_set(self, difficulties, batched=BATCH_GENERATION):
+        """Questions for several levels: pooled ones first, the rest generated.
+
+        Missing levels are requested in one batched completion, or concurrently
+        one per call when ``batched`` is False. Returns (questions, errors); a
+        failed level is None in ``questions`` and its exception (if any) is
+        listed in ``errors``.
+        """
+        questions = [self.take(d) for d in difficulties]
+        missing = [i for i, q in enumerate(questions) if q is None]
+        errors = []
+        if missing and batched:
+            try:
+                generated, extras, rejected = generate_batch(self.complete, [difficulties[i] for i in missing])
+            except Exception as e:
+                return questions, [e]
+            for i, q in zip(missing, generated):
+                questions[i] = q
+            with self.lock:
+                self.batch_calls += 1
+                self.batch_requested += len(missing)
+                self.batch_valid += sum(q is not None for q in generated) + len(extras)
+                self.batch_rejected += rejected
+                # Keep surplus valid items for later requests
+                for q in extras:
+                    pool = self.pools.setdefault(q['difficulty'], deque())
+                    if len(pool) < self.target:
+                        pool.append(q)
+            return questions, errors
+
+        futures = {i: self.executor.submit(generate_question, self.complete, difficulties[i]) for i in missing}
+        for i, future in futures.items():
+            try:
+                questions[i] = future.result()
+            except Exception as e:
+                errors.append(e)
+        return questions, errors
+
+    def stats(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'pool_hits': self.hits,
+                'hit_rate': round(self.hits / self.requests, 3) if self.requests else 0.0,
+                'refills': self.refills,
+                'refill_failures': self.refill_failures,
+                'avg_refill_ms': round(self.refill_time / self.refills * 1000, 1) if self.refills else 0.0,
+                'max_refill_ms': round(self.max_refill_time * 1000, 1),
+                'batch_calls': self.batch_calls,
+                'batch_yield': round(self.batch_valid / self.batch_requested, 3) if self.batch_requested else 0.0,
+                'batch_rejected': self.batch_rejected,
+                'pooled': {d: len(q) for d, q in self.pools.items()},
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(complete):
+    """Process-wide question pool (created and warmed on first use)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = QuestionPool(complete)
+            _pool.warm()
+        return _pool
+
+
+def get_pool_stats():
+    """Pool metrics, or None if no pool has been started in this process"""
+    return _pool.stats() if _pool is not None else None
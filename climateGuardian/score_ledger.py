@@ -0,0 +1,176 @@
+# ==========================================
+# SCORE LEDGER MODULE
+# Append-only eco-score deltas with a write-behind buffer
+# ==========================================
+
+import threading
+import atexit
+import time
+from datetime import datetime
+import storage
+
+# Seconds between background flushes of buffered deltas
+FLUSH_INTERVAL = 0.5
+
+# Flush immediately once this many actions are buffered
+MAX_PENDING_ENTRIES = 200
+
+
+def apply_deltas(deltas, conn=None):
+    """Append one ledger row per user and increment their stored scores.
+
+    ``deltas`` maps username -> (delta, entries). Runs in a single transaction;
+    when ``conn`` is given the caller owns the transaction.
+    """
+    if not deltas:
+        return
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [(username, delta, entries, now) for username, (delta, entries) in deltas.items()]
+
+    def _write(c):
+        c.executemany(
+            "INSERT INTO score_ledger (username, delta, entries, created_at) VALUES (?, ?, ?, ?)",
+            rows
+        )
+        c.executemany(
+            "UPDATE users SET eco_score = eco_score + ? WHERE username = ?",
+            [(delta, username) for username, delta, _, _ in rows]
+        )
+
+    if conn is not None:
+        _write(conn)
+    else:
+        with storage.transaction() as c:
+            _write(c)
+
+
+def set_score(username, new_score):
+    """Set an absolute score, recording the difference in the ledger"""
+    with storage.transaction() as conn:
+        row = conn.execute("SELECT eco_score FROM users WHERE username = ?", (username,)).fetchone()
+        if row is None:
+            return
+        delta = float(new_score) - float(row['eco_score'] or 0)
+        if delta:
+            apply_deltas({username: (delta, 1)}, conn=conn)
+
+
+def _as_score(value):
+    """Whole-point scores as int (as storage returns them), fractional ones as float"""
+    value = float(value or 0)
+    return int(value) if value.is_integer() else value
+
+
+def get_stored_score(username):
+    """Score as persisted in the store (without buffered deltas)"""
+    row = storage.get_connection().execute(
+        "SELECT eco_score FROM users WHERE username = ?", (username,)
+    ).fetchone()
+    return _as_score(row['eco_score']) if row else None
+
+
+def ledger_total(username):
+    """Sum of every ledger delta recorded for a user"""
+    row = storage.get_connection().execute(
+        "SELECT COALESCE(SUM(delta), 0) AS total FROM score_ledger WHERE username = ?", (username,)
+    ).fetchone()
+    return float(row['total'])
+
+
+class ScoreBuffer:
+    """Coalesces bursts of score deltas per user and flushes them in the background"""
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING_ENTRIES):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._pending_entries = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def add(self, username, delta):
+        """Buffer a delta for a user; it is persisted on the next flush"""
+        with self._lock:
+            total, entries = self._pending.get(username, (0.0, 0))
+            self._pending[username] = (total + delta, entries + 1)
+            self._pending_entries += 1
+            full = self._pending_entries >= self.max_pending
+        self._ensure_thread()
+        if full:
+            self.flush()
+
+    def pending(self, username):
+        """Buffered (not yet persisted) delta for a user"""
+        with self._lock:
+            return self._pending.get(username, (0.0, 0))[0]
+
+    def read(self, username, read_stored):
+        """Read a stored value and the pending delta without racing a flush"""
+        with self._flush_lock:
+            return read_stored(username), self.pending(username)
+
+    def flush(self):
+        """Persist every buffered delta in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = {}
+                self._pending_entries = 0
+            if not batch:
+                return
+            try:
+                apply_deltas(batch)
+            except Exception:
+                # Put the batch back so the deltas are retried on the next flush
+                with self._lock:
+                    for username, (delta, entries) in batch.items():
+                        total, count = self._pending.get(username, (0.0, 0))
+                        self._pending[username] = (total + delta, count + entries)
+                        self._pending_entries += entries
+                raise
+
+    def _ensure_thread(self):
+        """Start the background flusher on first use"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="score-ledger-flush", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Score ledger flush failed: {e}")
+
+
+_buffer = ScoreBuffer()
+atexit.register(lambda: _buffer.flush())
+
+
+def get_buffer():
+    """Process-wide score buffer shared by every session"""
+    return _buffer
+
+
+def add_delta(username, delta):
+    """Record a score change for a user (buffered, coalesced per user)"""
+    _buffer.add(username, float(delta))
+
+
+def get_score(username):
+    """Latest score for a user: stored value plus any buffered deltas"""
+    stored, pending = _buffer.read(username, get_stored_score)
+    if stored is None:
+        return None
+    return _as_score(stored + pending)
+
+
+def flush():
+    """Persist buffered deltas now"""
+    _buffer.flush()
@@ -0,0 +1,510 @@
+# ==========================================
+# STORAGE MODULE
+# SQLite (WAL) store for users and certificates
+# ==========================================
+
+import sqlite3
+import threading
+import os
+import sys
+import time
+import pandas as pd
+from contextlib import contextmanager
+import file_lock
+
+# Database file path
+STORE_DB_FILE = "climate_guardian.db"
+
+# Legacy CSV files (migrated once into the store)
+LEGACY_USER_CSV = "users_database.csv"
+LEGACY_CERTIFICATES_CSV = "certificates_database.csv"
+
+# Seconds a connection waits on a locked database before giving up
+BUSY_TIMEOUT = 5.0
+
+# Seconds a writer waits for the database write lock before giving up
+WRITE_LOCK_TIMEOUT = 5.0
+
+USER_COLUMNS = ['username', 'email', 'password_hash', 'full_name', 'created_at', 'eco_score']
+CERTIFICATE_COLUMNS = ['username', 'eco_score', 'rank', 'issued_date', 'certificate_id', 'qr_code_id']
+
+# Ordered schema migrations, applied once each and tracked with PRAGMA user_version
+SCHEMA_MIGRATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY,
+        username TEXT NOT NULL,
+        email TEXT NOT NULL,
+        password_hash TEXT NOT NULL,
+        full_name TEXT,
+        created_at TEXT,
+        eco_score REAL NOT NULL DEFAULT 0
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users(username);
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users(email);
+    CREATE INDEX IF NOT EXISTS idx_users_eco_score ON users(eco_score);
+
+    CREATE TABLE IF NOT EXISTS certificates (
+        id INTEGER PRIMARY KEY,
+        username TEXT NOT NULL,
+        eco_score INTEGER,
+        rank INTEGER,
+        issued_date TEXT,
+        certificate_id TEXT,
+        qr_code_id TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_certificates_username ON certificates(username);
+
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS score_ledger (
+        id INTEGER PRIMARY KEY,
+        username TEXT NOT NULL,
+        delta REAL NOT NULL,
+        entries INTEGER NOT NULL DEFAULT 1,
+        created_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_score_ledger_username ON score_ledger(username);
+    INSERT INTO score_ledger (username, delta, entries, created_at)
+        SELECT username, eco_score, 0, datetime('now', 'localtime') FROM users WHERE eco_score != 0;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS activity_hot (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT NOT NULL,
+        day TEXT NOT NULL,
+        username TEXT,
+        action TEXT,
+        points REAL
+    );
+    CREATE INDEX IF NOT EXISTS idx_activity_hot_day ON activity_hot(day);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS activity_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        points REAL NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS activity_action_totals (
+        action TEXT PRIMARY KEY,
+        points REAL NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS activity_user_totals (
+        username TEXT PRIMARY KEY,
+        points REAL NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS activity_daily (
+        day TEXT NOT NULL,
+        action TEXT NOT NULL,
+        points REAL NOT NULL DEFAULT 0,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, action)
+    );
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_certificates_certificate_id ON certificates(certificate_id);
+    CREATE INDEX IF NOT EXISTS idx_certificates_qr_code_id ON certificates(qr_code_id);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS evidence_hashes (
+        id INTEGER PRIMARY KEY,
+        mission TEXT NOT NULL,
+        phash INTEGER NOT NULL,
+        dhash INTEGER NOT NULL,
+        username TEXT,
+        verdict TEXT NOT NULL,
+        response TEXT,
+        points REAL NOT NULL DEFAULT 0,
+        duplicate_of INTEGER,
+        created_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_evidence_hashes_duplicate_of ON evidence_hashes(duplicate_of);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS verification_jobs (
+        id TEXT PRIMARY KEY,
+        username TEXT NOT NULL,
+        mission TEXT NOT NULL,
+        status TEXT NOT NULL,
+        result TEXT,
+        action TEXT,
+        points REAL NOT NULL DEFAULT 0,
+        error TEXT,
+        claimed INTEGER NOT NULL DEFAULT 0,
+        created_at TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_verification_jobs_username ON verification_jobs(username, mission, created_at);
+    CREATE INDEX IF NOT EXISTS idx_verification_jobs_status ON verification_jobs(status);
+    """,
+]
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized_path = None
+
+
+def connect(path):
+    """Open a connection in WAL mode with autocommit (explicit transactions only).
+
+    Also used for side databases (e.g. the EcoBot cache); write to them with
+    ``transaction(conn, lock_name=...)``.
+    """
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+def _apply_schema(conn):
+    """Apply pending schema migrations"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, script in enumerate(SCHEMA_MIGRATIONS, start=1):
+        if target <= version:
+            continue
+        conn.executescript("BEGIN IMMEDIATE;" + script + f"PRAGMA user_version = {target}; COMMIT;")
+
+
+def get_connection():
+    """Return this thread's connection, creating the schema on first use"""
+    global _initialized_path
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and getattr(_local, 'path', None) == STORE_DB_FILE:
+        return conn
+
+    conn = connect(STORE_DB_FILE)
+    with _init_lock:
+        if _initialized_path != STORE_DB_FILE:
+            _apply_schema(conn)
+            if get_meta('csv_migrated', conn=conn) is None:
+                migrate_from_csv(conn=conn)
+            _initialized_path = STORE_DB_FILE
+    _local.conn = conn
+    _local.path = STORE_DB_FILE
+    return conn
+
+
+def _try_begin(conn):
+    """Attempt BEGIN IMMEDIATE without blocking; False if another writer holds the lock"""
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        return True
+    except sqlite3.OperationalError as e:
+        if 'locked' in str(e) or 'busy' in str(e):
+            return False
+        raise
+
+
+@contextmanager
+def transaction(conn=None, timeout=WRITE_LOCK_TIMEOUT, lock_name='store.db'):
+    """Run a block inside a write transaction (BEGIN IMMEDIATE ... COMMIT).
+
+    Waits at most ``timeout`` seconds for the write lock (raising
+    file_lock.LockTimeout) and records contention under ``lock_name``.
+    Nested calls on a connection that is already in a transaction use a
+    savepoint, so only the inner block is rolled back on error.
+    """
+    conn = conn or get_connection()
+    if conn.in_transaction:
+        with savepoint(conn):
+            yield conn
+        return
+    # Poll for the write lock ourselves so waits are bounded and measured
+    conn.execute("PRAGMA busy_timeout = 0")
+    try:
+        file_lock.wait_with_backoff(lambda: _try_begin(conn), lock_name, timeout)
+    finally:
+        conn.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+    started = time.perf_counter()
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+    finally:
+        file_lock.get_stats(lock_name).record_hold(time.perf_counter() - started)
+
+
+_savepoint_ids = threading.local()
+
+
+@contextmanager
+def savepoint(conn):
+    """Run a block inside a SAVEPOINT of the current transaction"""
+    n = getattr(_savepoint_ids, 'n', 0) + 1
+    _savepoint_ids.n = n
+    name = f"sp_{n}"
+    conn.execute(f"SAVEPOINT {name}")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute(f"ROLLBACK TO {name}")
+        conn.execute(f"RELEASE {name}")
+        raise
+    else:
+        conn.execute(f"RELEASE {name}")
+
+
+def get_meta(key, default=None, conn=None):
+    """Read a value from the meta table"""
+    conn = conn or get_connection()
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row['value'] if row else default
+
+
+def set_meta(key, value, conn=None):
+    """Write a value to the meta table (caller owns the transaction)"""
+    conn = conn or get_connection()
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+# ==========================================
+# USERS
+# ==========================================
+
+def _user_dict(row):
+    """Convert a users row to the dict shape auth has always returned"""
+    if row is None:
+        return None
+    user = {col: row[col] for col in USER_COLUMNS}
+    user['eco_score'] = int(user['eco_score'] or 0)
+    return user
+
+
+def get_user(username):
+    """Point lookup of a user by username"""
+    row = get_connection().execute(
+        "SELECT * FROM users WHERE username = ?", (username,)
+    ).fetchone()
+    return _user_dict(row)
+
+
+def user_exists(username, email):
+    """Check the username and email indexes for an existing account"""
+    conn = get_connection()
+    row = conn.execute(
+        "SELECT 1 FROM users WHERE username = ? UNION ALL SELECT 1 FROM users WHERE email = ? LIMIT 1",
+        (username, email)
+    ).fetchone()
+    return row is not None
+
+
+def insert_user(username, email, password_hash, full_name, created_at, eco_score=0):
+    """Insert a user; returns False if the username or email is taken"""
+    try:
+        with transaction() as conn:
+            conn.execute(
+                "INSERT INTO users (username, email, password_hash, full_name, created_at, eco_score) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (username, email, password_hash, full_name, created_at, eco_score)
+            )
+        return True
+    except sqlite3.IntegrityError:
+        return False
+
+
+def load_users_df():
+    """Load every user into a DataFrame with the legacy CSV columns"""
+    df = pd.read_sql_query(
+        "SELECT username, email, password_hash, full_name, created_at, eco_score FROM users ORDER BY id",
+        get_connection()
+    )
+    df['eco_score'] = pd.to_numeric(df['eco_score'], errors='coerce').fillna(0).astype(int)
+    return df
+
+
+def replace_users(df):
+    """Replace the users table with the rows of a DataFrame"""
+    rows = _users_rows(df)
+    with transaction() as conn:
+        conn.execute("DELETE FROM users")
+        conn.executemany(
+            "INSERT INTO users (username, email, password_hash, full_name, created_at, eco_score) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        # Tells in-memory indexes to rebuild rather than catch up
+        set_meta('users_epoch', int(get_meta('users_epoch', '0', conn=conn)) + 1, conn=conn)
+
+
+def _users_rows(df):
+    """Tuples for a users INSERT, with missing columns and scores filled in"""
+    df = df.copy()
+    for col in USER_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    df['eco_score'] = pd.to_numeric(df['eco_score'], errors='coerce').fillna(0)
+    df = df.astype(object).where(pd.notna(df), None)
+    return [tuple(r) for r in df[USER_COLUMNS].itertuples(index=False, name=None)]
+
+# ==========================================
+# CERTIFICATES
+# ==========================================
+
+def _certificate_dict(row):
+    """Convert a certificates row to the dict shape auth has always returned"""
+    if row is None:
+        return None
+    return {col: row[col] for col in CERTIFICATE_COLUMNS}
+
+
+def get_certificate_by_username(username):
+    """Point lookup of a user's certificate"""
+    row = get_connection().execute(
+        "SELECT * FROM certificates WHERE username = ? ORDER BY id LIMIT 1", (username,)
+    ).fetchone()
+    return _certificate_dict(row)
+
+
+def get_certificate_by_id(certificate_id):
+    """Point lookup of a certificate by its certificate_id"""
+    row = get_connection().execute(
+        "SELECT * FROM certificates WHERE certificate_id = ? ORDER BY id LIMIT 1", (certificate_id,)
+    ).fetchone()
+    return _certificate_dict(row)
+
+
+def get_certificate_by_qr_code_id(qr_code_id):
+    """Point lookup of a certificate by its qr_code_id"""
+    row = get_connection().execute(
+        "SELECT * FROM certificates WHERE qr_code_id = ? ORDER BY id LIMIT 1", (qr_code_id,)
+    ).fetchone()
+    return _certificate_dict(row)
+
+
+def find_certificates_by_ids(certificate_ids):
+    """Certificates whose certificate_id is one of ``certificate_ids`` (one indexed query)"""
+    certificate_ids = list(certificate_ids)
+    if not certificate_ids:
+        return []
+    rows = get_connection().execute(
+        f"SELECT * FROM certificates WHERE certificate_id IN ({', '.join('?' * len(certificate_ids))}) ORDER BY id",
+        certificate_ids
+    ).fetchall()
+    return [_certificate_dict(row) for row in rows]
+
+
+def insert_certificate(record, conn=None):
+    """Insert a certificate record (caller owns the transaction when conn is given)"""
+    insert_certificates([record], conn=conn)
+
+
+def insert_certificates(records, conn=None):
+    """Insert certificate records in one statement batch"""
+    values = [tuple(record.get(col) for col in CERTIFICATE_COLUMNS) for record in records]
+    sql = ("INSERT INTO certificates (username, eco_score, rank, issued_date, certificate_id, qr_code_id) "
+           "VALUES (?, ?, ?, ?, ?, ?)")
+    if conn is not None:
+        conn.executemany(sql, values)
+        return
+    with transaction() as conn:
+        conn.executemany(sql, values)
+
+
+def load_certificates_df():
+    """Load every certificate into a DataFrame with the legacy CSV columns"""
+    return pd.read_sql_query(
+        "SELECT username, eco_score, rank, issued_date, certificate_id, qr_code_id FROM certificates ORDER BY id",
+        get_connection()
+    )
+
+
+def replace_certificates(df):
+    """Replace the certificates table with the rows of a DataFrame"""
+    df = df.copy()
+    for col in CERTIFICATE_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    df = df.astype(object).where(pd.notna(df), None)
+    rows = [tuple(r) for r in df[CERTIFICATE_COLUMNS].itertuples(index=False, name=None)]
+    with transaction() as conn:
+        conn.execute("DELETE FROM certificates")
+        conn.executemany(
+            "INSERT INTO certificates (username, eco_score, rank, issued_date, certificate_id, qr_code_id) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+# ==========================================
+# CSV MIGRATION & EXPORT
+# ==========================================
+
+def export_csv(users_path=LEGACY_USER_CSV, certificates_path=LEGACY_CERTIFICATES_CSV):
+    """Write CSV snapshots of users and certificates (locked, atomically replaced)"""
+    for path, df in ((users_path, load_users_df()), (certificates_path, load_certificates_df())):
+        with file_lock.file_lock(path + ".lock", name=os.path.basename(path)):
+            with file_lock.atomic_replace(path, 'w', encoding='utf-8') as f:
+                df.to_csv(f, index=False)
+
+
+def migrate_from_csv(conn=None, force=False):
+    """One-shot import of the legacy users and certificates CSV files.
+
+    Rows whose username or email already exist are skipped. Returns a dict of
+    imported/skipped counts.
+    """
+    conn = conn or get_connection()
+    if not force and get_meta('csv_migrated', conn=conn) is not None:
+        return {'users': 0, 'certificates': 0, 'skipped': 0}
+
+    stats = {'users': 0, 'certificates': 0, 'skipped': 0}
+    with transaction(conn):
+        if os.path.exists(LEGACY_USER_CSV):
+            users_df = pd.read_csv(LEGACY_USER_CSV)
+            for row in _users_rows(users_df):
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO users (username, email, password_hash, full_name, created_at, eco_score) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    row
+                )
+                if cur.rowcount:
+                    stats['users'] += 1
+                    if row[5]:
+                        # Opening balance, so the score ledger sums to the stored score
+                        conn.execute(
+                            "INSERT INTO score_ledger (username, delta, entries, created_at) VALUES (?, ?, 0, ?)",
+                            (row[0], row[5], pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"))
+                        )
+                else:
+                    stats['skipped'] += 1
+
+        if os.path.exists(LEGACY_CERTIFICATES_CSV):
+            certs_df = pd.read_csv(LEGACY_CERTIFICATES_CSV)
+            certs_df = certs_df.astype(object).where(pd.notna(certs_df), None)
+            for record in certs_df.to_dict('records'):
+                if not record.get('username'):
+                    continue
+                exists = conn.execute(
+                    "SELECT 1 FROM certificates WHERE username = ?", (record['username'],)
+                ).fetchone()
+                if exists:
+                    stats['skipped'] += 1
+                    continue
+                insert_certificate(record, conn=conn)
+                stats['certificates'] += 1
+
+        set_meta('csv_migrated', pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S"), conn=conn)
+    return stats
+
+
+if __name__ == "__main__":
+    # Usage: python storage.py migrate [--force] | export
+    if len(sys.argv) >= 2 and sys.argv[1] == "migrate":
+        result = migrate_from_csv(force="--force" in sys.argv)
+        print(f"Imported {result['users']} users and {result['certificates']} certificates "
+              f"({result['skipped']} rows skipped) into {STORE_DB_FILE}")
+    elif len(sys.argv) >= 2 and sys.argv[1] == "export":
+        export_csv()
+        print(f"Exported users to {LEGACY_USER_CSV} and certificates to {LEGACY_CERTIFICATES_CSV}")
+    else:
+        print("Usage: python storage.py migrate [--force] | export")
@@ -0,0 +1,297 @@
+# ==========================================
+# STORAGE SERVICE MODULE
+# Optional single-writer process with group commit for all auth writes
+# ==========================================
+#
+# Start the writer next to the app (same working directory, so it opens the
+# same database):
+#
+#     python storage_service.py /tmp/climate_guardian_writer.sock
+#
+# and point the app at it:
+#
+#     CLIMATE_GUARDIAN_WRITER=/tmp/climate_guardian_writer.sock streamlit run app.py
+#
+# Without CLIMATE_GUARDIAN_WRITER every session writes in-process as before.
+# A writer on a host:port that is not loopback also needs
+# CLIMATE_GUARDIAN_WRITER_KEY set (the same value) on both sides.
+
+import os
+import sys
+import time
+import queue
+import threading
+from multiprocessing.connection import Listener, Client
+import storage
+import score_ledger
+import activity_log
+import leaderboard
+import certificates
+
+# Environment variable holding the writer address (socket path or host:port)
+WRITER_ADDRESS_ENV = "CLIMATE_GUARDIAN_WRITER"
+
+# Environment variable holding the shared secret for writer connections
+WRITER_AUTHKEY_ENV = "CLIMATE_GUARDIAN_WRITER_KEY"
+
+# Used only for socket paths and loopback ports; any other address needs WRITER_AUTHKEY_ENV
+DEFAULT_AUTHKEY = "climate-guardian-writer"
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+# Seconds the writer waits to gather more operations into one commit
+COMMIT_INTERVAL = 0.005
+
+# Most operations folded into one commit
+MAX_BATCH = 500
+
+# Operations the writer accepts
+OPERATIONS = ('log_activity', 'score_delta', 'issue_certificate')
+
+
+class WriterUnavailable(Exception):
+    """Raised when no writer is configured or it cannot be reached"""
+
+
+class WriterError(Exception):
+    """Raised when the writer rejected or failed an operation"""
+
+
+def parse_address(value):
+    """'host:port' -> (host, port); anything else is a socket/pipe path"""
+    host, sep, port = value.rpartition(':')
+    if sep and port.isdigit() and os.sep not in value:
+        return (host or 'localhost', int(port))
+    return value
+
+
+def _authkey(address):
+    key = os.environ.get(WRITER_AUTHKEY_ENV)
+    if key:
+        return key.encode()
+    if isinstance(address, tuple) and address[0] not in LOCAL_HOSTS:
+        raise WriterUnavailable(f"{WRITER_AUTHKEY_ENV} must be set for a writer on {address[0]}:{address[1]}")
+    return DEFAULT_AUTHKEY.encode()
+
+# ==========================================
+# SERVER
+# ==========================================
+
+class _Request:
+    __slots__ = ('op', 'args', 'result', 'done')
+
+    def __init__(self, op, args):
+        self.op = op
+        self.args = args
+        self.result = None
+        self.done = threading.Event()
+
+
+class WriterService:
+    """Owns every write: batches incoming operations and commits them together"""
+
+    def __init__(self, address, commit_interval=COMMIT_INTERVAL, max_batch=MAX_BATCH):
+        self.address = address
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        self.requests = queue.Queue()
+        self.stats = {'commits': 0, 'operations': 0, 'largest_batch': 0}
+
+    def serve_forever(self):
+        """Accept client connections and run the group-commit loop"""
+        authkey = _authkey(self.address)
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+        threading.Thread(target=self._commit_loop, name="writer-commit", daemon=True).start()
+        with Listener(self.address, authkey=authkey) as listener:
+            print(f"Storage writer listening on {self.address} (db: {storage.STORE_DB_FILE})")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    print(f"Writer rejected a connection: {e}")
+                    continue
+                threading.Thread(target=self._serve_client, args=(conn,), daemon=True).start()
+
+    def submit(self, op, args):
+        """Queue an operation and block until its batch is durable"""
+        if op not in OPERATIONS:
+            return ('error', f"Unknown operation: {op}")
+        request = _Request(op, tuple(args))
+        self.requests.put(request)
+        request.done.wait()
+        return request.result
+
+    def _serve_client(self, conn):
+        with conn:
+            while True:
+                try:
+                    op, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                conn.send(self.submit(op, args))
+
+    def _commit_loop(self):
+        activity_log.ensure_initialized()
+        conn = storage.get_connection()
+        # Acknowledge only after the commit is on disk
+        conn.execute("PRAGMA synchronous=FULL")
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.monotonic() + self.commit_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit(conn, batch)
+            # Appends here pass their own conn, so the writer seals finished days itself
+            activity_log.maybe_compact()
+
+    def _commit(self, conn, batch):
+        """Apply a batch in one transaction; each operation is isolated by a savepoint"""
+        try:
+            with storage.transaction(conn):
+                deltas, delta_requests = {}, []
+                for request in batch:
+                    if request.op == 'issue_certificate':
+                        # Deltas queued earlier in this batch count towards eligibility
+                        # and must survive a failed issue
+                        self._flush_deltas(conn, deltas, delta_requests)
+                    try:
+                        with storage.savepoint(conn):
+                            request.result = ('ok', self._apply(conn, request, deltas))
+                    except Exception as e:
+                        request.result = ('error', str(e))
+                        # The rank index may have synced rows that were just rolled back
+                        leaderboard.invalidate()
+                        continue
+                    if request.op == 'score_delta':
+                        delta_requests.append(request)
+                self._flush_deltas(conn, deltas, delta_requests)
+            self.stats['commits'] += 1
+            self.stats['operations'] += len(batch)
+            self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+        except Exception as e:
+            # Nothing from this batch was committed
+            leaderboard.invalidate()
+            for request in batch:
+                request.result = ('error', f"Commit failed: {e}")
+        finally:
+            for request in batch:
+                request.done.set()
+
+    def _flush_deltas(self, conn, deltas, requests):
+        """Write the pending score deltas in their own savepoint; their requests fail with it"""
+        if not deltas:
+            return
+        try:
+            with storage.savepoint(conn):
+                score_ledger.apply_deltas(deltas, conn=conn)
+        except Exception as e:
+            leaderboard.invalidate()
+            for request in requests:
+                request.result = ('error', f"Score update failed: {e}")
+        finally:
+            deltas.clear()
+            requests.clear()
+
+    def _apply(self, conn, request, deltas):
+        if request.op == 'log_activity':
+            username, action, points = request.args
+            activity_log.append_many([(username, action, points)], conn=conn)
+            return None
+        if request.op == 'score_delta':
+            username, delta = request.args
+            total, entries = deltas.get(username, (0.0, 0))
+            deltas[username] = (total + float(delta), entries + 1)
+            return None
+        if request.op == 'issue_certificate':
+            return certificates.issue(request.args[0], conn)
+
+# ==========================================
+# CLIENT
+# ==========================================
+
+class WriterClient:
+    """Sends write operations to a running WriterService (one connection per thread)"""
+
+    def __init__(self, address):
+        self.address = address
+        self._local = threading.local()
+
+    def call(self, op, *args):
+        conn = getattr(self._local, 'conn', None)
+        try:
+            if conn is None:
+                conn = Client(self.address, authkey=_authkey(self.address))
+                self._local.conn = conn
+            conn.send((op, args))
+            status, value = conn.recv()
+        except (OSError, EOFError) as e:
+            self._local.conn = None
+            raise WriterUnavailable(f"Storage writer at {self.address} unreachable: {e}")
+        if status != 'ok':
+            raise WriterError(value)
+        return value
+
+
+_client = None
+_client_lock = threading.Lock()
+
+# Writes that fell back to in-process because the configured writer was unreachable
+_fallbacks = 0
+
+
+def get_client():
+    """Client for the configured writer, or None when writes stay in-process"""
+    global _client
+    value = os.environ.get(WRITER_ADDRESS_ENV)
+    if not value:
+        return None
+    with _client_lock:
+        address = parse_address(value)
+        if _client is None or _client.address != address:
+            _client = WriterClient(address)
+        return _client
+
+
+def submit(op, *args):
+    """Run a write through the writer; raises WriterUnavailable if there is none.
+
+    A configured writer that cannot be reached is logged (once per outage),
+    since the caller then writes in-process.
+    """
+    global _fallbacks
+    client = get_client()
+    if client is None:
+        raise WriterUnavailable("No storage writer configured")
+    try:
+        value = client.call(op, *args)
+    except WriterUnavailable as e:
+        with _client_lock:
+            _fallbacks += 1
+            first = _fallbacks == 1
+        if first:
+            print(f"{e}; writing in-process until it is back")
+        raise
+    with _client_lock:
+        if _fallbacks:
+            print(f"Storage writer at {client.address} is back after {_fallbacks} in-process write(s)")
+            _fallbacks = 0
+    return value
+
+
+if __name__ == "__main__":
+    # Usage: python storage_service.py <socket-path | host:port>
+    target = sys.argv[1] if len(sys.argv) >= 2 else os.environ.get(WRITER_ADDRESS_ENV)
+    if not target:
+        print("Usage: python storage_service.py <socket-path | host:port>")
+        sys.exit(1)
+    try:
+        WriterService(parse_address(target)).serve_forever()
+    except WriterUnavailable as e:
+        print(e)
+        sys.exit(1)
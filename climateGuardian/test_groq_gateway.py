@@ -0,0 +1,118 @@
+# ==========================================
+# GROQ GATEWAY TESTS
+# Circuit breaker recovery when a half-open trial never reaches Groq
+# ==========================================
+#
+#     python -m pytest test_groq_gateway.py
+
+import time
+import threading
+import pytest
+import groq_gateway
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, timeout=None, **params):
+        self.calls += 1
+        return "ok"
+
+
+class FakeClient:
+    def __init__(self):
+        self.chat = type("Chat", (), {})()
+        self.chat.completions = FakeCompletions()
+
+
+def half_open_gateway():
+    """Gateway with a fake upstream and a breaker whose cooldown has just passed"""
+    gateway = groq_gateway.GroqGateway("test-key")
+    gateway.client = FakeClient()
+    gateway.breaker.opened_at = time.monotonic() - gateway.breaker.cooldown - 1
+    gateway.breaker.failures = gateway.breaker.threshold
+    assert gateway.breaker.state == "half-open"
+    return gateway
+
+
+def test_trial_released_when_rate_limit_aborts():
+    gateway = half_open_gateway()
+    gateway.bucket.tokens = 0
+    gateway.bucket.rate = 0.001
+    with pytest.raises(groq_gateway.DeadlineExceeded):
+        gateway.create("test", timeout=0.05)
+    assert not gateway.breaker.trial
+
+    gateway.bucket.rate, gateway.bucket.tokens = 1000, 10
+    assert gateway.create("test") == "ok"
+    assert gateway.breaker.state == "closed"
+
+
+def test_trial_released_when_no_slot_frees_up():
+    gateway = half_open_gateway()
+    gateway.slots = threading.BoundedSemaphore(1)
+    gateway.slots.acquire()
+    with pytest.raises(groq_gateway.DeadlineExceeded):
+        gateway.create("test", timeout=0.05)
+    assert not gateway.breaker.trial
+
+    gateway.slots.release()
+    assert gateway.create("test") == "ok"
+    assert gateway.breaker.state == "closed"
+
+
+def test_trial_released_when_deadline_already_passed():
+    gateway = half_open_gateway()
+    with pytest.raises(groq_gateway.DeadlineExceeded):
+        gateway.create("test", deadline=time.monotonic() - 1)
+    assert not gateway.breaker.trial
+    assert gateway.client.chat.completions.calls == 0
+
+    assert gateway.create("test") == "ok"
+    assert gateway.breaker.state == "closed"
+
+
+def test_trial_held_by_another_thread_is_kept():
+    breaker = groq_gateway.CircuitBreaker(cooldown=0)
+    breaker.opened_at = time.monotonic() - 1
+    assert breaker.allow()
+    worker = threading.Thread(target=breaker.release_trial)
+    worker.start()
+    worker.join()
+    assert breaker.trial
+    assert not breaker.allow()
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_client_errors_do_not_reset_failure_count():
+    gateway = groq_gateway.GroqGateway("test-key")
+    gateway.breaker.threshold = 2
+    statuses = iter([503, 400, 503])
+
+    def create(timeout=None, **params):
+        raise StatusError(next(statuses))
+
+    gateway.client.chat.completions.create = create
+    for _ in range(3):
+        with pytest.raises(StatusError):
+            gateway.create("test", retries=0)
+    assert gateway.breaker.state == "open"
+
+
+def test_client_error_hands_back_half_open_trial():
+    gateway = half_open_gateway()
+
+    def create(timeout=None, **params):
+        raise StatusError(401)
+
+    gateway.client.chat.completions.create = create
+    with pytest.raises(StatusError):
+        gateway.create("test", retries=0)
+    assert gateway.breaker.state == "half-open"
+    assert not gateway.breaker.trial
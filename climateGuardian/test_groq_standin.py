@@ -0,0 +1,80 @@
+# ==========================================
+# GROQ STAND-IN TESTS
+# Record mode against an upstream that compresses its responses
+# ==========================================
+#
+#     python -m pytest test_groq_standin.py
+
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from groq import Groq
+import groq_standin
+
+
+class GzipUpstream(BaseHTTPRequestHandler):
+    """Chat completions endpoint that gzips every answer, as real APIs do"""
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if request.get('stream'):
+            chunk = {"id": "up-1", "object": "chat.completion.chunk", "created": 0, "model": request['model'],
+                     "choices": [{"index": 0, "delta": {"content": "Rinse and recycle."}, "finish_reason": None}]}
+            body = f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n".encode('utf-8')
+            content_type = "text/event-stream"
+        else:
+            body = json.dumps({
+                "id": "up-1", "object": "chat.completion", "created": 0, "model": request['model'],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "Rinse and recycle."}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 3, "total_tokens": 4},
+            }).encode('utf-8')
+            content_type = "application/json"
+        body = gzip.compress(body)
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def recording_standin(tmp_path):
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), GzipUpstream)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    host, port = upstream.server_address[:2]
+    fixtures = groq_standin.FixtureStore(str(tmp_path / "fixtures.jsonl"))
+    server = groq_standin.start(fixtures=fixtures, upstream=f"http://{host}:{port}")
+    return upstream, server
+
+
+def test_records_fixture_from_gzip_upstream(tmp_path):
+    upstream, server = recording_standin(tmp_path)
+    try:
+        client = Groq(api_key="test-key", base_url=server.url, max_retries=0)
+        messages = [{"role": "user", "content": "How can I recycle glass?"}]
+        reply = client.chat.completions.create(model="test-model", messages=messages)
+        assert reply.choices[0].message.content == "Rinse and recycle."
+    finally:
+        server.shutdown()
+        upstream.shutdown()
+    assert server.counts['recorded'] == 1
+    recorded = groq_standin.FixtureStore(str(tmp_path / "fixtures.jsonl")).lookup(messages)
+    assert recorded['response'] == "Rinse and recycle."
+
+
+def test_records_streamed_fixture_from_gzip_upstream(tmp_path):
+    upstream, server = recording_standin(tmp_path)
+    try:
+        client = Groq(api_key="test-key", base_url=server.url, max_retries=0)
+        messages = [{"role": "user", "content": "Why should I compost food scraps?"}]
+        stream = client.chat.completions.create(model="test-model", messages=messages, stream=True)
+        assert "".join(chunk.choices[0].delta.content or "" for chunk in stream) == "Rinse and recycle."
+    finally:
+        server.shutdown()
+        upstream.shutdown()
+    recorded = groq_standin.FixtureStore(str(tmp_path / "fixtures.jsonl")).lookup(messages)
+    assert recorded['response'] == "Rinse and recycle."
@@ -0,0 +1,269 @@
+# ==========================================
+# VERIFICATION JOBS MODULE
+# Mission verifications run on a bounded worker pool, with persisted results
+# ==========================================
+#
+# A mission submission becomes a row in the verification_jobs table and a task
+# on a process-wide pool of JOB_WORKERS threads, so the Streamlit script thread
+# never waits on an upstream call. The row moves queued -> running -> done (or
+# failed) and keeps the task's result as JSON, so the verdict survives a page
+# reload. A finished job is claimed once: the claim (an atomic UPDATE on
+# ``claimed``), its score ledger delta and its activity row commit in one
+# transaction, so the points are awarded exactly once however many reruns or
+# sessions see the result, and a failure leaves the job unclaimed for a retry.
+#
+# Jobs left queued longer than JOB_TIMEOUT, or running longer than JOB_TIMEOUT
+# since they started (a restarted server loses its in-memory queue), are
+# marked failed when next read.
+#
+#     python verification_jobs.py recent [username]
+
+import sys
+import json
+import time
+import uuid
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import storage
+import score_ledger
+import activity_log
+
+JOB_WORKERS = 4
+
+# Jobs waiting or running in this process before new submissions are refused
+MAX_PENDING = 32
+
+# Seconds after which an unfinished job is treated as lost
+JOB_TIMEOUT = 300
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+PENDING = (QUEUED, RUNNING)
+
+TIMING_WINDOW = 200
+
+
+class QueueFull(Exception):
+    """Raised when MAX_PENDING jobs are already waiting or running"""
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _job_dict(row):
+    job = dict(row)
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    job['claimed'] = bool(job['claimed'])
+    return job
+
+
+class VerificationQueue:
+    """Bounded pool running verification tasks and recording them in the store"""
+
+    def __init__(self, workers=JOB_WORKERS, max_pending=MAX_PENDING):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="verify")
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.peak_pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.refused = 0
+        self.waits = deque(maxlen=TIMING_WINDOW)
+        self.runs = deque(maxlen=TIMING_WINDOW)
+        self.lock = threading.Lock()
+
+    def submit(self, username, mission, task, *args):
+        """Queue ``task(*args)`` (returning a JSON-serializable dict) for a user's mission; returns the job id.
+
+        A result dict may carry ``action`` and ``points`` to apply when the job is claimed.
+        """
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.refused += 1
+                raise QueueFull("Too many verifications are in progress.")
+            self.pending += 1
+            self.peak_pending = max(self.peak_pending, self.pending)
+            self.submitted += 1
+        job_id = uuid.uuid4().hex
+        try:
+            with storage.transaction() as conn:
+                conn.execute(
+                    "INSERT INTO verification_jobs (id, username, mission, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, username, mission, QUEUED, _now())
+                )
+            self.executor.submit(self._run, job_id, task, args, time.perf_counter())
+        except Exception:
+            with self.lock:
+                self.pending -= 1
+            raise
+        return job_id
+
+    def _run(self, job_id, task, args, queued_at):
+        started = time.perf_counter()
+        outcome = FAILED
+        try:
+            with storage.transaction() as conn:
+                started_row = conn.execute(
+                    "UPDATE verification_jobs SET status = ?, started_at = ? WHERE id = ? AND status = ?",
+                    (RUNNING, _now(), job_id, QUEUED)
+                ).rowcount
+            if not started_row:
+                # Expired as lost while it waited; its result would be discarded anyway
+                return
+            try:
+                result = task(*args)
+                update = (DONE, json.dumps(result), result.get('action'), result.get('points', 0), None)
+            except Exception as e:
+                update = (FAILED, None, None, 0, str(e) or type(e).__name__)
+            with storage.transaction() as conn:
+                # A job expired as lost in the meantime stays failed
+                conn.execute(
+                    "UPDATE verification_jobs SET status = ?, result = ?, action = ?, points = ?, error = ?, finished_at = ? "
+                    "WHERE id = ? AND status = ?",
+                    (*update, _now(), job_id, RUNNING)
+                )
+            outcome = update[0]
+        finally:
+            with self.lock:
+                self.pending -= 1
+                self.waits.append(started - queued_at)
+                self.runs.append(time.perf_counter() - started)
+                if outcome == DONE:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def _select(self, query, params):
+        """Rows for a query, after failing any of them that were lost while pending"""
+        conn = storage.get_connection()
+        rows = conn.execute(query, params).fetchall()
+        cutoff = (datetime.now() - timedelta(seconds=JOB_TIMEOUT)).strftime("%Y-%m-%d %H:%M:%S")
+        # A running job's clock starts when a worker picked it up, not when it was queued
+        lost = [row['id'] for row in rows
+                if (row['status'] == QUEUED and row['created_at'] < cutoff)
+                or (row['status'] == RUNNING and (row['started_at'] or row['created_at']) < cutoff)]
+        if lost:
+            with storage.transaction() as conn:
+                conn.executemany(
+                    "UPDATE verification_jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                    [(FAILED, "Verification timed out. Please submit your evidence again.", _now(), job_id, QUEUED, RUNNING)
+                     for job_id in lost]
+                )
+            rows = conn.execute(query, params).fetchall()
+        return [_job_dict(row) for row in rows]
+
+    def get(self, job_id):
+        """Job row as a dict (``result`` decoded), or None"""
+        rows = self._select("SELECT * FROM verification_jobs WHERE id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    def unclaimed(self, username):
+        """A user's jobs that have not been claimed yet, oldest first (pending ones included)"""
+        return self._select(
+            "SELECT * FROM verification_jobs WHERE username = ? AND claimed = 0 ORDER BY created_at, rowid",
+            (username,)
+        )
+
+    def claim(self, job_id):
+        """Claim a finished job and persist its points (ledger delta + activity row) in the same transaction.
+
+        True only for the one caller that won the claim; the points are then
+        already stored and only session state is left to update.
+        """
+        activity_log.ensure_initialized()
+        with storage.transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE verification_jobs SET claimed = 1 WHERE id = ? AND claimed = 0 AND status IN (?, ?)",
+                (job_id, DONE, FAILED)
+            )
+            if cursor.rowcount != 1:
+                return False
+            job = conn.execute(
+                "SELECT username, action, points FROM verification_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if job['action'] and job['points'] > 0:
+                score_ledger.apply_deltas({job['username']: (job['points'], 1)}, conn=conn)
+                activity_log.append_many([(job['username'], job['action'], job['points'])], conn=conn)
+        activity_log.maybe_compact()
+        return True
+
+    def stats(self):
+        """Pool size, pending jobs, outcomes and median queue wait / run time"""
+        with self.lock:
+            waits, runs = sorted(self.waits), sorted(self.runs)
+            return {
+                'workers': self.workers,
+                'pending': self.pending,
+                'peak_pending': self.peak_pending,
+                'max_pending': self.max_pending,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'refused': self.refused,
+                'median_wait_ms': waits[len(waits) // 2] * 1000 if waits else 0.0,
+                'median_run_ms': runs[len(runs) // 2] * 1000 if runs else 0.0,
+            }
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Process-wide verification queue"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = VerificationQueue()
+        return _queue
+
+
+def submit(username, mission, task, *args):
+    return get_queue().submit(username, mission, task, *args)
+
+
+def get(job_id):
+    return get_queue().get(job_id)
+
+
+def unclaimed(username):
+    return get_queue().unclaimed(username)
+
+
+def claim(job_id):
+    return get_queue().claim(job_id)
+
+
+def get_stats():
+    """Queue stats, or None if no verification was submitted by this server process"""
+    return _queue.stats() if _queue is not None else None
+
+
+def recent_jobs(username=None, limit=20):
+    """Latest jobs (optionally for one user) as a DataFrame-friendly list of dicts"""
+    query = "SELECT id, username, mission, status, action, points, claimed, error, created_at, finished_at FROM verification_jobs"
+    params = ()
+    if username:
+        query += " WHERE username = ?"
+        params = (username,)
+    query += " ORDER BY created_at DESC, rowid DESC LIMIT ?"
+    rows = storage.get_connection().execute(query, params + (limit,)).fetchall()
+    return [dict(row) for row in rows]
+
+
+if __name__ == "__main__":
+    # Usage: python verification_jobs.py recent [username]
+    command = sys.argv[1] if len(sys.argv) >= 2 else ""
+    if command == "recent":
+        for job in recent_jobs(sys.argv[2] if len(sys.argv) >= 3 else None):
+            print(f"{job['created_at']}  {job['username']:<16} {job['mission']:<18} {job['status']:<8} "
+                  f"{'claimed' if job['claimed'] else 'unclaimed':<9} {job['points']:>4g}  {job['error'] or job['action'] or ''}")
+    else:
+        print("Usage: python verification_jobs.py recent [username]")
@@ -0,0 +1,268 @@
+# ==========================================
+# VIDEO SAMPLER MODULE
+# Keyframe-aligned frame sampling for the "Walking to School" video check
+# ==========================================
+#
+# The upload is read from memory (OpenCV's stream-buffered FFmpeg backend), so
+# the video is never spooled to a temp file; older OpenCV builds fall back to
+# one. A demux-only pass (no decoding) gives the exact frame count and the
+# keyframe positions. Sample positions are spread over the clip (more of them
+# for longer clips), snapped to the nearest keyframe so each sampled frame is a
+# full intra-coded picture, and read in order: short gaps are stepped with
+# grab() (decode without colour conversion), long gaps are skipped with one
+# seek. Only sampled frames are retrieved, then fitted to SAMPLE_MAX_SIDE with
+# their aspect ratio kept.
+#
+#     python video_sampler.py sample <video>
+#     python video_sampler.py bench [seconds]
+
+import io
+import os
+import sys
+import time
+import base64
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+import cv2
+
+# Longest side of a sampled frame (aspect ratio preserved)
+SAMPLE_MAX_SIDE = 640
+PAYLOAD_QUALITY = 80
+
+# One frame per SECONDS_PER_FRAME of video, within [MIN_FRAMES, MAX_FRAMES]
+# (the vision model accepts at most five images per request)
+MIN_FRAMES = 3
+MAX_FRAMES = 5
+SECONDS_PER_FRAME = 12
+
+# Gaps up to this many frames are decoded through with grab(); longer ones are
+# seeked (an OpenCV seek costs roughly as much as decoding ~25 frames)
+SEQUENTIAL_GAP = 30
+
+
+class VideoInfo:
+    """Frame rate, exact frame count and keyframe positions of a video"""
+
+    def __init__(self, fps, frame_count, keyframes, scan_ms=0.0):
+        self.fps = fps
+        self.frame_count = frame_count
+        self.keyframes = keyframes
+        self.scan_ms = scan_ms
+
+    @property
+    def duration(self):
+        return self.frame_count / self.fps if self.fps > 0 else 0
+
+
+class VideoSample:
+    """Sampled BGR frames of a video and the time it took to decode them"""
+
+    mime_type = "image/jpeg"
+
+    def __init__(self, info, positions, frames, decode_ms):
+        self.info = info
+        self.positions = positions
+        self.frames = frames
+        self.decode_ms = decode_ms
+
+    def payloads(self, quality=PAYLOAD_QUALITY):
+        """(mime_type, base64) pairs for a Groq vision request"""
+        payloads = []
+        for frame in self.frames:
+            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            payloads.append((self.mime_type, base64.b64encode(buffer).decode('ascii')))
+        return payloads
+
+
+def _stream_buffered():
+    try:
+        backends = cv2.videoio_registry.getStreamBufferedBackends()
+    except AttributeError:
+        return False
+    return cv2.CAP_FFMPEG in backends
+
+
+@contextmanager
+def _capture(data):
+    """VideoCapture over in-memory bytes (a temp file only when the backend needs a path)"""
+    path = None
+    if _stream_buffered():
+        # The capture does not own the stream; keep it referenced until release()
+        stream = io.BytesIO(data)
+        cap = cv2.VideoCapture(stream, cv2.CAP_FFMPEG, [])
+    else:
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp:
+            tmp.write(data)
+            path = tmp.name
+        cap = cv2.VideoCapture(path)
+    try:
+        yield cap
+    finally:
+        cap.release()
+        if path:
+            os.remove(path)
+
+
+def _read_bytes(data):
+    return data.getvalue() if hasattr(data, 'getvalue') else data
+
+
+def probe(data):
+    """VideoInfo from a demux-only pass (packets are read, nothing is decoded)"""
+    started = time.perf_counter()
+    data = _read_bytes(data)
+    with _capture(data) as cap:
+        if not cap.isOpened():
+            raise ValueError("Could not open video. Try a different video format.")
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if not cap.set(cv2.CAP_PROP_FORMAT, -1):
+            # Raw packet mode unavailable: trust the container's frame count, no keyframe map
+            return VideoInfo(fps, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), [], (time.perf_counter() - started) * 1000)
+        keyframes = []
+        count = 0
+        while cap.grab():
+            if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                keyframes.append(count)
+            count += 1
+    return VideoInfo(fps, count, keyframes, (time.perf_counter() - started) * 1000)
+
+
+def frame_budget(duration):
+    """Number of frames to sample from a clip of ``duration`` seconds"""
+    return max(MIN_FRAMES, min(MAX_FRAMES, int(duration // SECONDS_PER_FRAME)))
+
+
+def pick_positions(info, count):
+    """``count`` evenly spread frame indices, each moved to its nearest keyframe when distinct"""
+    if info.frame_count <= 0:
+        return []
+    targets = [int(info.frame_count * (i + 1) / (count + 1)) for i in range(count)]
+    keyframes = np.asarray(info.keyframes)
+    positions = []
+    for target in targets:
+        position = target
+        if keyframes.size:
+            nearest = int(keyframes[np.abs(keyframes - target).argmin()])
+            # Short clips with long GOPs would collapse onto one keyframe; keep the spread instead
+            if nearest not in positions:
+                position = nearest
+        if position not in positions:
+            positions.append(position)
+    return sorted(positions)
+
+
+def _fit(frame, max_side):
+    height, width = frame.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return frame
+    return cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+def sample(data, info=None, count=None, max_side=SAMPLE_MAX_SIDE):
+    """Decode the sampled frames of a video (bytes or a file-like upload) in one forward pass.
+
+    ``decode_ms`` covers this call only; a separate probe() reports its own ``scan_ms``.
+    """
+    started = time.perf_counter()
+    data = _read_bytes(data)
+    if info is None:
+        info = probe(data)
+    positions = pick_positions(info, count or frame_budget(info.duration))
+    frames = []
+    with _capture(data) as cap:
+        current = 0  # index of the frame the next grab() returns
+        for position in positions:
+            if position - current > SEQUENTIAL_GAP:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+                current = position
+            while current < position and cap.grab():
+                current += 1
+            if current != position or not cap.grab():
+                break
+            current += 1
+            ok, frame = cap.retrieve()
+            if ok:
+                frames.append(_fit(frame, max_side))
+    return VideoSample(info, positions, frames, (time.perf_counter() - started) * 1000)
+
+# ==========================================
+# BENCHMARK
+# ==========================================
+
+def _write_sample_video(path, seconds=30, fps=30, size=(1920, 1080), gop=60):
+    """A phone-like 1080p clip (panning scene, 2 s keyframe interval)"""
+    width, height = size
+    rng = np.random.default_rng(0)
+    scene = cv2.resize(rng.integers(0, 256, (9, 32, 3), dtype=np.uint8), (width * 2, height), interpolation=cv2.INTER_CUBIC)
+    writer = cv2.VideoWriter(path, cv2.CAP_FFMPEG, cv2.VideoWriter_fourcc(*'mp4v'), fps, size,
+                             [cv2.VIDEOWRITER_PROP_KEY_INTERVAL, gop])
+    total = seconds * fps
+    for i in range(total):
+        offset = i * width // total
+        writer.write(np.ascontiguousarray(scene[:, offset:offset + width]))
+    writer.release()
+
+
+def _previous_sampler(data):
+    """What mission_tracker did: temp file, three seeks, 512x512 resize"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp:
+        tmp.write(data)
+        path = tmp.name
+    try:
+        cap = cv2.VideoCapture(path)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        payloads = []
+        for index in (int(total * 0.25), int(total * 0.5), int(total * 0.75)):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ret, frame = cap.read()
+            if ret:
+                _, buffer = cv2.imencode('.jpg', cv2.resize(frame, (512, 512)))
+                payloads.append(base64.b64encode(buffer).decode('utf-8'))
+        cap.release()
+    finally:
+        os.remove(path)
+    return payloads
+
+
+def benchmark(seconds=30, runs=3):
+    """Median decode time per video for the previous and the keyframe sampler"""
+    fd, path = tempfile.mkstemp(suffix=".mp4")
+    os.close(fd)
+    try:
+        _write_sample_video(path, seconds)
+        with open(path, 'rb') as f:
+            data = f.read()
+    finally:
+        os.remove(path)
+    results = {}
+    for name, run in (("previous", _previous_sampler), ("keyframe", lambda d: sample(d).payloads())):
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            payloads = run(data)
+            times.append(time.perf_counter() - start)
+        results[name] = {
+            'ms': sorted(times)[len(times) // 2] * 1000,
+            'frames': len(payloads),
+            'payload_kb': sum(len(p[1] if isinstance(p, tuple) else p) for p in payloads) / 1024,
+        }
+    return results
+
+
+if __name__ == "__main__":
+    # Usage: python video_sampler.py sample <video> | bench [seconds]
+    command = sys.argv[1] if len(sys.argv) >= 2 else ""
+    if command == "sample" and len(sys.argv) >= 3:
+        with open(sys.argv[2], 'rb') as f:
+            result = sample(f.read())
+        info = result.info
+        print(f"{info.frame_count} frames @ {info.fps:.2f} fps ({info.duration:.1f}s), {len(info.keyframes)} keyframes")
+        print(f"sampled {result.positions} -> {[f.shape[1::-1] for f in result.frames]} in {result.decode_ms:.1f} ms")
+    elif command == "bench":
+        seconds = int(sys.argv[2]) if len(sys.argv) >= 3 else 30
+        for label, r in benchmark(seconds).items():
+            print(f"{label:>9}: {r['ms']:7.1f} ms/video, {r['frames']} frames, payload {r['payload_kb']:6.1f} KB (base64)")
+    else:
+        print("Usage: python video_sampler.py sample <video> | bench [seconds]")